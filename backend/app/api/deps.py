@@ -1,16 +1,36 @@
-from typing import Generator
+import math
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import AsyncGenerator, AsyncIterator, Generator
 
-from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
+from fastapi import Depends, HTTPException, Request, Response, status
+from fastapi.security import APIKeyHeader, OAuth2PasswordBearer
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
 from ..core.config import settings
-from ..core.security import decode_token
-from ..db import engine
-from ..models.user import User
+from ..core.security import api_key_prefix, decode_token, is_api_key, verify_api_key
+from ..db import ThreadedSession, async_engine, engine, replicas
+from ..models.user import ApiKey, User
+from ..services.cache import ResultCache
+from ..services.user_cache import cache_user, get_cached_user, user_cache_generation
 
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.api_v1_prefix}/auth/login")
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.api_v1_prefix}/auth/login", auto_error=False)
+api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
+
+SCOPE_LEVELS = {"read": 0, "write": 1, "admin": 2}
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+# Set on write responses so the browser's next reads stay on the primary in every worker.
+READ_PRIMARY_COOKIE = "rf_read_primary"
+
+# Users who wrote within settings.read_sticky_seconds, for clients that do not keep cookies.
+_recent_writers = ResultCache(
+    maxsize=10_000, ttl_seconds=settings.read_sticky_seconds, name="recent_writers", track_writes=False
+)
 
 
 def get_session() -> Generator[Session, None, None]:
@@ -18,9 +38,71 @@ def get_session() -> Generator[Session, None, None]:
         yield session
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)) -> User:
+@asynccontextmanager
+async def _async_session(sync_bind: Engine, async_bind: AsyncEngine | None) -> AsyncIterator[AsyncSession]:
+    if async_bind is not None:
+        async with AsyncSession(async_bind) as session:
+            yield session
+        return
+    session = ThreadedSession(Session(sync_bind))
+    try:
+        yield session
+    finally:
+        await session.close()
+
+
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    """Session for ``async def`` routes: an ``AsyncSession`` when ``settings.db_async`` is on.
+
+    Otherwise it yields a ``ThreadedSession`` offering the same awaitable
+    ``exec``/``get`` over the sync engine.
+    """
+    async with _async_session(engine, async_engine) as session:
+        yield session
+
+
+def _require_scope(request: Request, scope: str) -> None:
+    granted = getattr(request.state, "api_key_scope", None)
+    if granted is not None and SCOPE_LEVELS[granted] < SCOPE_LEVELS[scope]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"API key lacks the '{scope}' scope")
+
+
+async def _api_key_user(request: Request, key: str, session: AsyncSession) -> User:
+    """Resolve an API key (sent as ``X-API-Key`` or a bearer token) to its user without touching bcrypt."""
+    result = await session.exec(
+        select(ApiKey, User).join(User, User.id == ApiKey.user_id).where(ApiKey.prefix == api_key_prefix(key))
+    )
+    row = result.first()
+    if row is None or not verify_api_key(key, row[0].key_hash):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API key")
+    api_key, user = row
+    expired = api_key.expires_at is not None and api_key.expires_at <= datetime.utcnow()
+    if api_key.revoked_at is not None or expired:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="API key expired or revoked")
+    request.state.api_key_scope = api_key.scope
+    request.state.user_email = user.email
+    _require_scope(request, "read" if request.method in READ_METHODS else "write")
+    return user
+
+
+async def get_current_user(
+    request: Request,
+    token: str | None = Depends(oauth2_scheme),
+    api_key: str | None = Depends(api_key_header),
+    session: AsyncSession = Depends(get_async_session),
+) -> User:
+    credential = api_key or token
+    if not credential:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if is_api_key(credential):
+        return await _api_key_user(request, credential, session)
+
     try:
-        payload = decode_token(token)
+        payload = decode_token(credential)
     except ValueError as exc:  # invalid token
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials") from exc
 
@@ -28,19 +110,83 @@ def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Dep
     if not email:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
 
-    user = session.exec(select(User).where(User.email == email)).first()
+    request.state.user_email = email
+    user = get_cached_user(email)
+    if user is not None:
+        return user
+
+    generation = user_cache_generation()
+    user = (await session.exec(select(User).where(User.email == email))).first()
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    cache_user(user, generation)
     return user
 
 
-def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     if not current_user.is_active:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
     return current_user
 
 
-def get_current_superuser(current_user: User = Depends(get_current_active_user)) -> User:
+async def get_current_superuser(request: Request, current_user: User = Depends(get_current_active_user)) -> User:
     if not current_user.is_superuser:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient privileges")
+    _require_scope(request, "admin")
     return current_user
+
+
+def remember_write(request: Request, response: Response) -> None:
+    """Keep the user who made this write request on the primary for ``settings.read_sticky_seconds``."""
+    email = getattr(request.state, "user_email", None)
+    if email is None or not replicas.engines:
+        return
+    _recent_writers.set(email, True)
+    response.set_cookie(
+        READ_PRIMARY_COOKIE, "1", max_age=math.ceil(settings.read_sticky_seconds), httponly=True, samesite="lax"
+    )
+
+
+def _read_replica(request: Request, user: User) -> int | None:
+    """Replica to serve this read from, or ``None`` for the primary."""
+    if request.cookies.get(READ_PRIMARY_COOKIE) or _recent_writers.get(user.email):
+        return None
+    return replicas.pick()
+
+
+def get_read_session(request: Request, user: User = Depends(get_current_user)) -> Generator[Session, None, None]:
+    """Session for read-only GET routes, served by a read replica when one is configured and caught up.
+
+    Falls back to the primary when every replica lags more than
+    ``settings.replica_max_lag_seconds`` and, for read-your-writes, while the
+    user wrote something in the last ``settings.read_sticky_seconds``.
+    """
+    index = _read_replica(request, user)
+    with Session(engine if index is None else replicas.engines[index]) as session:
+        yield session
+
+
+def get_read_engine(request: Request, user: User = Depends(get_current_user)) -> Engine:
+    """Engine chosen like ``get_read_session``, for routes that open their own sessions (e.g. streamed exports)."""
+    index = _read_replica(request, user)
+    return engine if index is None else replicas.engines[index]
+
+
+async def get_async_read_session(
+    request: Request, user: User = Depends(get_current_user)
+) -> AsyncGenerator[AsyncSession, None]:
+    """``get_read_session`` for ``async def`` routes."""
+    index = None
+    if replicas.engines:
+        # A due lag check queries the replicas, so it must not run on the event loop.
+        if replicas.checks_due():
+            index = await run_in_threadpool(_read_replica, request, user)
+        else:
+            index = _read_replica(request, user)
+    if index is None:
+        sync_bind, async_bind = engine, async_engine
+    else:
+        sync_bind = replicas.engines[index]
+        async_bind = replicas.async_engines[index] if replicas.async_engines else None
+    async with _async_session(sync_bind, async_bind) as session:
+        yield session
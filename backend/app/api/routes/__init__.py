@@ -1,14 +1,19 @@
 from fastapi import APIRouter
 
 from . import (
+    admin,
+    api_keys,
     auth,
     customers,
     dashboard,
     expenses,
+    exports,
     farms,
+    imports,
     inventory,
     lots,
     price_references,
+    reports,
     roasts,
     sales,
     users,
@@ -27,6 +32,11 @@ api_router.include_router(price_references.router)
 api_router.include_router(sales.router)
 api_router.include_router(expenses.router)
 api_router.include_router(users.router)
+api_router.include_router(api_keys.router)
 api_router.include_router(dashboard.router)
+api_router.include_router(reports.router)
+api_router.include_router(imports.router)
+api_router.include_router(exports.router)
+api_router.include_router(admin.router)
 
 __all__ = ["api_router"]
@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+
+from ...db import async_engine, engine, pool_stats, replicas
+from ...models import User
+from ...schemas.admin import CacheStatsRead, PoolStatsRead, ReplicaStatusRead, SnapshotResult
+from ...services.cache import cache_stats
+from ...services.snapshot import take_snapshot
+from ..deps import get_current_superuser
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.post("/snapshot", response_model=SnapshotResult)
+async def create_snapshot(
+    incremental: bool = Query(default=False),
+    _: User = Depends(get_current_superuser),
+):
+    """Write a Parquet snapshot of the operational tables for offline analytics."""
+    manifest = await run_in_threadpool(take_snapshot, incremental=incremental)
+    return SnapshotResult.model_validate(manifest, from_attributes=True)
+
+
+@router.get("/caches", response_model=list[CacheStatsRead])
+def list_cache_stats(_: User = Depends(get_current_superuser)):
+    """Size and hit/miss counters of this worker's in-process caches."""
+    return [CacheStatsRead.model_validate(stats, from_attributes=True) for stats in cache_stats()]
+
+
+@router.get("/pool", response_model=PoolStatsRead)
+def read_pool_stats(
+    asynchronous: bool = Query(default=False, alias="async"),
+    _: User = Depends(get_current_superuser),
+):
+    """Connections and checkout waits of this worker's database pool; each uvicorn worker has its own.
+
+    ``?async=true`` reports the async engine's pool used by the async read endpoints.
+    """
+    bind = async_engine if asynchronous else engine
+    stats = pool_stats(bind) if bind is not None else None
+    if stats is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="El motor de base de datos no usa un pool medible"
+        )
+    return PoolStatsRead.model_validate(stats, from_attributes=True)
+
+
+@router.get("/replicas", response_model=list[ReplicaStatusRead])
+def list_replicas(_: User = Depends(get_current_superuser)):
+    """Replication lag of each configured read replica; unhealthy ones are skipped by the read routes."""
+    return [ReplicaStatusRead.model_validate(replica, from_attributes=True) for replica in replicas.status()]
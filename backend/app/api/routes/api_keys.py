@@ -0,0 +1,60 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlmodel import Session, select
+
+from ...core.security import generate_api_key, hash_api_key
+from ...models import ApiKey, ApiKeyCreate, ApiKeyCreated, ApiKeyRead, User
+from ..deps import get_current_superuser, get_session
+
+router = APIRouter(prefix="/api-keys", tags=["api-keys"])
+
+
+@router.get("/", response_model=list[ApiKeyRead])
+def list_api_keys(
+    session: Session = Depends(get_session),
+    _: User = Depends(get_current_superuser),
+) -> list[ApiKeyRead]:
+    return session.exec(select(ApiKey).order_by(ApiKey.id)).all()
+
+
+@router.post("/", response_model=ApiKeyCreated, status_code=status.HTTP_201_CREATED)
+def create_api_key(
+    payload: ApiKeyCreate,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_superuser),
+) -> ApiKeyCreated:
+    """Mint a key for a machine client; the full key is only returned by this call."""
+    user_id = payload.user_id if payload.user_id is not None else current_user.id
+    if session.get(User, user_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
+    prefix, key = generate_api_key()
+    api_key = ApiKey(
+        name=payload.name,
+        scope=payload.scope,
+        expires_at=payload.expires_at,
+        user_id=user_id,
+        prefix=prefix,
+        key_hash=hash_api_key(key),
+    )
+    session.add(api_key)
+    session.commit()
+    session.refresh(api_key)
+    return ApiKeyCreated(**ApiKeyRead.model_validate(api_key).model_dump(), key=key)
+
+
+@router.delete("/{api_key_id}", status_code=status.HTTP_204_NO_CONTENT)
+def revoke_api_key(
+    api_key_id: int,
+    session: Session = Depends(get_session),
+    _: User = Depends(get_current_superuser),
+) -> None:
+    api_key = session.get(ApiKey, api_key_id)
+    if not api_key:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="API key not found")
+    if api_key.revoked_at is None:
+        api_key.revoked_at = datetime.utcnow()
+        session.add(api_key)
+        session.commit()
+    return None
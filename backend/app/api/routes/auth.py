@@ -5,6 +5,7 @@ from sqlmodel import Session, select
 from ...core.security import create_access_token, get_password_hash, verify_password
 from ...models import User, UserCreate, UserRead
 from ...schemas.auth import Token
+from ...services.user_cache import invalidate_user
 from ..deps import get_current_active_user, get_current_superuser, get_session
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -41,6 +42,7 @@ def register_user(
         hashed_password=get_password_hash(payload.password),
     )
     session.add(user)
+    invalidate_user(session, user.email)
     session.commit()
     session.refresh(user)
     return user
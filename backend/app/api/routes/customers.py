@@ -1,15 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from ...models import Customer, CustomerCreate, CustomerRead, CustomerUpdate
-from ..deps import get_current_active_user, get_session
+from ..deps import get_async_session, get_current_active_user, get_session
 
 router = APIRouter(prefix="/customers", tags=["customers"])
 
 
 @router.get("/", response_model=list[CustomerRead])
-def list_customers(session: Session = Depends(get_session), _: object = Depends(get_current_active_user)):
-    return session.exec(select(Customer)).all()
+async def list_customers(
+    session: AsyncSession = Depends(get_async_session),
+    _: object = Depends(get_current_active_user),
+):
+    return (await session.exec(select(Customer))).all()
 
 
 @router.post("/", response_model=CustomerRead, status_code=status.HTTP_201_CREATED)
@@ -1,101 +1,155 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy import func
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import ColumnElement, Select, case, func, true
 from sqlalchemy.orm import selectinload
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from ...models import CoffeeLot, Expense, RoastBatch, Sale
-from ...schemas.dashboard import CashSummary, DashboardSummary, InventorySummary
-from ..deps import get_current_active_user, get_session
+from ...models import CoffeeLot, DailyCoffeeRollup, DailyExpenseRollup, Expense, LotStock, RoastBatch, RoastStock, Sale
+from ...schemas.dashboard import (
+    CashSummary,
+    DashboardSummary,
+    InventorySummary,
+    Timeseries,
+    TimeseriesPoint,
+)
+from ..deps import get_async_read_session, get_current_active_user, get_read_session
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
 RECENT_LIMIT = 5
 
+TimeseriesMetric = Literal["revenue", "grams_sold", "green_purchased", "expenses", "avg_shrinkage"]
+Granularity = Literal["day", "week", "month"]
 
-@router.get("/summary", response_model=DashboardSummary)
-def get_dashboard_summary(
-    session: Session = Depends(get_session),
-    _: object = Depends(get_current_active_user),
-) -> DashboardSummary:
-    total_green_purchased = session.exec(
-        select(func.coalesce(func.sum(CoffeeLot.green_weight_g), 0.0))
-    ).one()
-    total_roasted_produced = session.exec(
-        select(func.coalesce(func.sum(RoastBatch.roasted_output_g), 0.0))
-    ).one()
-    total_green_used = session.exec(
-        select(func.coalesce(func.sum(RoastBatch.green_input_g), 0.0))
-    ).one()
-    total_roasted_sold = session.exec(
-        select(func.coalesce(func.sum(Sale.total_quantity_g), 0.0))
-    ).one()
-    total_sales_quantity = total_roasted_sold
-
-    purchase_costs = session.exec(
+# metric -> (numerator column, denominator column or None)
+_COFFEE_METRICS = {
+    "revenue": (DailyCoffeeRollup.revenue, None),
+    "grams_sold": (DailyCoffeeRollup.sold_g, None),
+    "green_purchased": (DailyCoffeeRollup.green_purchased_g, None),
+    "avg_shrinkage": (DailyCoffeeRollup.shrinkage_pct_sum, DailyCoffeeRollup.roast_count),
+}
+
+
+def _sum(expression) -> ColumnElement[float]:
+    return func.coalesce(func.sum(expression), 0.0)
+
+
+def _summary_totals_statement() -> Select:
+    """Build the statement that returns every dashboard aggregate in one row.
+
+    Each table is aggregated once in its own CTE; the single-row CTEs are then
+    cross joined. Green lots are valued from their stored remaining grams and
+    roasted stock at each roast's cost per gram.
+    """
+    remaining_g = LotStock.remaining_g
+    lot_totals = (
         select(
-            func.coalesce(
-                func.sum(CoffeeLot.green_weight_g * (CoffeeLot.price_per_kg / 1000.0)),
-                0.0,
-            )
+            _sum(CoffeeLot.green_weight_g).label("green_purchased_g"),
+            _sum(CoffeeLot.green_weight_g * (CoffeeLot.price_per_kg / 1000.0)).label("purchase_costs"),
+            _sum(case((remaining_g > 0, remaining_g), else_=0.0) / 1000.0 * CoffeeLot.price_per_kg).label(
+                "green_inventory_value"
+            ),
         )
-    ).one()
-    total_sales_amount = session.exec(
-        select(func.coalesce(func.sum(Sale.total_price), 0.0))
-    ).one()
-    total_expenses_amount = session.exec(
-        select(func.coalesce(func.sum(Expense.amount), 0.0))
-    ).one()
-
-    green_available = total_green_purchased - total_green_used
-    roasted_available = total_roasted_produced - total_roasted_sold
-    average_price_per_g = total_sales_amount / total_sales_quantity if total_sales_quantity > 0 else 0.0
+        .select_from(CoffeeLot)
+        .join(LotStock, LotStock.lot_id == CoffeeLot.id, isouter=True)
+        .cte("lot_totals")
+    )
 
-    usage_by_lot = {
-        lot_id: used
-        for lot_id, used in session.exec(
-            select(RoastBatch.lot_id, func.coalesce(func.sum(RoastBatch.green_input_g), 0.0)).group_by(RoastBatch.lot_id)
+    roast_totals = (
+        select(
+            _sum(RoastBatch.roasted_output_g).label("roasted_produced_g"),
+            _sum(RoastBatch.green_input_g).label("green_used_g"),
+            _sum(
+                case((RoastStock.available_g > 0, RoastStock.available_g * RoastBatch.cost_per_g), else_=0.0)
+            ).label("roasted_inventory_value"),
         )
-    }
+        .select_from(RoastBatch)
+        .join(RoastStock, RoastStock.roast_batch_id == RoastBatch.id, isouter=True)
+        .cte("roast_totals")
+    )
+
+    balance = Sale.total_price - func.coalesce(Sale.amount_paid, 0.0)
+    sale_totals = select(
+        _sum(Sale.total_quantity_g).label("roasted_sold_g"),
+        _sum(Sale.total_price).label("sales_amount"),
+        _sum(case((Sale.total_price > func.coalesce(Sale.amount_paid, 0.0) + 1e-6, balance), else_=0.0)).label(
+            "debt"
+        ),
+    ).cte("sale_totals")
+
+    expense_totals = select(_sum(Expense.amount).label("expenses_amount")).cte("expense_totals")
+
+    return select(
+        lot_totals.c.green_purchased_g,
+        lot_totals.c.purchase_costs,
+        lot_totals.c.green_inventory_value,
+        roast_totals.c.roasted_produced_g,
+        roast_totals.c.green_used_g,
+        roast_totals.c.roasted_inventory_value,
+        sale_totals.c.roasted_sold_g,
+        sale_totals.c.sales_amount,
+        sale_totals.c.debt,
+        expense_totals.c.expenses_amount,
+    ).select_from(
+        lot_totals.join(roast_totals, true())
+        .join(sale_totals, true())
+        .join(expense_totals, true())
+    )
+
 
-    lots = session.exec(select(CoffeeLot)).all()
-    green_inventory_value = 0.0
-    for lot in lots:
-        used = usage_by_lot.get(lot.id, 0.0)
-        remaining = max(lot.green_weight_g - used, 0.0)
-        green_inventory_value += (remaining / 1000.0) * lot.price_per_kg
+@router.get("/summary", response_model=DashboardSummary)
+async def get_dashboard_summary(
+    session: AsyncSession = Depends(get_async_read_session),
+    _: object = Depends(get_current_active_user),
+) -> DashboardSummary:
+    totals = (await session.exec(_summary_totals_statement())).one()
+    (
+        total_green_purchased,
+        purchase_costs,
+        green_inventory_value,
+        total_roasted_produced,
+        total_green_used,
+        roasted_inventory_value,
+        total_roasted_sold,
+        total_sales_amount,
+        total_debt,
+        total_expenses_amount,
+    ) = (float(value) for value in totals)
 
-    roasted_inventory_value = max(roasted_available, 0.0) * average_price_per_g
+    green_available = total_green_purchased - total_green_used
+    roasted_available = total_roasted_produced - total_roasted_sold
     coffee_inventory_value = green_inventory_value + roasted_inventory_value
     expected_cash = total_sales_amount - (total_expenses_amount + purchase_costs)
 
-    recent_purchases = session.exec(
-        select(CoffeeLot)
-        .order_by(CoffeeLot.purchase_date.desc(), CoffeeLot.id.desc())
-        .limit(RECENT_LIMIT)
+    recent_purchases = (
+        await session.exec(
+            select(CoffeeLot)
+            .order_by(CoffeeLot.purchase_date.desc(), CoffeeLot.id.desc())
+            .limit(RECENT_LIMIT)
+        )
     ).all()
 
-    recent_expenses = session.exec(
-        select(Expense)
-        .order_by(Expense.expense_date.desc(), Expense.id.desc())
-        .limit(RECENT_LIMIT)
+    recent_expenses = (
+        await session.exec(
+            select(Expense)
+            .order_by(Expense.expense_date.desc(), Expense.id.desc())
+            .limit(RECENT_LIMIT)
+        )
     ).all()
 
-    recent_sales = session.exec(
-        select(Sale)
-        .options(selectinload(Sale.items))
-        .order_by(Sale.sale_date.desc(), Sale.id.desc())
-        .limit(RECENT_LIMIT)
+    recent_sales = (
+        await session.exec(
+            select(Sale)
+            .options(selectinload(Sale.items))
+            .order_by(Sale.sale_date.desc(), Sale.id.desc())
+            .limit(RECENT_LIMIT)
+        )
     ).all()
 
-    total_debt = session.exec(
-        select(
-            func.coalesce(
-                func.sum(Sale.total_price - func.coalesce(Sale.amount_paid, 0.0)),
-                0.0,
-            )
-        ).where(Sale.total_price > func.coalesce(Sale.amount_paid, 0.0) + 1e-6)
-    ).one()
-
     return DashboardSummary(
         cash=CashSummary(
             expected_cash=expected_cash,
@@ -115,3 +169,68 @@ def get_dashboard_summary(
         recent_expenses=recent_expenses,
         recent_sales=recent_sales,
     )
+
+
+def _period_start(day: date, granularity: Granularity) -> date:
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+@router.get("/timeseries", response_model=Timeseries)
+def get_timeseries(
+    metric: TimeseriesMetric = Query(...),
+    granularity: Granularity = Query(default="day"),
+    date_from: date | None = Query(default=None, alias="from"),
+    date_to: date | None = Query(default=None, alias="to"),
+    variety_id: int | None = Query(default=None),
+    process: str | None = Query(default=None),
+    session: Session = Depends(get_read_session),
+    _: object = Depends(get_current_active_user),
+) -> Timeseries:
+    """Serve a metric over time from the daily rollup tables.
+
+    Weeks start on Monday. ``variety_id`` and ``process`` filter every metric
+    except ``expenses``.
+    """
+    if metric == "expenses":
+        day_column = DailyExpenseRollup.day
+        statement = select(day_column, func.sum(DailyExpenseRollup.amount), func.count())
+    else:
+        numerator, denominator = _COFFEE_METRICS[metric]
+        day_column = DailyCoffeeRollup.day
+        statement = select(
+            day_column,
+            func.sum(numerator),
+            func.sum(denominator) if denominator is not None else func.count(),
+        )
+        if variety_id is not None:
+            statement = statement.where(DailyCoffeeRollup.variety_id == variety_id)
+        if process is not None:
+            statement = statement.where(DailyCoffeeRollup.process == process)
+
+    if date_from is not None:
+        statement = statement.where(day_column >= date_from)
+    if date_to is not None:
+        statement = statement.where(day_column <= date_to)
+    statement = statement.group_by(day_column).order_by(day_column)
+
+    totals: dict[date, list[float]] = defaultdict(lambda: [0.0, 0.0])
+    for day, numerator_total, denominator_total in session.exec(statement):
+        bucket = totals[_period_start(day, granularity)]
+        bucket[0] += float(numerator_total or 0.0)
+        bucket[1] += float(denominator_total or 0.0)
+
+    points: list[TimeseriesPoint] = []
+    for period, (numerator_total, denominator_total) in sorted(totals.items()):
+        if metric == "avg_shrinkage":
+            if denominator_total <= 0:
+                continue
+            value = numerator_total / denominator_total
+        else:
+            value = numerator_total
+        points.append(TimeseriesPoint(period=period, value=value))
+
+    return Timeseries(metric=metric, granularity=granularity, points=points)
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlmodel import Session, select
 
 from ...models import Expense, ExpenseCreate, ExpenseRead, ExpenseUpdate
+from ...services.rollups import apply_expense
 from ..deps import get_current_active_user, get_session
 
 router = APIRouter(prefix="/expenses", tags=["expenses"])
@@ -19,6 +20,7 @@ def create_expense(
     _: object = Depends(get_current_active_user),
 ):
     expense = Expense.model_validate(payload)
+    apply_expense(session, expense)
     session.add(expense)
     session.commit()
     session.refresh(expense)
@@ -49,8 +51,10 @@ def update_expense(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Expense not found")
 
     update_data = payload.dict(exclude_unset=True)
+    apply_expense(session, expense, sign=-1)
     for key, value in update_data.items():
         setattr(expense, key, value)
+    apply_expense(session, expense)
 
     session.add(expense)
     session.commit()
@@ -67,6 +71,7 @@ def delete_expense(
     expense = session.get(Expense, expense_id)
     if not expense:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Expense not found")
+    apply_expense(session, expense, sign=-1)
     session.delete(expense)
     session.commit()
     return None
@@ -0,0 +1,29 @@
+from datetime import date
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.engine import Engine
+
+from ...services.exporter import MEDIA_TYPES, ExportEntity, ExportFormat, export_filename, stream_export
+from ..deps import get_current_active_user, get_read_engine
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+
+@router.get("/{entity}")
+def export_records(
+    entity: ExportEntity,
+    fmt: ExportFormat = Query(default="csv", alias="format"),
+    date_from: date | None = Query(default=None, alias="from"),
+    date_to: date | None = Query(default=None, alias="to"),
+    gzip: bool = Query(default=False),
+    bind: Engine = Depends(get_read_engine),
+    _: object = Depends(get_current_active_user),
+):
+    """Stream every row of ``entity`` as a file download, optionally gzip-compressed."""
+    filename = export_filename(entity, fmt, gzip)
+    return StreamingResponse(
+        stream_export(entity, fmt, date_from=date_from, date_to=date_to, gzip=gzip, bind=bind),
+        media_type="application/gzip" if gzip else MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
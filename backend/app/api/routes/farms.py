@@ -1,15 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from ...models import Farm, FarmCreate, FarmRead, FarmUpdate
-from ..deps import get_current_active_user, get_session
+from ..deps import get_async_session, get_current_active_user, get_session
 
 router = APIRouter(prefix="/farms", tags=["farms"])
 
 
 @router.get("/", response_model=list[FarmRead])
-def list_farms(session: Session = Depends(get_session), _: object = Depends(get_current_active_user)):
-    return session.exec(select(Farm)).all()
+async def list_farms(
+    session: AsyncSession = Depends(get_async_session),
+    _: object = Depends(get_current_active_user),
+):
+    return (await session.exec(select(Farm))).all()
 
 
 @router.post("/", response_model=FarmRead, status_code=status.HTTP_201_CREATED)
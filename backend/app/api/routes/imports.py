@@ -0,0 +1,43 @@
+from tempfile import SpooledTemporaryFile
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.concurrency import run_in_threadpool
+
+from ...schemas.imports import ImportResult
+from ...services.importer import Entity, ImportFormat, import_stream
+from ...services.similarity import roast_index
+from ..deps import get_current_active_user
+
+router = APIRouter(prefix="/import", tags=["import"])
+
+MAX_REJECTS_RETURNED = 1000
+# Uploads larger than this are spooled to disk instead of memory.
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+
+@router.post("/{entity}", response_model=ImportResult)
+async def import_records(
+    entity: Entity,
+    request: Request,
+    fmt: Optional[ImportFormat] = Query(default=None, alias="format"),
+    _: object = Depends(get_current_active_user),
+):
+    """Import a CSV or NDJSON file sent as the request body.
+
+    Valid rows are committed in chunks even when others are rejected; the
+    first ``MAX_REJECTS_RETURNED`` rejects are returned with their line and
+    error.
+    """
+    if fmt is None:
+        fmt = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    with SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as upload:
+        async for chunk in request.stream():
+            upload.write(chunk)
+        upload.seek(0)
+        summary = await run_in_threadpool(
+            import_stream, upload, entity, fmt, max_rejects_kept=MAX_REJECTS_RETURNED
+        )
+    if entity == "roasts" and summary.imported:
+        roast_index.invalidate()
+    return ImportResult.model_validate(summary, from_attributes=True)
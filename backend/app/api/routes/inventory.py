@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import func
 from sqlalchemy.sql import Select
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from ...models import (
     CoffeeLot,
@@ -11,38 +11,21 @@ from ...models import (
     RoastInventoryAdjustmentCreate,
     RoastInventoryAdjustmentRead,
     RoastInventoryAdjustmentUpdate,
-    SaleItem,
+    RoastStock,
     Variety,
 )
 from ...schemas.inventory import RoastedInventoryEntry
-from ..deps import get_current_active_user, get_session
+from ...services.stock import apply_adjustment
+from ..deps import get_async_read_session, get_current_active_user, get_session
 
 router = APIRouter(prefix="/inventory", tags=["inventory"])
 
 
 @router.get("/roasted", response_model=list[RoastedInventoryEntry])
-def list_roasted_inventory(
-    session: Session = Depends(get_session),
+async def list_roasted_inventory(
+    session: AsyncSession = Depends(get_async_read_session),
     _: object = Depends(get_current_active_user),
 ) -> list[RoastedInventoryEntry]:
-    sold_subquery = (
-        select(
-            SaleItem.roast_batch_id,
-            func.coalesce(func.sum(SaleItem.bag_size_g * SaleItem.bags), 0.0).label("sold_g"),
-        )
-        .group_by(SaleItem.roast_batch_id)
-        .subquery()
-    )
-
-    adjustments_subquery = (
-        select(
-            RoastInventoryAdjustment.roast_batch_id,
-            func.coalesce(func.sum(RoastInventoryAdjustment.adjustment_g), 0.0).label("adjustments_g"),
-        )
-        .group_by(RoastInventoryAdjustment.roast_batch_id)
-        .subquery()
-    )
-
     statement: Select = (
         select(
             RoastBatch.id,
@@ -56,18 +39,18 @@ def list_roasted_inventory(
             CoffeeLot.process,
             Farm.name.label("farm_name"),
             Variety.name.label("variety_name"),
-            func.coalesce(sold_subquery.c.sold_g, 0.0).label("sold_g"),
-            func.coalesce(adjustments_subquery.c.adjustments_g, 0.0).label("adjustments_g"),
+            RoastStock.sold_g,
+            RoastStock.adjusted_g,
+            RoastStock.available_g,
         )
         .join(CoffeeLot, CoffeeLot.id == RoastBatch.lot_id)
         .join(Farm, Farm.id == CoffeeLot.farm_id)
         .join(Variety, Variety.id == CoffeeLot.variety_id)
-        .join(sold_subquery, sold_subquery.c.roast_batch_id == RoastBatch.id, isouter=True)
-        .join(adjustments_subquery, adjustments_subquery.c.roast_batch_id == RoastBatch.id, isouter=True)
+        .join(RoastStock, RoastStock.roast_batch_id == RoastBatch.id)
         .order_by(RoastBatch.roast_date.desc(), RoastBatch.id.desc())
     )
 
-    rows = session.exec(statement).all()
+    rows = (await session.exec(statement)).all()
 
     inventory: list[RoastedInventoryEntry] = []
     for row in rows:
@@ -85,8 +68,8 @@ def list_roasted_inventory(
             variety_name,
             sold_g,
             adjustments_g,
+            available_g,
         ) = row
-        available_g = float(roasted_output_g) - float(sold_g) + float(adjustments_g)
         inventory.append(
             RoastedInventoryEntry(
                 roast_id=roast_id,
@@ -100,7 +83,7 @@ def list_roasted_inventory(
                 roasted_output_g=float(roasted_output_g),
                 sold_g=float(sold_g),
                 adjustments_g=float(adjustments_g),
-                available_g=available_g,
+                available_g=float(available_g),
                 shrinkage_pct=float(shrinkage_pct or 0.0),
                 notes=notes,
             )
@@ -139,6 +122,7 @@ def create_adjustment(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tostión no encontrada")
 
     adjustment = RoastInventoryAdjustment.model_validate(payload)
+    apply_adjustment(session, adjustment.roast_batch_id, adjustment.adjustment_g)
     session.add(adjustment)
     session.commit()
     session.refresh(adjustment)
@@ -166,8 +150,10 @@ def update_adjustment(
         if not roast:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tostión no encontrada")
 
+    apply_adjustment(session, adjustment.roast_batch_id, -adjustment.adjustment_g)
     for key, value in update_data.items():
         setattr(adjustment, key, value)
+    apply_adjustment(session, adjustment.roast_batch_id, adjustment.adjustment_g)
 
     session.add(adjustment)
     session.commit()
@@ -185,6 +171,7 @@ def delete_adjustment(
     if not adjustment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ajuste no encontrado")
 
+    apply_adjustment(session, adjustment.roast_batch_id, -adjustment.adjustment_g)
     session.delete(adjustment)
     session.commit()
     return None
@@ -1,15 +1,29 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from ...models import CoffeeLot, CoffeeLotCreate, CoffeeLotRead, CoffeeLotUpdate
-from ..deps import get_current_active_user, get_session
+from ...models import CoffeeLot, CoffeeLotCreate, CoffeeLotRead, CoffeeLotUpdate, LotStock
+from ...services.costing import recompute_lot_costs
+from ...services.green_stock import create_lot_stock, delete_lot_stock, sync_lot_weight
+from ...services.rollups import apply_lot
+from ...services.shrinkage import apply_lot_shrinkage
+from ...services.similarity import roast_index
+from ..deps import get_async_session, get_current_active_user, get_session
 
 router = APIRouter(prefix="/lots", tags=["coffee lots"])
 
 
+def _lot_read(lot: CoffeeLot, remaining_g: float | None) -> CoffeeLotRead:
+    return CoffeeLotRead.model_validate(lot, update={"remaining_g": remaining_g})
+
+
 @router.get("/", response_model=list[CoffeeLotRead])
-def list_lots(session: Session = Depends(get_session), _: object = Depends(get_current_active_user)):
-    return session.exec(select(CoffeeLot)).all()
+async def list_lots(
+    session: AsyncSession = Depends(get_async_session),
+    _: object = Depends(get_current_active_user),
+):
+    statement = select(CoffeeLot, LotStock.remaining_g).join(LotStock, LotStock.lot_id == CoffeeLot.id, isouter=True)
+    return [_lot_read(lot, remaining_g) for lot, remaining_g in await session.exec(statement)]
 
 
 @router.post("/", response_model=CoffeeLotRead, status_code=status.HTTP_201_CREATED)
@@ -19,10 +33,13 @@ def create_lot(
     _: object = Depends(get_current_active_user),
 ):
     lot = CoffeeLot.model_validate(payload)
+    apply_lot(session, lot)
     session.add(lot)
+    session.flush()
+    remaining_g = create_lot_stock(session, lot).remaining_g
     session.commit()
     session.refresh(lot)
-    return lot
+    return _lot_read(lot, remaining_g)
 
 
 @router.get("/{lot_id}", response_model=CoffeeLotRead)
@@ -34,7 +51,8 @@ def get_lot(
     lot = session.get(CoffeeLot, lot_id)
     if not lot:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Lot not found")
-    return lot
+    stock = session.get(LotStock, lot_id)
+    return _lot_read(lot, stock.remaining_g if stock else None)
 
 
 @router.put("/{lot_id}", response_model=CoffeeLotRead)
@@ -49,13 +67,35 @@ def update_lot(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Lot not found")
 
     update_data = payload.dict(exclude_unset=True)
+    history_changed = any(
+        update_data.get(key, getattr(lot, key)) != getattr(lot, key) for key in ("variety_id", "process")
+    )
+    previous_weight_g = lot.green_weight_g
+    apply_lot(session, lot, sign=-1, include_history=history_changed)
+    if history_changed:
+        apply_lot_shrinkage(session, lot, sign=-1)
     for key, value in update_data.items():
         setattr(lot, key, value)
+    apply_lot(session, lot, include_history=history_changed)
+    if history_changed:
+        apply_lot_shrinkage(session, lot)
+    if "price_per_kg" in update_data:
+        recompute_lot_costs(session, lot)
+
+    stock = sync_lot_weight(session, lot)
+    remaining_g = stock.remaining_g
+    if lot.green_weight_g < previous_weight_g and remaining_g < 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"El peso del lote no puede ser menor al café verde ya tostado ({stock.roasted_g:.0f} g)",
+        )
 
     session.add(lot)
     session.commit()
     session.refresh(lot)
-    return lot
+    if history_changed:
+        roast_index.refresh_lot(session, lot.id)
+    return _lot_read(lot, remaining_g)
 
 
 @router.delete("/{lot_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -67,6 +107,8 @@ def delete_lot(
     lot = session.get(CoffeeLot, lot_id)
     if not lot:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Lot not found")
+    apply_lot(session, lot, sign=-1)
+    delete_lot_stock(session, lot.id)
     session.delete(lot)
     session.commit()
     return None
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from ...models import (
     PriceReference,
@@ -7,19 +8,19 @@ from ...models import (
     PriceReferenceRead,
     PriceReferenceUpdate,
 )
-from ..deps import get_current_active_user, get_session
+from ..deps import get_async_session, get_current_active_user, get_session
 
 
 router = APIRouter(prefix="/price-references", tags=["price references"])
 
 
 @router.get("/", response_model=list[PriceReferenceRead])
-def list_price_references(
-    session: Session = Depends(get_session),
+async def list_price_references(
+    session: AsyncSession = Depends(get_async_session),
     _: object = Depends(get_current_active_user),
 ):
     statement = select(PriceReference).order_by(PriceReference.bag_size_g, PriceReference.id)
-    return session.exec(statement).all()
+    return (await session.exec(statement)).all()
 
 
 @router.post("/", response_model=PriceReferenceRead, status_code=status.HTTP_201_CREATED)
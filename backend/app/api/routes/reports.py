@@ -0,0 +1,104 @@
+from datetime import date
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from ...models import CoffeeLot, Farm, RoastBatch, Sale, SaleItem, Variety
+from ...schemas.reports import ProfitabilityReport, ProfitabilityRow
+from ...services.cache import ResultCache, data_version
+from ..deps import get_current_active_user, get_session
+
+router = APIRouter(prefix="/reports", tags=["reports"])
+
+Dimension = Literal["farm", "variety", "process", "roast_level", "bag_size"]
+
+# dimension -> (row field, column) pairs selected and grouped for it
+_DIMENSIONS = {
+    "farm": (("farm_id", Farm.id), ("farm_name", Farm.name)),
+    "variety": (("variety_id", Variety.id), ("variety_name", Variety.name)),
+    "process": (("process", CoffeeLot.process),),
+    "roast_level": (("roast_level", RoastBatch.roast_level),),
+    "bag_size": (("bag_size_g", SaleItem.bag_size_g),),
+}
+
+_profitability_cache = ResultCache(maxsize=256, name="profitability")
+
+
+def _profitability_rows(
+    session: Session,
+    group_by: tuple[str, ...],
+    date_from: date | None,
+    date_to: date | None,
+) -> list[ProfitabilityRow]:
+    fields = [field for dimension in group_by for field in _DIMENSIONS[dimension]]
+    grams = SaleItem.bag_size_g * SaleItem.bags
+    revenue = func.sum(func.round(SaleItem.bag_price) * SaleItem.bags)
+    grams_sold = func.sum(grams)
+
+    statement = (
+        select(
+            *(column for _, column in fields),
+            revenue,
+            grams_sold,
+            func.sum(SaleItem.cost_of_goods),
+            func.sum(RoastBatch.shrinkage_pct * grams),
+        )
+        .select_from(SaleItem)
+        .join(Sale, Sale.id == SaleItem.sale_id)
+        .join(RoastBatch, RoastBatch.id == SaleItem.roast_batch_id)
+        .join(CoffeeLot, CoffeeLot.id == RoastBatch.lot_id)
+        .join(Farm, Farm.id == CoffeeLot.farm_id)
+        .join(Variety, Variety.id == CoffeeLot.variety_id)
+        .group_by(*(column for _, column in fields))
+        .order_by(revenue.desc())
+    )
+    if date_from is not None:
+        statement = statement.where(Sale.sale_date >= date_from)
+    if date_to is not None:
+        statement = statement.where(Sale.sale_date <= date_to)
+
+    rows: list[ProfitabilityRow] = []
+    for row in session.exec(statement):
+        dimensions = dict(zip((name for name, _ in fields), row[: len(fields)]))
+        revenue_total, grams_total, cogs_total, weighted_shrinkage = (
+            float(value or 0.0) for value in row[len(fields) :]
+        )
+        margin = revenue_total - cogs_total
+        rows.append(
+            ProfitabilityRow(
+                **dimensions,
+                revenue=revenue_total,
+                grams_sold=grams_total,
+                cogs=cogs_total,
+                margin=margin,
+                margin_pct=(margin / revenue_total * 100) if revenue_total else 0.0,
+                shrinkage_pct=(weighted_shrinkage / grams_total) if grams_total else 0.0,
+            )
+        )
+    return rows
+
+
+@router.get("/profitability", response_model=ProfitabilityReport)
+def get_profitability(
+    group_by: list[Dimension] = Query(default=["variety"]),
+    date_from: date | None = Query(default=None, alias="from"),
+    date_to: date | None = Query(default=None, alias="to"),
+    session: Session = Depends(get_session),
+    _: object = Depends(get_current_active_user),
+) -> ProfitabilityReport:
+    """Revenue, cost of goods, margin and shrinkage per group of sold items.
+
+    Shrinkage is the grams-sold weighted average of the roasts' shrinkage.
+    Results are cached per parameter set until the next write.
+    """
+    dimensions = tuple(dict.fromkeys(group_by))
+    cache_key = (dimensions, date_from, date_to)
+    rows = _profitability_cache.get(cache_key)
+    if rows is None:
+        version = data_version()
+        rows = _profitability_rows(session, dimensions, date_from, date_to)
+        _profitability_cache.set(cache_key, rows, version=version)
+
+    return ProfitabilityReport(group_by=list(dimensions), date_from=date_from, date_to=date_to, rows=rows)
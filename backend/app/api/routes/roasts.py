@@ -1,11 +1,72 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from collections import defaultdict
+from typing import Literal, Mapping
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
 from sqlmodel import Session, select
 
-from ...models import RoastBatch, RoastBatchCreate, RoastBatchRead, RoastBatchUpdate
+from ...models import RoastBatch, RoastBatchCreate, RoastBatchRead, RoastBatchUpdate, RoastCurve
+from ...schemas.roasts import (
+    BulkRoastError,
+    BulkRoastResult,
+    RoastBatchCreated,
+    ShrinkageStatsReport,
+    SimilarRoast,
+)
+from ...schemas.telemetry import RoastCurvePoints, RoastCurveRead, RoastCurveSummary
+from ...services.costing import recompute_roast_costs, set_roast_cost
+from ...services.curves import downsampled_curves
+from ...services.green_stock import DRIFT_TOLERANCE_G, apply_roasted, lock_lot_stock
+from ...services.roasting import insert_roasts, validate_roasts
+from ...services.rollups import apply_roast
+from ...services.shrinkage import (
+    OUTLIER_ZSCORE,
+    Dimension,
+    apply_roast_shrinkage,
+    shrinkage_report,
+    shrinkage_zscore,
+)
+from ...services.similarity import roast_index
+from ...services.stock import create_stock, delete_stock, sync_roast_output
+from ...services.telemetry import (
+    CurveSamples,
+    TelemetryError,
+    TelemetryUpload,
+    curve_series,
+    delete_curve,
+    store_curves,
+)
 from ..deps import get_current_active_user, get_session
 
 router = APIRouter(prefix="/roasts", tags=["roasts"])
 
+MAX_CURVE_POINTS = 2000
+MAX_CURVES_PER_REQUEST = 100
+MAX_SIMILAR_ROASTS = 100
+MAX_BULK_ROASTS = 500
+
+
+def _consume_green(session: Session, green_by_lot: Mapping[int, float]) -> None:
+    """Apply green-coffee deltas per lot, rejecting any lot that would go negative.
+
+    The lot stock rows stay locked until the transaction ends, so concurrent
+    roasts of the same lot are serialised.
+    """
+    stocks = lock_lot_stock(session, green_by_lot)
+    for lot_id, grams in green_by_lot.items():
+        if grams <= DRIFT_TOLERANCE_G:
+            continue
+        stock = stocks.get(lot_id)
+        if stock is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Lot not found")
+        available = max(stock.remaining_g, 0.0)
+        if grams > available + DRIFT_TOLERANCE_G:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"No hay suficiente café verde en el lote seleccionado. Disponible: {available:.0f} g",
+            )
+    apply_roasted(session, green_by_lot, stocks)
+
 
 def _calculate_shrinkage(green_input: float, roasted_output: float) -> float:
     if green_input <= 0:
@@ -14,12 +75,63 @@ def _calculate_shrinkage(green_input: float, roasted_output: float) -> float:
     return (loss / green_input) * 100
 
 
+def _created(roast: RoastBatch, zscore: float | None) -> RoastBatchCreated:
+    return RoastBatchCreated(
+        **roast.model_dump(),
+        shrinkage_zscore=zscore,
+        shrinkage_outlier=zscore is not None and abs(zscore) > OUTLIER_ZSCORE,
+    )
+
+
+async def _read_telemetry(request: Request, fmt: str | None, roast_id: int | None = None) -> dict[int, CurveSamples]:
+    if fmt is None:
+        fmt = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    try:
+        upload = TelemetryUpload(fmt, roast_id)
+        async for chunk in request.stream():
+            upload.feed(chunk)
+        return upload.finish()
+    except (TelemetryError, UnicodeDecodeError) as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+
+
+def _save_telemetry(session: Session, curves: dict[int, CurveSamples]) -> list[RoastCurveSummary]:
+    found = set(session.exec(select(RoastBatch.id).where(RoastBatch.id.in_(curves))).all())
+    missing = sorted(set(curves) - found)
+    if missing:
+        detail = f"Roast not found: {', '.join(str(roast_id) for roast_id in missing)}"
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=detail)
+    try:
+        stored = store_curves(session, curves)
+    except TelemetryError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    summaries = [RoastCurveSummary.model_validate(curve, from_attributes=True) for curve in stored]
+    session.commit()
+    roast_index.refresh(session, curves)
+    return summaries
+
+
 @router.get("/", response_model=list[RoastBatchRead])
 def list_roasts(session: Session = Depends(get_session), _: object = Depends(get_current_active_user)):
     return session.exec(select(RoastBatch)).all()
 
 
-@router.post("/", response_model=RoastBatchRead, status_code=status.HTTP_201_CREATED)
+@router.get("/stats", response_model=ShrinkageStatsReport)
+def get_shrinkage_stats(
+    group_by: Dimension = Query(default="all"),
+    z: float = Query(default=OUTLIER_ZSCORE, gt=0),
+    percentiles: bool = Query(default=False),
+    session: Session = Depends(get_session),
+    _: object = Depends(get_current_active_user),
+):
+    """Shrinkage mean and standard deviation per group, plus roasts beyond ``z`` deviations.
+
+    ``percentiles=true`` adds p10-p90 per group, which reads every roast.
+    """
+    return shrinkage_report(session, group_by, z, percentiles)
+
+
+@router.post("/", response_model=RoastBatchCreated, status_code=status.HTTP_201_CREATED)
 def create_roast(
     payload: RoastBatchCreate,
     session: Session = Depends(get_session),
@@ -29,11 +141,139 @@ def create_roast(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Green input must be greater than zero")
 
     roast = RoastBatch.model_validate(payload)
+    _consume_green(session, {roast.lot_id: roast.green_input_g})
     roast.shrinkage_pct = _calculate_shrinkage(roast.green_input_g, roast.roasted_output_g)
+    set_roast_cost(session, roast)
     session.add(roast)
+    session.flush()
+    create_stock(session, roast)
+    apply_roast(session, roast)
+    zscore = shrinkage_zscore(session, roast)
+    apply_roast_shrinkage(session, roast)
     session.commit()
     session.refresh(roast)
-    return roast
+    roast_index.refresh(session, [roast.id])
+    return _created(roast, zscore)
+
+
+@router.get("/curves", response_model=list[RoastCurvePoints])
+def get_roast_curves(
+    ids: list[int] = Query(..., min_length=1, max_length=MAX_CURVES_PER_REQUEST),
+    points: int = Query(default=300, ge=3, le=MAX_CURVE_POINTS),
+    session: Session = Depends(get_session),
+    _: object = Depends(get_current_active_user),
+):
+    """Downsampled curves of several roasts for overlays; roasts without telemetry are omitted."""
+    return list(downsampled_curves(session, ids, points).values())
+
+
+@router.post("/telemetry", response_model=list[RoastCurveSummary])
+async def ingest_telemetry(
+    request: Request,
+    fmt: Literal["csv", "ndjson"] | None = Query(default=None, alias="format"),
+    session: Session = Depends(get_session),
+    _: object = Depends(get_current_active_user),
+):
+    """Store the curves of several roasts from one upload; every sample carries its ``roast_id``."""
+    curves = await _read_telemetry(request, fmt)
+    return await run_in_threadpool(_save_telemetry, session, curves)
+
+
+@router.post("/{roast_id}/telemetry", response_model=RoastCurveSummary)
+async def ingest_roast_telemetry(
+    roast_id: int,
+    request: Request,
+    fmt: Literal["csv", "ndjson"] | None = Query(default=None, alias="format"),
+    session: Session = Depends(get_session),
+    _: object = Depends(get_current_active_user),
+):
+    """Replace the temperature curve of a roast with a streamed CSV or NDJSON upload."""
+    curves = await _read_telemetry(request, fmt, roast_id)
+    summaries = await run_in_threadpool(_save_telemetry, session, curves)
+    return summaries[0]
+
+
+@router.get("/{roast_id}/curve", response_model=RoastCurvePoints)
+def get_roast_curve(
+    roast_id: int,
+    points: int = Query(default=300, ge=3, le=MAX_CURVE_POINTS),
+    session: Session = Depends(get_session),
+    _: object = Depends(get_current_active_user),
+):
+    """Bean and environment temperature reduced to at most ``points`` samples with LTTB."""
+    curve = downsampled_curves(session, [roast_id], points).get(roast_id)
+    if curve is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Roast curve not found")
+    return curve
+
+
+@router.get("/{roast_id}/similar", response_model=list[SimilarRoast])
+def get_similar_roasts(
+    roast_id: int,
+    k: int = Query(default=10, ge=1, le=MAX_SIMILAR_ROASTS),
+    session: Session = Depends(get_session),
+    _: object = Depends(get_current_active_user),
+):
+    """Past roasts ranked by curve distance, shrinkage, development, duration and lot attributes."""
+    matches = roast_index.similar(session, roast_id, k)
+    if matches is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Roast not found")
+    roasts = session.exec(select(RoastBatch).where(RoastBatch.id.in_([match.roast_id for match in matches])))
+    roasts_by_id = {roast.id: roast for roast in roasts}
+    return [
+        SimilarRoast(roast=roasts_by_id[match.roast_id], distance=match.distance, curve_rmse=match.curve_rmse)
+        for match in matches
+        if match.roast_id in roasts_by_id
+    ]
+
+
+@router.get("/{roast_id}/telemetry", response_model=RoastCurveRead)
+def get_roast_telemetry(
+    roast_id: int,
+    session: Session = Depends(get_session),
+    _: object = Depends(get_current_active_user),
+):
+    curve = session.get(RoastCurve, roast_id)
+    if not curve:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Roast curve not found")
+    summary = RoastCurveSummary.model_validate(curve, from_attributes=True)
+    return RoastCurveRead(**summary.model_dump(), **curve_series(curve))
+
+
+@router.post("/bulk", response_model=BulkRoastResult, status_code=status.HTTP_201_CREATED)
+def create_roasts_bulk(
+    payload: list[RoastBatchCreate],
+    partial: bool = Query(default=False),
+    session: Session = Depends(get_session),
+    _: object = Depends(get_current_active_user),
+):
+    """Create a production day's roasts in one transaction.
+
+    Every batch is checked against the lot balances in order. Without
+    ``partial`` any invalid batch rejects the whole request; with it the
+    valid batches are created and the others are reported by index.
+    """
+    if not payload:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Debe registrar al menos una tostión")
+    if len(payload) > MAX_BULK_ROASTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"No se pueden registrar más de {MAX_BULK_ROASTS} tostiones por solicitud",
+        )
+
+    valid, errors, prices = validate_roasts(session, payload)
+    bulk_errors = [BulkRoastError(index=index, detail=detail) for index, detail in errors]
+    if bulk_errors and not partial:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=[error.model_dump() for error in bulk_errors],
+        )
+
+    roasts, zscores = insert_roasts(session, [payload[index] for index in valid], prices)
+    created = [_created(roast, zscore) for roast, zscore in zip(roasts, zscores)]
+    session.commit()
+    roast_index.refresh(session, [roast.id for roast in created])
+    return BulkRoastResult(created=created, errors=bulk_errors)
 
 
 @router.get("/{roast_id}", response_model=RoastBatchRead)
@@ -60,17 +300,31 @@ def update_roast(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Roast not found")
 
     update_data = payload.dict(exclude_unset=True)
+    lot_changed = update_data.get("lot_id", roast.lot_id) != roast.lot_id
+    apply_roast(session, roast, sign=-1, include_sales=lot_changed)
+    apply_roast_shrinkage(session, roast, sign=-1)
+    green_by_lot: dict[int, float] = defaultdict(float)
+    green_by_lot[roast.lot_id] -= roast.green_input_g
     for key, value in update_data.items():
         setattr(roast, key, value)
 
     if roast.green_input_g <= 0:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Green input must be greater than zero")
 
+    green_by_lot[roast.lot_id] += roast.green_input_g
+    _consume_green(session, green_by_lot)
+
     roast.shrinkage_pct = _calculate_shrinkage(roast.green_input_g, roast.roasted_output_g)
+    sync_roast_output(session, roast)
+    apply_roast(session, roast, include_sales=lot_changed)
+    apply_roast_shrinkage(session, roast)
+    if update_data.keys() & {"lot_id", "green_input_g", "roasted_output_g"}:
+        recompute_roast_costs(session, roast)
 
     session.add(roast)
     session.commit()
     session.refresh(roast)
+    roast_index.refresh(session, [roast.id])
     return roast
 
 
@@ -83,6 +337,12 @@ def delete_roast(
     roast = session.get(RoastBatch, roast_id)
     if not roast:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Roast not found")
+    delete_stock(session, roast.id)
+    delete_curve(session, roast.id)
+    apply_roast(session, roast, sign=-1)
+    apply_roast_shrinkage(session, roast, sign=-1)
+    _consume_green(session, {roast.lot_id: -roast.green_input_g})
     session.delete(roast)
     session.commit()
+    roast_index.remove(roast_id)
     return None
@@ -1,64 +1,49 @@
-from collections import defaultdict
-from datetime import date
+import base64
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Mapping
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import ColumnElement, and_, case, func, tuple_
 from sqlalchemy.orm import selectinload
 from sqlmodel import Session, select
-
-from ...models import RoastBatch, Sale, SaleCreate, SaleItem, SaleItemCreate, SaleRead, SaleUpdate
-from ..deps import get_current_active_user, get_session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ...models import (
+    Customer,
+    Sale,
+    SaleCreate,
+    SaleItem,
+    SaleItemCreate,
+    SaleItemUpdate,
+    SaleRead,
+    SaleUpdate,
+)
+from ...schemas.sales import DebtAgingEntry
+from ...services.costing import assign_item_costs
+from ...services.rollups import apply_sale
+from ...services.sales import SaleValidationError, build_sale, item_totals, resolve_payment
+from ...services.stock import apply_sold, grams_by_roast, lock_stock
+from ..deps import get_async_session, get_current_active_user, get_session
 
 router = APIRouter(prefix="/sales", tags=["sales"])
 
-def _available_roasted(session: Session, roast_id: int, exclude_sale_id: int | None = None) -> float:
-    roast = session.get(RoastBatch, roast_id)
-    if not roast:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Roast not found")
-
-    query = select(func.coalesce(func.sum(SaleItem.bag_size_g * SaleItem.bags), 0)).where(
-        SaleItem.roast_batch_id == roast_id
-    )
-    if exclude_sale_id is not None:
-        query = query.where(SaleItem.sale_id != exclude_sale_id)
-
-    used = session.exec(query).one()
-    available = roast.roasted_output_g - used
-    return max(available, 0.0)
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
 
 
-def _validate_items(
-    session: Session,
-    items: list[SaleItemCreate],
-    exclude_sale_id: int | None = None,
-) -> tuple[float, float]:
-    if not items:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Debe registrar al menos una tostión")
+def _check_stock(session: Session, requested_by_roast: Mapping[int, float]) -> None:
+    """Reject the request if any roast lacks the requested extra grams.
 
-    totals_by_roast: dict[int, float] = defaultdict(float)
-    total_price = 0.0
-    total_quantity = 0.0
-
-    for item in items:
-        if item.bag_size_g <= 0:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="El tamaño de la bolsa debe ser mayor a cero",
-            )
-        if item.bags <= 0:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Las bolsas deben ser mayores a cero")
-        if item.bag_price <= 0:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST, detail="El precio por bolsa debe ser mayor a cero"
-            )
-
-        grams = float(item.bag_size_g) * float(item.bags)
-        totals_by_roast[item.roast_batch_id] += grams
-        total_price += round(float(item.bag_price)) * float(item.bags)
-        total_quantity += grams
+    The stock rows are locked until the transaction ends, so concurrent sales
+    of the same roast are serialised.
+    """
+    stocks = lock_stock(session, requested_by_roast)
+    if len(stocks) != len(set(requested_by_roast)):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Roast not found")
 
-    for roast_id, grams in totals_by_roast.items():
-        available = _available_roasted(session, roast_id, exclude_sale_id=exclude_sale_id)
+    for roast_id, grams in requested_by_roast.items():
+        available = max(stocks[roast_id].available_g, 0.0)
         if grams > available:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -68,29 +53,61 @@ def _validate_items(
                 ),
             )
 
+
+def _item_totals(items: list[SaleItemCreate]) -> tuple[float, float]:
+    try:
+        return item_totals(items)
+    except SaleValidationError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+
+
+def _validate_items(session: Session, items: list[SaleItemCreate]) -> tuple[float, float]:
+    total_price, total_quantity = _item_totals(items)
+    _check_stock(session, grams_by_roast(items))
     return total_price, total_quantity
 
 
+def _sync_items(sale: Sale, items: list[SaleItemUpdate]) -> None:
+    """Apply ``items`` to ``sale.items`` touching only the rows that differ.
+
+    Items are matched by id: matching rows are updated in place, items without
+    an id are inserted and existing rows missing from ``items`` are deleted.
+    """
+    existing_by_id = {item.id: item for item in sale.items}
+    kept_ids: set[int] = set()
+
+    for payload_item in items:
+        data = payload_item.model_dump(exclude={"id"})
+        if payload_item.id is None:
+            sale.items.append(SaleItem(**data))
+            continue
+
+        existing = existing_by_id.get(payload_item.id)
+        if existing is None or payload_item.id in kept_ids:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"El ítem {payload_item.id} no pertenece a esta venta",
+            )
+        kept_ids.add(payload_item.id)
+        for key, value in data.items():
+            if getattr(existing, key) != value:
+                setattr(existing, key, value)
+
+    for item in list(sale.items):
+        if item.id is not None and item.id not in kept_ids:
+            sale.items.remove(item)
+
+
 def _resolve_payment(
     *,
     total_price: float,
     is_paid: bool,
     amount_paid: float | None,
 ) -> tuple[bool, float]:
-    if amount_paid is None:
-        resolved_amount = total_price if is_paid else 0.0
-    else:
-        if amount_paid < 0 or amount_paid > total_price:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="El valor pagado debe estar entre 0 y el total de la venta",
-            )
-        resolved_amount = amount_paid
-        if resolved_amount < total_price:
-            is_paid = False
-        elif resolved_amount == total_price:
-            is_paid = True
-    return is_paid, resolved_amount
+    try:
+        return resolve_payment(total_price=total_price, is_paid=is_paid, amount_paid=amount_paid)
+    except SaleValidationError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
 
 
 def _normalise_sale_instance(sale: Sale) -> Sale:
@@ -103,52 +120,125 @@ def _normalise_sale_instance(sale: Sale) -> Sale:
     return sale
 
 
-@router.get("/", response_model=list[SaleRead])
-def list_sales(session: Session = Depends(get_session), _: object = Depends(get_current_active_user)):
-    statement = select(Sale).options(selectinload(Sale.items)).order_by(Sale.sale_date.desc(), Sale.id.desc())
-    sales = session.exec(statement).all()
+@dataclass
+class SaleListParams:
+    date_from: date | None
+    date_to: date | None
+    customer_id: int | None
+    is_paid: bool | None
+    roast_batch_id: int | None
+    limit: int
+    cursor: str | None
+    include_total: bool
+
+
+def _sale_list_params(
+    date_from: date | None = Query(default=None),
+    date_to: date | None = Query(default=None),
+    customer_id: int | None = Query(default=None),
+    is_paid: bool | None = Query(default=None),
+    roast_batch_id: int | None = Query(default=None),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = Query(default=None),
+    include_total: bool = Query(default=False),
+) -> SaleListParams:
+    return SaleListParams(
+        date_from=date_from,
+        date_to=date_to,
+        customer_id=customer_id,
+        is_paid=is_paid,
+        roast_batch_id=roast_batch_id,
+        limit=limit,
+        cursor=cursor,
+        include_total=include_total,
+    )
+
+
+def _encode_cursor(sale: Sale) -> str:
+    raw = f"{sale.sale_date.isoformat()}|{sale.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[date, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        sale_date, sale_id = raw.split("|", 1)
+        return date.fromisoformat(sale_date), int(sale_id)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido") from exc
+
+
+async def _list_sales_page(
+    session: AsyncSession,
+    response: Response,
+    params: SaleListParams,
+    *conditions: ColumnElement[bool],
+) -> list[Sale]:
+    """Return one keyset page of sales ordered by ``(sale_date, id)`` descending.
+
+    Pages hold ``DEFAULT_PAGE_SIZE`` sales unless ``limit`` asks for up to
+    ``MAX_PAGE_SIZE``. The next page cursor is returned in ``X-Next-Cursor``
+    and, when requested, the number of matching sales in ``X-Total-Count``.
+    """
+    filters = list(conditions)
+    if params.date_from is not None:
+        filters.append(Sale.sale_date >= params.date_from)
+    if params.date_to is not None:
+        filters.append(Sale.sale_date <= params.date_to)
+    if params.customer_id is not None:
+        filters.append(Sale.customer_id == params.customer_id)
+    if params.is_paid is not None:
+        filters.append(Sale.is_paid == params.is_paid)
+    if params.roast_batch_id is not None:
+        filters.append(
+            select(SaleItem.id)
+            .where(SaleItem.sale_id == Sale.id, SaleItem.roast_batch_id == params.roast_batch_id)
+            .exists()
+        )
+
+    if params.include_total:
+        total = (await session.exec(select(func.count()).select_from(Sale).where(*filters))).one()
+        response.headers["X-Total-Count"] = str(total)
+
+    statement = select(Sale).options(selectinload(Sale.items)).where(*filters)
+    if params.cursor:
+        cursor_date, cursor_id = _decode_cursor(params.cursor)
+        statement = statement.where(tuple_(Sale.sale_date, Sale.id) < tuple_(cursor_date, cursor_id))
+    statement = statement.order_by(Sale.sale_date.desc(), Sale.id.desc())
+
+    sales = (await session.exec(statement.limit(params.limit + 1))).all()
+    if len(sales) > params.limit:
+        sales = sales[: params.limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(sales[-1])
+
     return [_normalise_sale_instance(sale) for sale in sales]
 
 
+@router.get("/", response_model=list[SaleRead])
+async def list_sales(
+    response: Response,
+    params: SaleListParams = Depends(_sale_list_params),
+    session: AsyncSession = Depends(get_async_session),
+    _: object = Depends(get_current_active_user),
+):
+    return await _list_sales_page(session, response, params)
+
+
 @router.post("/", response_model=SaleRead, status_code=status.HTTP_201_CREATED)
 def create_sale(
     payload: SaleCreate,
     session: Session = Depends(get_session),
     _: object = Depends(get_current_active_user),
 ):
-    total_price, total_quantity = _validate_items(session, payload.items)
+    try:
+        sale = build_sale(payload)
+    except SaleValidationError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    _check_stock(session, grams_by_roast(sale.items))
 
-    base_data = payload.model_dump(exclude={"items"}, exclude_unset=True)
-    amount_input = base_data.get("amount_paid")
-
-    resolved_is_paid, resolved_amount = _resolve_payment(
-        total_price=total_price,
-        is_paid=payload.is_paid,
-        amount_paid=amount_input,
-    )
-
-    sale = Sale(**base_data)
-    sale.total_price = round(total_price)
-    sale.total_quantity_g = total_quantity
-    sale.is_paid = resolved_is_paid
-    sale.amount_paid = resolved_amount
-    sale.paid_at = (
-        payload.paid_at
-        if resolved_is_paid and payload.paid_at
-        else (payload.sale_date if resolved_is_paid else None)
-    )
-    sale.items = []
-
-    for item in payload.items:
-        sale.items.append(
-            SaleItem(
-                roast_batch_id=item.roast_batch_id,
-                bag_size_g=item.bag_size_g,
-                bags=item.bags,
-                bag_price=item.bag_price,
-                notes=item.notes,
-            )
-        )
+    assign_item_costs(session, sale.items)
+    apply_sold(session, grams_by_roast(sale.items))
+    apply_sale(session, sale)
 
     session.add(sale)
     session.commit()
@@ -157,18 +247,88 @@ def create_sale(
 
 
 @router.get("/debts", response_model=list[SaleRead])
-def list_debts(
-    session: Session = Depends(get_session),
+async def list_debts(
+    response: Response,
+    params: SaleListParams = Depends(_sale_list_params),
+    session: AsyncSession = Depends(get_async_session),
     _: object = Depends(get_current_active_user),
 ):
+    return await _list_sales_page(
+        session,
+        response,
+        params,
+        Sale.total_price > func.coalesce(Sale.amount_paid, 0.0) + 1e-6,
+    )
+
+
+@router.get("/debts/aging", response_model=list[DebtAgingEntry])
+def list_debts_aging(
+    as_of: date | None = Query(default=None),
+    session: Session = Depends(get_session),
+    _: object = Depends(get_current_active_user),
+) -> list[DebtAgingEntry]:
+    """Outstanding balance per customer split into 0-30/31-60/61-90/90+ day buckets.
+
+    The ``total_price > amount_paid`` predicate matches the partial index on
+    unpaid sales, so paid history is never scanned; ``amount_paid`` is NOT
+    NULL since migration 0007. Sales dated after ``as_of`` are left out.
+    """
+    as_of = as_of or date.today()
+    balance = Sale.total_price - Sale.amount_paid
+
+    def bucket(*conditions: ColumnElement[bool]) -> ColumnElement[float]:
+        return func.coalesce(func.sum(case((and_(*conditions), balance), else_=0.0)), 0.0)
+
+    cutoff_30 = as_of - timedelta(days=30)
+    cutoff_60 = as_of - timedelta(days=60)
+    cutoff_90 = as_of - timedelta(days=90)
+
     statement = (
-        select(Sale)
-        .options(selectinload(Sale.items))
-        .where(Sale.total_price > func.coalesce(Sale.amount_paid, 0.0) + 1e-6)
-        .order_by(Sale.sale_date.desc(), Sale.id.desc())
+        select(
+            Sale.customer_id,
+            Customer.name,
+            func.count(Sale.id),
+            func.min(Sale.sale_date),
+            bucket(Sale.sale_date >= cutoff_30),
+            bucket(Sale.sale_date < cutoff_30, Sale.sale_date >= cutoff_60),
+            bucket(Sale.sale_date < cutoff_60, Sale.sale_date >= cutoff_90),
+            bucket(Sale.sale_date < cutoff_90),
+            func.sum(balance),
+        )
+        .join(Customer, Customer.id == Sale.customer_id, isouter=True)
+        .where(
+            Sale.total_price > Sale.amount_paid,  # the partial index predicate, verbatim
+            Sale.total_price > Sale.amount_paid + 1e-6,
+            Sale.sale_date <= as_of,
+        )
+        .group_by(Sale.customer_id, Customer.name)
+        .order_by(func.sum(balance).desc())
     )
-    sales = session.exec(statement).all()
-    return [_normalise_sale_instance(sale) for sale in sales]
+
+    return [
+        DebtAgingEntry(
+            customer_id=customer_id,
+            customer_name=customer_name,
+            sales_count=sales_count,
+            oldest_sale_date=oldest_sale_date,
+            days_0_30=float(days_0_30),
+            days_31_60=float(days_31_60),
+            days_61_90=float(days_61_90),
+            days_over_90=float(days_over_90),
+            total_balance=float(total_balance),
+        )
+        for (
+            customer_id,
+            customer_name,
+            sales_count,
+            oldest_sale_date,
+            days_0_30,
+            days_31_60,
+            days_61_90,
+            days_over_90,
+            total_balance,
+        ) in session.exec(statement)
+    ]
 
 
 @router.get("/{sale_id}", response_model=SaleRead)
@@ -195,27 +355,27 @@ def update_sale(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sale not found")
 
     update_data = payload.model_dump(exclude_unset=True, exclude={"items", "amount_paid", "is_paid", "paid_at"})
+    rollups_changed = payload.items is not None or update_data.get("sale_date", sale.sale_date) != sale.sale_date
+    if rollups_changed:
+        apply_sale(session, sale, sign=-1)
     for key, value in update_data.items():
         setattr(sale, key, value)
 
     if payload.items is not None:
-        total_price, total_quantity = _validate_items(session, payload.items, exclude_sale_id=sale.id)
-
-        # remove existing items
-        for item in list(sale.items):
-            session.delete(item)
-        sale.items = []
-
-        for item in payload.items:
-            sale.items.append(
-                SaleItem(
-                    roast_batch_id=item.roast_batch_id,
-                    bag_size_g=item.bag_size_g,
-                    bags=item.bags,
-                    bag_price=item.bag_price,
-                    notes=item.notes,
-                )
-            )
+        total_price, total_quantity = _item_totals(payload.items)
+
+        previous_grams = grams_by_roast(sale.items)
+        _sync_items(sale, payload.items)
+        assign_item_costs(session, sale.items)
+        new_grams = grams_by_roast(sale.items)
+        delta_by_roast = {
+            roast_id: new_grams.get(roast_id, 0.0) - previous_grams.get(roast_id, 0.0)
+            for roast_id in new_grams.keys() | previous_grams.keys()
+        }
+
+        # only roasts whose quantity grows can run out of stock
+        _check_stock(session, {roast_id: grams for roast_id, grams in delta_by_roast.items() if grams > 1e-6})
+        apply_sold(session, delta_by_roast)
 
         sale.total_price = round(total_price)
         sale.total_quantity_g = total_quantity
@@ -225,6 +385,9 @@ def update_sale(
         elif sale.amount_paid < sale.total_price:
             sale.is_paid = False
 
+    if rollups_changed:
+        apply_sale(session, sale)
+
     if payload.amount_paid is not None or payload.is_paid is not None:
         desired_is_paid = payload.is_paid if payload.is_paid is not None else sale.is_paid
         amount_input = (
@@ -262,6 +425,8 @@ def delete_sale(
     sale = session.get(Sale, sale_id)
     if not sale:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sale not found")
+    apply_sold(session, {roast_id: -grams for roast_id, grams in grams_by_roast(sale.items).items()})
+    apply_sale(session, sale, sign=-1)
     session.delete(sale)
     session.commit()
     return None
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import delete
 from sqlmodel import Session, select
 
 from ...core.security import get_password_hash
-from ...models import User, UserCreate, UserRead, UserUpdate
+from ...models import ApiKey, User, UserCreate, UserRead, UserUpdate
+from ...services.user_cache import invalidate_user
 from ..deps import get_current_superuser, get_session
 
 router = APIRouter(prefix="/users", tags=["users"])
@@ -34,6 +36,7 @@ def create_user(
         hashed_password=get_password_hash(payload.password),
     )
     session.add(user)
+    invalidate_user(session, user.email)
     session.commit()
     session.refresh(user)
     return user
@@ -59,6 +62,7 @@ def update_user(
         setattr(user, key, value)
 
     session.add(user)
+    invalidate_user(session, user.email)
     session.commit()
     session.refresh(user)
     return user
@@ -73,6 +77,8 @@ def delete_user(
     user = session.get(User, user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    session.execute(delete(ApiKey).where(ApiKey.user_id == user.id))
     session.delete(user)
+    invalidate_user(session, user.email)
     session.commit()
     return None
@@ -1,15 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from ...models import Variety, VarietyCreate, VarietyRead, VarietyUpdate
-from ..deps import get_current_active_user, get_session
+from ..deps import get_async_session, get_current_active_user, get_session
 
 router = APIRouter(prefix="/varieties", tags=["varieties"])
 
 
 @router.get("/", response_model=list[VarietyRead])
-def list_varieties(session: Session = Depends(get_session), _: object = Depends(get_current_active_user)):
-    return session.exec(select(Variety)).all()
+async def list_varieties(
+    session: AsyncSession = Depends(get_async_session),
+    _: object = Depends(get_current_active_user),
+):
+    return (await session.exec(select(Variety))).all()
 
 
 @router.post("/", response_model=VarietyRead, status_code=status.HTTP_201_CREATED)
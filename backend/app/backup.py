@@ -0,0 +1,353 @@
+"""Parallel per-table backup and restore through PostgreSQL ``COPY``.
+
+``backup`` exports a snapshot from one coordinating transaction and lets a
+pool of worker connections attach to it, so every table is read at the same
+instant while ``COPY ... TO STDOUT`` streams them side by side into gzip
+files. The manifest records each table's columns, row count and SHA-256 of
+the uncompressed data, and the finished backup is verified against it before
+the command returns.
+
+``restore`` verifies the files first, then loads the tables with
+``COPY ... FROM STDIN``, one foreign-key level at a time with the tables of a
+level in parallel, and finally moves the id sequences past the restored rows.
+The schema must already exist: create it with ``python -m app.migrations.runner
+upgrade`` rather than by starting the app, whose startup seeds the superuser
+and stock rows. Restoring into tables that already hold rows is refused before
+anything is loaded; pass ``--truncate`` to empty them first.
+
+    python -m app.backup backup [--dir backups] [--jobs N]
+    python -m app.backup restore backups/20250924T030000Z [--jobs N] [--truncate]
+    python -m app.backup verify backups/20250924T030000Z
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+from sqlalchemy import Integer, Table, create_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel import SQLModel
+
+from . import models  # noqa: F401  registers every table on the metadata
+from .core.config import settings
+
+MANIFEST_NAME = "manifest.json"
+DEFAULT_BACKUP_DIR = "backups"
+COPY_BUFFER_BYTES = 1 << 20
+GZIP_LEVEL = 6
+
+
+class BackupError(RuntimeError):
+    """Raised when a backup does not match its manifest or cannot be restored."""
+
+
+@dataclass
+class TableBackup:
+    table: str
+    file: str
+    columns: list[str]
+    rows: int
+    sha256: str
+    compressed_bytes: int
+
+
+@dataclass
+class BackupManifest:
+    created_at: str
+    tables: list[TableBackup]
+
+
+class _HashingWriter:
+    """File-like sink for ``COPY TO STDOUT`` that hashes, counts rows and compresses."""
+
+    def __init__(self, target: Any) -> None:
+        self.target = target
+        self.digest = hashlib.sha256()
+        self.rows = 0
+
+    def write(self, data: bytes | str) -> int:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.digest.update(data)
+        self.rows += data.count(b"\n")  # COPY text format escapes newlines inside values
+        self.target.write(data)
+        return len(data)
+
+
+class _HashingReader:
+    """File-like source for ``COPY FROM STDIN`` that hashes what it hands out."""
+
+    def __init__(self, source: Any) -> None:
+        self.source = source
+        self.digest = hashlib.sha256()
+        self.rows = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.source.read(size)
+        self.digest.update(data)
+        self.rows += data.count(b"\n")
+        return data
+
+    def readline(self, size: int = -1) -> bytes:
+        data = self.source.readline(size)
+        self.digest.update(data)
+        self.rows += data.count(b"\n")
+        return data
+
+
+# Workers hold one connection each for a whole table, so they bypass the
+# app's bounded pool instead of waiting on it.
+_copy_engine = create_engine(settings.database_url, poolclass=NullPool)
+
+
+def _quote(name: str) -> str:
+    return _copy_engine.dialect.identifier_preparer.quote(name)
+
+
+def _copy_sql(table: Table | str, columns: Iterable[str], direction: str) -> str:
+    name = table if isinstance(table, str) else table.name
+    column_list = ", ".join(_quote(column) for column in columns)
+    return f"COPY {_quote(name)} ({column_list}) {direction}"
+
+
+def _require_postgres() -> None:
+    if _copy_engine.dialect.name != "postgresql":
+        raise BackupError("Las copias de seguridad con COPY requieren PostgreSQL")
+
+
+def _run_parallel(jobs: int | None, work: Callable[[Any], Any], items: list[Any]) -> list[Any]:
+    """Run ``work`` over ``items`` on ``jobs`` threads (one per core by default)."""
+    with ThreadPoolExecutor(max_workers=max(1, jobs or os.cpu_count() or 1)) as pool:
+        return list(pool.map(work, items))
+
+
+def _dump_table(table: Table, directory: Path, snapshot_id: str) -> TableBackup:
+    columns = [column.name for column in table.columns]
+    file_name = f"{table.name}.copy.gz"
+    connection = _copy_engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("BEGIN ISOLATION LEVEL REPEATABLE READ READ ONLY")
+        cursor.execute("SET TRANSACTION SNAPSHOT %s", (snapshot_id,))
+        with gzip.open(directory / file_name, "wb", compresslevel=GZIP_LEVEL) as target:
+            writer = _HashingWriter(target)
+            cursor.copy_expert(_copy_sql(table, columns, "TO STDOUT"), writer, size=COPY_BUFFER_BYTES)
+        connection.rollback()
+    finally:
+        connection.close()
+    return TableBackup(
+        table=table.name,
+        file=file_name,
+        columns=columns,
+        rows=writer.rows,
+        sha256=writer.digest.hexdigest(),
+        compressed_bytes=(directory / file_name).stat().st_size,
+    )
+
+
+def backup(directory: str | Path = DEFAULT_BACKUP_DIR, jobs: int | None = None) -> Path:
+    """Back up every table into a new timestamped folder under ``directory`` and verify it."""
+    _require_postgres()
+    created_at = datetime.now(timezone.utc)
+    target = Path(directory) / f"{created_at:%Y%m%dT%H%M%SZ}"
+    target.mkdir(parents=True, exist_ok=False)
+    tables = list(SQLModel.metadata.sorted_tables)
+
+    coordinator = _copy_engine.raw_connection()
+    try:
+        cursor = coordinator.cursor()
+        cursor.execute("BEGIN ISOLATION LEVEL REPEATABLE READ READ ONLY")
+        cursor.execute("SELECT pg_export_snapshot()")
+        (snapshot_id,) = cursor.fetchone()
+        # The exported snapshot stays valid while this transaction is open.
+        entries = _run_parallel(jobs, lambda table: _dump_table(table, target, snapshot_id), tables)
+        coordinator.rollback()
+    finally:
+        coordinator.close()
+
+    manifest = BackupManifest(created_at=created_at.isoformat(), tables=entries)
+    (target / MANIFEST_NAME).write_text(json.dumps(asdict(manifest), indent=2))
+    verify(target, jobs)
+    return target
+
+
+def load_manifest(directory: str | Path) -> BackupManifest:
+    path = Path(directory) / MANIFEST_NAME
+    if not path.exists():
+        raise BackupError(f"No se encontró {path}")
+    data = json.loads(path.read_text())
+    return BackupManifest(created_at=data["created_at"], tables=[TableBackup(**entry) for entry in data["tables"]])
+
+
+def _check_file(directory: Path, entry: TableBackup) -> str | None:
+    digest = hashlib.sha256()
+    rows = 0
+    try:
+        with gzip.open(directory / entry.file, "rb") as source:
+            while chunk := source.read(COPY_BUFFER_BYTES):
+                digest.update(chunk)
+                rows += chunk.count(b"\n")
+    except (OSError, EOFError) as exc:
+        return f"{entry.file}: {exc}"
+    if rows != entry.rows:
+        return f"{entry.file}: {rows} filas, se esperaban {entry.rows}"
+    if digest.hexdigest() != entry.sha256:
+        return f"{entry.file}: la suma de verificación no coincide"
+    return None
+
+
+def verify(directory: str | Path, jobs: int | None = None) -> BackupManifest:
+    """Re-read every file of a backup and check it against the manifest."""
+    directory = Path(directory)
+    manifest = load_manifest(directory)
+    results = _run_parallel(jobs, lambda entry: _check_file(directory, entry), manifest.tables)
+    errors = [error for error in results if error]
+    if errors:
+        raise BackupError("Copia de seguridad inválida:\n" + "\n".join(errors))
+    return manifest
+
+
+def foreign_key_levels(tables: Iterable[Table]) -> list[list[Table]]:
+    """Group ``tables`` so each one only references tables of earlier groups."""
+    remaining = {table.name: table for table in tables}
+    levels: list[list[Table]] = []
+
+    def ready(table: Table) -> bool:
+        referenced = {key.column.table.name for key in table.foreign_keys} - {table.name}
+        return not referenced & remaining.keys()
+
+    while remaining:
+        level = [table for table in remaining.values() if ready(table)]
+        if not level:
+            raise BackupError("Dependencias circulares entre tablas: " + ", ".join(sorted(remaining)))
+        levels.append(level)
+        for table in level:
+            del remaining[table.name]
+    return levels
+
+
+def _load_table(directory: Path, entry: TableBackup) -> None:
+    connection = _copy_engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        with gzip.open(directory / entry.file, "rb") as source:
+            reader = _HashingReader(source)
+            cursor.copy_expert(_copy_sql(entry.table, entry.columns, "FROM STDIN"), reader, size=COPY_BUFFER_BYTES)
+        if reader.rows != entry.rows or reader.digest.hexdigest() != entry.sha256:
+            connection.rollback()
+            raise BackupError(f"{entry.file} cambió durante la restauración")
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def _reset_sequences(tables: Iterable[Table]) -> None:
+    connection = _copy_engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        for table in tables:
+            key = list(table.primary_key.columns)
+            if len(key) != 1 or not isinstance(key[0].type, Integer):
+                continue
+            name, column = _quote(table.name), _quote(key[0].name)
+            cursor.execute("SELECT pg_get_serial_sequence(%s, %s)", (name, key[0].name))
+            (sequence,) = cursor.fetchone()
+            if sequence is None:
+                continue
+            cursor.execute(
+                f"SELECT setval(%s, COALESCE((SELECT MAX({column}) FROM {name}), 0) + 1, false)", (sequence,)
+            )
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def _non_empty_tables(tables: Iterable[Table]) -> list[str]:
+    connection = _copy_engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        non_empty = []
+        for table in tables:
+            cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {_quote(table.name)})")
+            if cursor.fetchone()[0]:
+                non_empty.append(table.name)
+        connection.rollback()
+    finally:
+        connection.close()
+    return non_empty
+
+
+def restore(directory: str | Path, jobs: int | None = None, truncate: bool = False) -> BackupManifest:
+    """Load a verified backup into the (empty or ``truncate``-d) current database."""
+    _require_postgres()
+    directory = Path(directory)
+    manifest = verify(directory, jobs)
+    tables = {table.name: table for table in SQLModel.metadata.sorted_tables}
+    unknown = [entry.table for entry in manifest.tables if entry.table not in tables]
+    if unknown:
+        raise BackupError("Tablas desconocidas en la copia: " + ", ".join(unknown))
+
+    entries = {entry.table: entry for entry in manifest.tables}
+    restored = [tables[name] for name in entries]
+    if truncate:
+        connection = _copy_engine.raw_connection()
+        try:
+            connection.cursor().execute(
+                "TRUNCATE " + ", ".join(_quote(table.name) for table in restored) + " RESTART IDENTITY CASCADE"
+            )
+            connection.commit()
+        finally:
+            connection.close()
+    else:
+        non_empty = _non_empty_tables(restored)
+        if non_empty:
+            raise BackupError(
+                "Las tablas ya tienen datos (use --truncate para vaciarlas): " + ", ".join(sorted(non_empty))
+            )
+
+    for level in foreign_key_levels(restored):
+        _run_parallel(jobs, lambda table: _load_table(directory, entries[table.name]), level)
+    _reset_sequences(restored)
+    return manifest
+
+
+def run() -> None:
+    parser = argparse.ArgumentParser(description="Copias de seguridad por tabla con COPY en paralelo.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    backup_parser = commands.add_parser("backup")
+    backup_parser.add_argument("--dir", default=DEFAULT_BACKUP_DIR)
+    backup_parser.add_argument("--jobs", type=int)
+    restore_parser = commands.add_parser("restore")
+    restore_parser.add_argument("path")
+    restore_parser.add_argument("--jobs", type=int)
+    restore_parser.add_argument("--truncate", action="store_true", help="vacía las tablas antes de cargar")
+    verify_parser = commands.add_parser("verify")
+    verify_parser.add_argument("path")
+    verify_parser.add_argument("--jobs", type=int)
+    args = parser.parse_args()
+
+    if args.command == "backup":
+        path = backup(args.dir, args.jobs)
+        manifest = load_manifest(path)
+        print(f"Copia verificada en {path}")
+    elif args.command == "restore":
+        manifest = restore(args.path, args.jobs, args.truncate)
+        print(f"Restaurada la copia del {manifest.created_at}")
+    else:
+        manifest = verify(args.path, args.jobs)
+        print(f"Copia válida del {manifest.created_at}")
+    for entry in manifest.tables:
+        print(f"  {entry.table}: {entry.rows} filas")
+
+
+if __name__ == "__main__":
+    run()
@@ -1,4 +1,5 @@
 from functools import lru_cache
+from typing import Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 import json
@@ -11,16 +12,38 @@ class Settings(BaseSettings):
     access_token_expire_minutes: int = 60 * 24
     algorithm: str = "HS256"
     database_url: str = "postgresql://postgres:postgres@db:5432/tuestecafe"
+    # Per worker process: a uvicorn deployment can open workers * (pool size + overflow) connections.
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout_seconds: float = 30.0
+    db_pool_recycle_seconds: int = 1800  # -1 keeps connections forever
+    # "always" pings on every checkout, "idle" only connections unused for db_pool_ping_idle_seconds.
+    db_pool_pre_ping: Literal["always", "idle", "never"] = "idle"
+    db_pool_ping_idle_seconds: float = 30.0
+    db_statement_timeout_ms: int = 0  # 0 disables the timeout
+    # Serve the async read endpoints from an asyncpg engine; otherwise they run the sync session in threads.
+    db_async: bool = False
+    # GET routes that opt into get_read_session are spread over these replicas (comma-separated or JSON list).
+    read_replica_urls: list[str] | str | None = []
+    replica_max_lag_seconds: float = 10.0  # replicas lagging further behind are skipped in favour of the primary
+    replica_lag_check_seconds: float = 5.0
+    # After a write, that user's reads stay on the primary for this long (read-your-writes).
+    read_sticky_seconds: float = 5.0
     first_superuser_email: str | None = None
     first_superuser_password: str | None = None
     root_path: str | None = ""
+    snapshot_dir: str = "snapshots"
+    user_cache_size: int = 1024
+    user_cache_ttl_seconds: float = 60.0
+    # Broadcast user cache invalidations to every worker through Postgres LISTEN/NOTIFY.
+    user_cache_notify: bool = False
     backend_cors_origins: list[str] | str | None = [
         "http://localhost:5173",
         "http://127.0.0.1:5173",
     ]
 
     @staticmethod
-    def _normalize_cors(value: list[str] | str | None) -> list[str]:
+    def _normalize_list(value: list[str] | str | None) -> list[str]:
         if value is None:
             return []
         if isinstance(value, str):
@@ -40,7 +63,11 @@ class Settings(BaseSettings):
 
     @property
     def cors_origins(self) -> list[str]:
-        return self._normalize_cors(self.backend_cors_origins)
+        return self._normalize_list(self.backend_cors_origins)
+
+    @property
+    def replica_urls(self) -> list[str]:
+        return self._normalize_list(self.read_replica_urls)
 
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", extra="ignore")
 
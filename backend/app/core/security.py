@@ -1,3 +1,6 @@
+import hashlib
+import hmac
+import secrets
 from datetime import datetime, timedelta
 from typing import Any, Optional
 
@@ -8,6 +11,9 @@ from .config import settings
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# API keys look like ``rf_<prefix>.<secret>``; the prefix is stored in clear to find the key.
+API_KEY_MARKER = "rf_"
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -28,3 +34,26 @@ def decode_token(token: str) -> dict[str, Any]:
         return jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
     except JWTError as exc:  # pragma: no cover - simple bubble up
         raise ValueError("Invalid token") from exc
+
+
+def generate_api_key() -> tuple[str, str]:
+    """Return a new ``(prefix, key)`` pair."""
+    prefix = API_KEY_MARKER + secrets.token_hex(6)
+    return prefix, f"{prefix}.{secrets.token_urlsafe(32)}"
+
+
+def is_api_key(credential: str) -> bool:
+    return credential.startswith(API_KEY_MARKER) and "." in credential
+
+
+def api_key_prefix(key: str) -> str:
+    return key.split(".", 1)[0]
+
+
+def hash_api_key(key: str) -> str:
+    """HMAC-SHA256 of ``key``: keys are random, so a fast keyed hash is enough, unlike passwords."""
+    return hmac.new(settings.secret_key.encode(), key.encode(), hashlib.sha256).hexdigest()
+
+
+def verify_api_key(key: str, key_hash: str) -> bool:
+    return hmac.compare_digest(hash_api_key(key), key_hash)
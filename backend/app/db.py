@@ -1,24 +1,330 @@
+import itertools
 import logging
+import threading
 import time
+from dataclasses import dataclass
+from typing import Any
 
-from sqlalchemy.exc import OperationalError
-from sqlmodel import SQLModel, create_engine
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection, Engine, make_url
+from sqlalchemy.exc import DisconnectionError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.sql.expression import SelectOfScalar
+from starlette.concurrency import run_in_threadpool
 
 from .core.config import settings
 
 logger = logging.getLogger(__name__)
 
-engine = create_engine(settings.database_url, echo=False, pool_pre_ping=True)
+
+class PoolWaitMetrics:
+    """Counters of how long checkouts waited for a pooled connection."""
+
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.checkouts += 1
+            if timed_out:
+                self.timeouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+
+class _MeteredPool:
+    """Pool mixin that records the time each checkout spends waiting for a connection."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolWaitMetrics()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class MeteredQueuePool(_MeteredPool, QueuePool):
+    """``QueuePool`` with checkout wait metrics."""
+
+
+class MeteredAsyncQueuePool(_MeteredPool, AsyncAdaptedQueuePool):
+    """``AsyncAdaptedQueuePool`` with checkout wait metrics, for the asyncpg engine."""
+
+
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def async_database_url(database_url: str) -> str:
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"DB_ASYNC is not supported for {backend!r} databases; use one of {sorted(ASYNC_DRIVERS)}")
+    return url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def _engine_options(database_url: str, asynchronous: bool = False) -> dict:
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}
+    options = {
+        "poolclass": MeteredAsyncQueuePool if asynchronous else MeteredQueuePool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout_seconds,
+        "pool_recycle": settings.db_pool_recycle_seconds,
+        "pool_pre_ping": settings.db_pool_pre_ping == "always",
+    }
+    if settings.db_statement_timeout_ms and url.get_backend_name() == "postgresql":
+        timeout = str(settings.db_statement_timeout_ms)
+        if asynchronous:
+            options["connect_args"] = {"server_settings": {"statement_timeout": timeout}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
+
+
+def _ping_idle_connections(bind: Engine, idle_seconds: float) -> None:
+    """Ping a connection on checkout only when it sat idle in the pool for ``idle_seconds``."""
+
+    @event.listens_for(bind, "checkin")
+    def _mark_checkin(_dbapi_connection, connection_record) -> None:
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(bind, "checkout")
+    def _ping_if_idle(dbapi_connection, connection_record, _connection_proxy) -> None:
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < idle_seconds:
+            return
+        try:
+            bind.dialect.do_ping(dbapi_connection)
+        except Exception as error:
+            # The pool discards this connection and retries the checkout with a fresh one.
+            raise DisconnectionError() from error
+
+
+engine = create_engine(settings.database_url, echo=False, **_engine_options(settings.database_url))
+if settings.db_pool_pre_ping == "idle":
+    _ping_idle_connections(engine, settings.db_pool_ping_idle_seconds)
+
+async_engine: AsyncEngine | None = None
+if settings.db_async:
+    async_engine = create_async_engine(
+        async_database_url(settings.database_url), echo=False, **_engine_options(settings.database_url, True)
+    )
+    if settings.db_pool_pre_ping == "idle":
+        _ping_idle_connections(async_engine.sync_engine, settings.db_pool_ping_idle_seconds)
+
+
+# Seconds the primary's last replayed transaction is behind, 0 when fully caught up or not a standby.
+REPLICA_LAG_SQL = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+REPLICA_CONNECT_TIMEOUT_SECONDS = 5
+
+
+@dataclass
+class ReplicaStatus:
+    url: str
+    lag_seconds: float | None
+    healthy: bool
+
+
+class ReplicaSet:
+    """Read replicas handed out round-robin, skipping any that lag too far behind or cannot be reached.
+
+    Each replica's lag is measured at most every
+    ``settings.replica_lag_check_seconds``; between checks the last value is
+    reused. Replicas that are not PostgreSQL standbys (e.g. a second SQLite
+    file used locally) count as caught up once they answer.
+    """
+
+    def __init__(self, urls: list[str]) -> None:
+        self.urls = urls
+        self.engines = [self._create_engine(url) for url in urls]
+        self.async_engines: list[AsyncEngine] = []
+        if settings.db_async:
+            self.async_engines = [
+                create_async_engine(async_database_url(url), echo=False, **_engine_options(url, True)) for url in urls
+            ]
+        self._lags: list[float | None] = [None] * len(urls)
+        self._checked_at = [float("-inf")] * len(urls)
+        self._lock = threading.Lock()
+        self._turn = itertools.count()
+
+    @staticmethod
+    def _create_engine(url: str) -> Engine:
+        options = _engine_options(url)
+        if make_url(url).get_backend_name() == "postgresql":
+            connect_args = options.get("connect_args", {})
+            options["connect_args"] = {**connect_args, "connect_timeout": REPLICA_CONNECT_TIMEOUT_SECONDS}
+        replica = create_engine(url, echo=False, **options)
+        if settings.db_pool_pre_ping == "idle":
+            _ping_idle_connections(replica, settings.db_pool_ping_idle_seconds)
+        return replica
+
+    def _measure_lag(self, index: int) -> float | None:
+        try:
+            with self.engines[index].connect() as connection:
+                if connection.dialect.name != "postgresql":
+                    connection.execute(text("SELECT 1"))
+                    return 0.0
+                return float(connection.execute(REPLICA_LAG_SQL).scalar() or 0)
+        except Exception:
+            logger.warning("Read replica %s is unreachable", self.status_url(index), exc_info=True)
+            return None
+
+    def lag_seconds(self, index: int) -> float | None:
+        """Replication lag of replica ``index`` in seconds, or ``None`` if it could not be reached."""
+        with self._lock:
+            due = time.monotonic() - self._checked_at[index] >= settings.replica_lag_check_seconds
+            if due:
+                # Claim the check so concurrent requests keep using the previous value meanwhile.
+                self._checked_at[index] = time.monotonic()
+        if due:
+            self._lags[index] = self._measure_lag(index)
+        return self._lags[index]
+
+    def checks_due(self) -> bool:
+        now = time.monotonic()
+        return any(now - checked_at >= settings.replica_lag_check_seconds for checked_at in self._checked_at)
+
+    def pick(self) -> int | None:
+        """Index of the next replica within ``settings.replica_max_lag_seconds``, or ``None`` to use the primary."""
+        if not self.engines:
+            return None
+        start = next(self._turn)
+        for offset in range(len(self.engines)):
+            index = (start + offset) % len(self.engines)
+            lag = self.lag_seconds(index)
+            if lag is not None and lag <= settings.replica_max_lag_seconds:
+                return index
+        return None
+
+    def status_url(self, index: int) -> str:
+        return make_url(self.urls[index]).render_as_string(hide_password=True)
+
+    def status(self) -> list[ReplicaStatus]:
+        statuses = []
+        for index in range(len(self.engines)):
+            lag = self.lag_seconds(index)
+            healthy = lag is not None and lag <= settings.replica_max_lag_seconds
+            statuses.append(ReplicaStatus(url=self.status_url(index), lag_seconds=lag, healthy=healthy))
+        return statuses
+
+
+replicas = ReplicaSet(settings.replica_urls)
+
+
+class ThreadedSession:
+    """Awaitable stand-in for ``AsyncSession`` over a sync ``Session`` when ``settings.db_async`` is off.
+
+    Each call runs in the thread pool, buffers its rows there and closes the
+    session again, so results can be consumed from the event loop like an
+    ``AsyncSession``'s and no connection stays checked out while the request
+    waits for a free thread.
+    """
+
+    def __init__(self, session: Session) -> None:
+        self.session = session
+
+    def _run(self, call: Any) -> Any:
+        try:
+            return call()
+        finally:
+            self.session.close()
+
+    async def exec(self, statement: Any, **kwargs: Any) -> Any:
+        frozen = await run_in_threadpool(self._run, lambda: self.session.execute(statement, **kwargs).freeze())
+        result = frozen()
+        return result.scalars() if isinstance(statement, SelectOfScalar) else result
+
+    async def get(self, entity: Any, ident: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(self._run, lambda: self.session.get(entity, ident, **kwargs))
+
+    async def close(self) -> None:
+        self.session.close()
+
+
+@dataclass
+class PoolStats:
+    size: int
+    checked_out: int
+    idle: int
+    overflow: int
+    max_overflow: int
+    checkouts: int
+    timeouts: int
+    wait_seconds_total: float
+    wait_seconds_max: float
+
+
+def pool_stats(bind: Engine | AsyncEngine = engine) -> PoolStats | None:
+    """Connection counts and checkout waits of this process's pool, or ``None`` for unmetered pools."""
+    pool = bind.pool
+    if not isinstance(pool, _MeteredPool):
+        return None
+    metrics = pool.metrics
+    return PoolStats(
+        size=pool.size(),
+        checked_out=pool.checkedout(),
+        idle=pool.checkedin(),
+        overflow=max(pool.overflow(), 0),
+        max_overflow=pool._max_overflow,
+        checkouts=metrics.checkouts,
+        timeouts=metrics.timeouts,
+        wait_seconds_total=metrics.wait_seconds_total,
+        wait_seconds_max=metrics.wait_seconds_max,
+    )
+
+
+def disable_statement_timeout(connection: Connection) -> None:
+    """Lift ``settings.db_statement_timeout_ms`` for the rest of the current transaction."""
+    if settings.db_statement_timeout_ms and connection.dialect.name == "postgresql":
+        connection.execute(text("SET LOCAL statement_timeout = 0"))
+
+
+def ensure_indexes(bind: Engine = engine) -> None:
+    """Create indexes declared on models that predate their tables' creation."""
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
 
 
 def init_db() -> None:
-    """Initialize database with simple retry to handle cold starts."""
+    """Bring the schema up to date, with simple retry to handle cold starts."""
+    from .migrations.runner import upgrade
+
     retries = 10
     delay_seconds = 2
 
     for attempt in range(1, retries + 1):
         try:
-            SQLModel.metadata.create_all(bind=engine)
+            upgrade(engine)
             return
         except OperationalError as exc:
             if attempt == retries:
@@ -1,10 +1,15 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
+from .api.deps import READ_METHODS, remember_write
 from .api.routes import api_router
 from .core.config import settings
 from .core.initial_data import create_initial_superuser
 from .db import init_db
+from .services.green_stock import ensure_lot_stock_rows
+from .services.shrinkage import ensure_shrinkage_stats
+from .services.stock import ensure_stock_rows
+from .services.user_cache import start_listener
 
 app = FastAPI(title=settings.project_name, root_path=settings.root_path or "")
 
@@ -16,13 +21,26 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Next-Cursor"],
 )
 
 
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    response = await call_next(request)
+    if request.method not in READ_METHODS and response.status_code < 400:
+        remember_write(request, response)
+    return response
+
+
 @app.on_event("startup")
 def on_startup() -> None:
     init_db()
+    ensure_stock_rows()
+    ensure_lot_stock_rows()
+    ensure_shrinkage_stats()
     create_initial_superuser()
+    start_listener()
 
 
 @app.get("/")
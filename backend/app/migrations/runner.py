@@ -0,0 +1,281 @@
+"""Versioned schema and data migrations.
+
+Each module in ``app/migrations/versions`` named ``NNNN_description.py`` is
+one migration, applied in version order and recorded in the
+``schema_migration`` table. A module defines:
+
+``up(connection)``
+    Schema changes, run in one transaction together with the version row.
+``down(connection)``
+    Optional; reverts ``up``. Migrations without it are irreversible.
+``backfill(connection, after, limit)``
+    Optional data migration run after ``up`` in chunks. It handles the next
+    ``limit`` rows keyed above ``after`` and returns the last key it handled,
+    or ``None`` once nothing is left. Every chunk commits on its own together
+    with its progress, so a large backfill never holds locks for long and an
+    interrupted run resumes from the last committed chunk.
+
+Migrations check the current schema before changing it (see
+``column_exists``), so databases created before versioning can replay the
+whole history. A database with no tables at all is created from the models
+and stamped with every version. After migrating, tables that are new to the
+models are created, as ``init_db`` always did.
+
+Run ``python -m app.migrations.runner [upgrade|downgrade VERSION|status]``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import pkgutil
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from types import ModuleType
+from typing import Callable
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import SQLModel
+
+from .. import models  # noqa: F401  registers every table on the metadata
+from ..db import disable_statement_timeout, engine, ensure_indexes
+from . import versions
+
+DEFAULT_CHUNK_SIZE = 5000
+# pg_advisory_lock key serialising concurrent runners (e.g. several workers starting).
+ADVISORY_LOCK_ID = 0x526F617374
+
+version_metadata = MetaData()
+schema_migration = Table(
+    "schema_migration",
+    version_metadata,
+    Column("version", String, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("backfilled_to", Integer, nullable=False, default=0),
+    Column("applied_at", DateTime, nullable=True),
+)
+
+
+class MigrationError(RuntimeError):
+    """Raised when migrations cannot be applied or reverted."""
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: str
+    name: str
+    up: Callable[[Connection], None]
+    down: Callable[[Connection], None] | None
+    backfill: Callable[[Connection, int, int], int | None] | None
+
+
+def _migration(module: ModuleType, module_name: str) -> Migration:
+    version, _, name = module_name.partition("_")
+    return Migration(
+        version=version,
+        name=name,
+        up=module.up,
+        down=getattr(module, "down", None),
+        backfill=getattr(module, "backfill", None),
+    )
+
+
+def load_migrations() -> list[Migration]:
+    migrations = []
+    for info in pkgutil.iter_modules(versions.__path__):
+        if info.name[:1].isdigit():
+            module = importlib.import_module(f"{versions.__name__}.{info.name}")
+            migrations.append(_migration(module, info.name))
+    migrations.sort(key=lambda migration: migration.version)
+    seen = [migration.version for migration in migrations]
+    if len(seen) != len(set(seen)):
+        raise MigrationError(f"Duplicate migration versions: {seen}")
+    return migrations
+
+
+# Helpers for migration modules.
+def column_exists(connection: Connection, table: str, column: str) -> bool:
+    inspector = inspect(connection)
+    if not inspector.has_table(table):
+        return False
+    return column in {info["name"] for info in inspector.get_columns(table)}
+
+
+def table_exists(connection: Connection, table: str) -> bool:
+    return inspect(connection).has_table(table)
+
+
+def next_chunk_end(
+    connection: Connection, table: str, after: int, limit: int, key: str = "id", where: str = "TRUE"
+) -> int | None:
+    """Highest ``key`` among the next ``limit`` rows of ``table`` above ``after``, or ``None`` if there are none."""
+    return connection.execute(
+        text(
+            f"SELECT MAX({key}) FROM (SELECT {key} FROM {table} WHERE {key} > :after AND ({where}) "
+            f"ORDER BY {key} LIMIT :limit) AS chunk"
+        ),
+        {"after": after, "limit": limit},
+    ).scalar()
+
+
+def _applied(connection: Connection) -> dict[str, dict]:
+    rows = connection.execute(select(schema_migration)).mappings()
+    return {row["version"]: dict(row) for row in rows}
+
+
+def _with_lock(bind: Engine, action: Callable[[], None]) -> None:
+    if bind.dialect.name != "postgresql":
+        action()
+        return
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as lock_connection:
+        # Waiting for another runner may take longer than the app's statement timeout.
+        lock_connection.execute(text("SET statement_timeout = 0"))
+        lock_connection.execute(text("SELECT pg_advisory_lock(:id)"), {"id": ADVISORY_LOCK_ID})
+        try:
+            action()
+        finally:
+            lock_connection.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": ADVISORY_LOCK_ID})
+            lock_connection.execute(text("RESET statement_timeout"))
+
+
+def _is_empty(bind: Engine) -> bool:
+    existing = set(inspect(bind).get_table_names()) - {schema_migration.name}
+    return not existing & set(SQLModel.metadata.tables)
+
+
+def _apply(bind: Engine, migration: Migration, state: dict | None, chunk_size: int) -> None:
+    if state is None:
+        print(f"Applying {migration.version} {migration.name}")
+        with bind.begin() as connection:
+            disable_statement_timeout(connection)
+            migration.up(connection)
+            connection.execute(
+                schema_migration.insert().values(version=migration.version, name=migration.name, backfilled_to=0)
+            )
+        after = 0
+    else:
+        print(f"Resuming {migration.version} {migration.name} after key {state['backfilled_to']}")
+        after = state["backfilled_to"]
+
+    if migration.backfill is not None:
+        while True:
+            with bind.begin() as connection:
+                disable_statement_timeout(connection)
+                last = migration.backfill(connection, after, chunk_size)
+                if last is None:
+                    break
+                connection.execute(
+                    schema_migration.update()
+                    .where(schema_migration.c.version == migration.version)
+                    .values(backfilled_to=last)
+                )
+            after = last
+
+    with bind.begin() as connection:
+        connection.execute(
+            schema_migration.update()
+            .where(schema_migration.c.version == migration.version)
+            .values(applied_at=datetime.now(timezone.utc).replace(tzinfo=None))
+        )
+
+
+def upgrade(bind: Engine = engine, chunk_size: int = DEFAULT_CHUNK_SIZE) -> list[str]:
+    """Apply every pending migration; returns the versions applied."""
+    migrations = load_migrations()
+    applied_versions: list[str] = []
+
+    def action() -> None:
+        fresh = _is_empty(bind)
+        version_metadata.create_all(bind)
+        if fresh:
+            SQLModel.metadata.create_all(bind)
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            with bind.begin() as connection:
+                for migration in migrations:
+                    connection.execute(
+                        schema_migration.insert().values(
+                            version=migration.version, name=migration.name, backfilled_to=0, applied_at=now
+                        )
+                    )
+            return
+
+        with bind.connect() as connection:
+            state = _applied(connection)
+        for migration in migrations:
+            current = state.get(migration.version)
+            if current is not None and current["applied_at"] is not None:
+                continue
+            _apply(bind, migration, current, chunk_size)
+            applied_versions.append(migration.version)
+        SQLModel.metadata.create_all(bind)
+
+    _with_lock(bind, action)
+    ensure_indexes(bind)
+    return applied_versions
+
+
+def downgrade(target: str, bind: Engine = engine) -> list[str]:
+    """Revert applied migrations newer than ``target`` (``"0"`` reverts all); returns the versions reverted."""
+    migrations = {migration.version: migration for migration in load_migrations()}
+    reverted: list[str] = []
+
+    def action() -> None:
+        version_metadata.create_all(bind)
+        with bind.connect() as connection:
+            state = _applied(connection)
+        for version in sorted(state, reverse=True):
+            if version <= target:
+                break
+            migration = migrations.get(version)
+            if migration is None:
+                raise MigrationError(f"Migration {version} is applied but missing from the code")
+            if migration.down is None:
+                raise MigrationError(f"Migration {version} {migration.name} is irreversible")
+            print(f"Reverting {migration.version} {migration.name}")
+            with bind.begin() as connection:
+                disable_statement_timeout(connection)
+                migration.down(connection)
+                connection.execute(schema_migration.delete().where(schema_migration.c.version == version))
+            reverted.append(version)
+
+    _with_lock(bind, action)
+    return reverted
+
+
+def status(bind: Engine = engine) -> list[tuple[Migration, dict | None]]:
+    version_metadata.create_all(bind)
+    with bind.connect() as connection:
+        state = _applied(connection)
+    return [(migration, state.get(migration.version)) for migration in load_migrations()]
+
+
+def run() -> None:
+    parser = argparse.ArgumentParser(description="Apply or revert versioned migrations.")
+    commands = parser.add_subparsers(dest="command")
+    upgrade_parser = commands.add_parser("upgrade")
+    upgrade_parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    downgrade_parser = commands.add_parser("downgrade")
+    downgrade_parser.add_argument("version", help='target version; "0" reverts everything')
+    commands.add_parser("status")
+    args = parser.parse_args()
+
+    if args.command == "downgrade":
+        reverted = downgrade(args.version)
+        print(f"{len(reverted)} migration(s) reverted")
+    elif args.command == "status":
+        for migration, state in status():
+            if state is None:
+                label = "pending"
+            elif state["applied_at"] is None:
+                label = f"backfilling (after key {state['backfilled_to']})"
+            else:
+                label = f"applied {state['applied_at']:%Y-%m-%d %H:%M}"
+            print(f"{migration.version} {migration.name}: {label}")
+    else:
+        applied = upgrade(chunk_size=getattr(args, "chunk_size", DEFAULT_CHUNK_SIZE))
+        print(f"{len(applied)} migration(s) applied")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,60 @@
+"""Store weights in grams and keep green coffee prices per kilogram.
+
+Ported from the former ``convert_kg_to_g`` script.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from ..runner import column_exists
+
+FACTOR = 1000.0
+WEIGHT_COLUMNS = (
+    ("coffeelot", "green_weight_kg", "green_weight_g"),
+    ("roastbatch", "green_input_kg", "green_input_g"),
+    ("roastbatch", "roasted_output_kg", "roasted_output_g"),
+)
+
+
+def _rename_and_scale(connection: Connection, table: str, old: str, new: str, factor: float) -> None:
+    if column_exists(connection, table, new) or not column_exists(connection, table, old):
+        return
+    print(f"Renaming {table}.{old} -> {new}")
+    connection.execute(text(f"ALTER TABLE {table} RENAME COLUMN {old} TO {new}"))
+    connection.execute(text(f"UPDATE {table} SET {new} = {new} * :factor"), {"factor": factor})
+
+
+def _drop_column(connection: Connection, table: str, column: str) -> None:
+    if column_exists(connection, table, column):
+        print(f"Dropping legacy {table}.{column} column")
+        connection.execute(text(f"ALTER TABLE {table} DROP COLUMN {column}"))
+
+
+def up(connection: Connection) -> None:
+    for table, old, new in WEIGHT_COLUMNS:
+        _rename_and_scale(connection, table, old, new, FACTOR)
+
+    if column_exists(connection, "coffeelot", "price_per_kg"):
+        _drop_column(connection, "coffeelot", "price_per_g")
+    else:
+        _rename_and_scale(connection, "coffeelot", "price_per_g", "price_per_kg", FACTOR)
+
+    if not column_exists(connection, "sale", "total_quantity_g"):
+        if column_exists(connection, "sale", "quantity_g"):
+            _rename_and_scale(connection, "sale", "quantity_g", "total_quantity_g", 1.0)
+        elif column_exists(connection, "sale", "quantity_kg"):
+            _rename_and_scale(connection, "sale", "quantity_kg", "total_quantity_g", FACTOR)
+        else:
+            print("Adding sale.total_quantity_g column")
+            connection.execute(text("ALTER TABLE sale ADD COLUMN total_quantity_g DOUBLE PRECISION DEFAULT 0"))
+    _drop_column(connection, "sale", "price_per_g")
+    _drop_column(connection, "sale", "price_per_kg")
+
+
+def down(connection: Connection) -> None:
+    """Move weights back to kilograms; the dropped legacy price columns are not restored."""
+    for table, old, new in WEIGHT_COLUMNS:
+        _rename_and_scale(connection, table, new, old, 1 / FACTOR)
+    _rename_and_scale(connection, "sale", "total_quantity_g", "quantity_kg", 1 / FACTOR)
@@ -0,0 +1,59 @@
+"""Split sales into line items.
+
+Each historical sale that still carries ``sale.roast_batch_id`` becomes a
+single item. Ported from the former ``convert_kg_to_g`` script, which
+inserted the items one by one inside a single transaction.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from ..runner import column_exists, next_chunk_end, table_exists
+
+LEGACY_SALE = (
+    "roast_batch_id IS NOT NULL AND total_quantity_g IS NOT NULL AND total_quantity_g > 0"
+    " AND NOT EXISTS (SELECT 1 FROM saleitem WHERE saleitem.sale_id = sale.id)"
+)
+
+
+def up(connection: Connection) -> None:
+    if table_exists(connection, "saleitem"):
+        return
+    print("Creating saleitem table")
+    connection.execute(
+        text(
+            """
+            CREATE TABLE saleitem (
+                id SERIAL PRIMARY KEY,
+                sale_id INTEGER NOT NULL REFERENCES sale(id) ON DELETE CASCADE,
+                roast_batch_id INTEGER NOT NULL REFERENCES roastbatch(id),
+                bag_size_g INTEGER NOT NULL,
+                bags INTEGER NOT NULL DEFAULT 1,
+                bag_price DOUBLE PRECISION NOT NULL,
+                notes TEXT
+            )
+            """
+        )
+    )
+
+
+def backfill(connection: Connection, after: int, limit: int) -> int | None:
+    if not column_exists(connection, "sale", "roast_batch_id"):
+        return None
+    last = next_chunk_end(connection, "sale", after, limit, where=LEGACY_SALE)
+    if last is None:
+        return None
+    connection.execute(
+        text(
+            f"""
+            INSERT INTO saleitem (sale_id, roast_batch_id, bag_size_g, bags, bag_price)
+            SELECT id, roast_batch_id, CAST(total_quantity_g AS INTEGER), 1, COALESCE(total_price, 0)
+            FROM sale
+            WHERE id > :after AND id <= :last AND {LEGACY_SALE}
+            """
+        ),
+        {"after": after, "last": last},
+    )
+    return last
@@ -0,0 +1,14 @@
+"""Drop ``sale.roast_batch_id`` once every sale has its items."""
+
+from __future__ import annotations
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from ..runner import column_exists
+
+
+def up(connection: Connection) -> None:
+    if column_exists(connection, "sale", "roast_batch_id"):
+        print("Dropping legacy sale.roast_batch_id column")
+        connection.execute(text("ALTER TABLE sale DROP COLUMN roast_batch_id"))
@@ -0,0 +1,40 @@
+"""Store each roast's cost per roasted gram. Replaces ``add_cost_of_goods``."""
+
+from __future__ import annotations
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from ..runner import column_exists, next_chunk_end
+
+
+def up(connection: Connection) -> None:
+    if not column_exists(connection, "roastbatch", "cost_per_g"):
+        print("Adding roastbatch.cost_per_g column")
+        connection.execute(text("ALTER TABLE roastbatch ADD COLUMN cost_per_g DOUBLE PRECISION NOT NULL DEFAULT 0"))
+
+
+def backfill(connection: Connection, after: int, limit: int) -> int | None:
+    last = next_chunk_end(connection, "roastbatch", after, limit)
+    if last is None:
+        return None
+    connection.execute(
+        text(
+            """
+            UPDATE roastbatch
+            SET cost_per_g = CASE
+                WHEN roasted_output_g > 0 THEN green_input_g / 1000.0 * COALESCE(
+                    (SELECT price_per_kg FROM coffeelot WHERE coffeelot.id = roastbatch.lot_id), 0
+                ) / roasted_output_g
+                ELSE 0
+            END
+            WHERE id > :after AND id <= :last
+            """
+        ),
+        {"after": after, "last": last},
+    )
+    return last
+
+
+def down(connection: Connection) -> None:
+    connection.execute(text("ALTER TABLE roastbatch DROP COLUMN cost_per_g"))
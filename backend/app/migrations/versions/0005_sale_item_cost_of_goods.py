@@ -0,0 +1,37 @@
+"""Store each sale item's cost of goods. Replaces ``add_cost_of_goods``."""
+
+from __future__ import annotations
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from ..runner import column_exists, next_chunk_end
+
+
+def up(connection: Connection) -> None:
+    if not column_exists(connection, "saleitem", "cost_of_goods"):
+        print("Adding saleitem.cost_of_goods column")
+        connection.execute(text("ALTER TABLE saleitem ADD COLUMN cost_of_goods DOUBLE PRECISION NOT NULL DEFAULT 0"))
+
+
+def backfill(connection: Connection, after: int, limit: int) -> int | None:
+    last = next_chunk_end(connection, "saleitem", after, limit)
+    if last is None:
+        return None
+    connection.execute(
+        text(
+            """
+            UPDATE saleitem
+            SET cost_of_goods = bag_size_g * bags * COALESCE(
+                (SELECT cost_per_g FROM roastbatch WHERE roastbatch.id = saleitem.roast_batch_id), 0
+            )
+            WHERE id > :after AND id <= :last
+            """
+        ),
+        {"after": after, "last": last},
+    )
+    return last
+
+
+def down(connection: Connection) -> None:
+    connection.execute(text("ALTER TABLE saleitem DROP COLUMN cost_of_goods"))
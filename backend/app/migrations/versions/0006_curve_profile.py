@@ -0,0 +1,53 @@
+"""Store the resampled bean temperature profile used by roast similarity.
+
+Replaces ``add_curve_profile``.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import LargeBinary, bindparam, text
+from sqlalchemy.engine import Connection
+
+from ...services.curves import curve_profile
+from ...services.telemetry import unpack_floats
+from ..runner import column_exists, table_exists
+
+
+def up(connection: Connection) -> None:
+    if not table_exists(connection, "roastcurve") or column_exists(connection, "roastcurve", "profile"):
+        return
+    print("Adding roastcurve.profile column")
+    column_type = LargeBinary().compile(dialect=connection.dialect)
+    connection.execute(text(f"ALTER TABLE roastcurve ADD COLUMN profile {column_type}"))
+
+
+def backfill(connection: Connection, after: int, limit: int) -> int | None:
+    if not table_exists(connection, "roastcurve"):
+        return None
+    rows = connection.execute(
+        text(
+            "SELECT roast_batch_id, time_s, bean_temp, drop_s FROM roastcurve"
+            " WHERE roast_batch_id > :after AND profile IS NULL ORDER BY roast_batch_id LIMIT :limit"
+        ),
+        {"after": after, "limit": limit},
+    ).all()
+    if not rows:
+        return None
+    update = text("UPDATE roastcurve SET profile = :profile WHERE roast_batch_id = :roast_batch_id").bindparams(
+        bindparam("profile", type_=LargeBinary)
+    )
+    connection.execute(
+        update,
+        [
+            {
+                "roast_batch_id": roast_batch_id,
+                "profile": curve_profile(unpack_floats(time_s), unpack_floats(bean_temp), drop_s),
+            }
+            for roast_batch_id, time_s, bean_temp, drop_s in rows
+        ],
+    )
+    return rows[-1].roast_batch_id
+
+
+def down(connection: Connection) -> None:
+    connection.execute(text("ALTER TABLE roastcurve DROP COLUMN profile"))
@@ -0,0 +1,44 @@
+"""Backfill NULL ``sale.amount_paid`` with 0 and make the column NOT NULL.
+
+Legacy sales stored no payment as NULL; such rows never satisfy the
+``total_price > amount_paid`` predicate of the unpaid-sales partial index.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from ..runner import column_exists, next_chunk_end
+
+
+def up(connection: Connection) -> None:
+    """Nothing to do before the backfill; the constraint is added once no NULL is left."""
+
+
+def backfill(connection: Connection, after: int, limit: int) -> int | None:
+    if not column_exists(connection, "sale", "amount_paid"):
+        return None
+    last = next_chunk_end(connection, "sale", after, limit, where="amount_paid IS NULL")
+    if last is None:
+        # Every NULL is gone; SQLite cannot alter the column and relies on the model's default.
+        if connection.dialect.name == "postgresql":
+            connection.execute(
+                text(
+                    "ALTER TABLE sale ALTER COLUMN amount_paid SET DEFAULT 0, "
+                    "ALTER COLUMN amount_paid SET NOT NULL"
+                )
+            )
+        return None
+    connection.execute(
+        text("UPDATE sale SET amount_paid = 0 WHERE id > :after AND id <= :last AND amount_paid IS NULL"),
+        {"after": after, "last": last},
+    )
+    return last
+
+
+def down(connection: Connection) -> None:
+    if connection.dialect.name == "postgresql":
+        connection.execute(
+            text("ALTER TABLE sale ALTER COLUMN amount_paid DROP NOT NULL, ALTER COLUMN amount_paid DROP DEFAULT")
+        )
@@ -1,4 +1,4 @@
-from .user import User, UserCreate, UserRead, UserUpdate
+from .user import ApiKey, ApiKeyCreate, ApiKeyCreated, ApiKeyRead, User, UserCreate, UserRead, UserUpdate
 from .coffee import (
     CoffeeLot,
     CoffeeLotCreate,
@@ -27,6 +27,7 @@ from .coffee import (
     SaleItem,
     SaleItemCreate,
     SaleItemRead,
+    SaleItemUpdate,
     PriceReference,
     PriceReferenceCreate,
     PriceReferenceRead,
@@ -36,18 +37,26 @@ from .coffee import (
     VarietyRead,
     VarietyUpdate,
 )
+from .analytics import DailyCoffeeRollup, DailyExpenseRollup, ShrinkageStat
 from .inventory import (
+    LotStock,
     RoastInventoryAdjustment,
     RoastInventoryAdjustmentCreate,
     RoastInventoryAdjustmentRead,
     RoastInventoryAdjustmentUpdate,
+    RoastStock,
 )
+from .telemetry import RoastCurve
 
 __all__ = [
     "User",
     "UserCreate",
     "UserRead",
     "UserUpdate",
+    "ApiKey",
+    "ApiKeyCreate",
+    "ApiKeyCreated",
+    "ApiKeyRead",
     "Farm",
     "FarmCreate",
     "FarmRead",
@@ -75,6 +84,7 @@ __all__ = [
     "SaleItem",
     "SaleItemCreate",
     "SaleItemRead",
+    "SaleItemUpdate",
     "PriceReference",
     "PriceReferenceCreate",
     "PriceReferenceRead",
@@ -87,4 +97,10 @@ __all__ = [
     "RoastInventoryAdjustmentCreate",
     "RoastInventoryAdjustmentRead",
     "RoastInventoryAdjustmentUpdate",
+    "RoastStock",
+    "LotStock",
+    "DailyCoffeeRollup",
+    "DailyExpenseRollup",
+    "ShrinkageStat",
+    "RoastCurve",
 ]
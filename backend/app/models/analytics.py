@@ -0,0 +1,37 @@
+from datetime import date
+
+from sqlmodel import Field, SQLModel
+
+
+class DailyCoffeeRollup(SQLModel, table=True):
+    """Per-day coffee activity grouped by the lot's variety and process."""
+
+    day: date = Field(primary_key=True)
+    variety_id: int = Field(primary_key=True)
+    process: str = Field(primary_key=True)
+    green_purchased_g: float = 0.0
+    roast_count: int = 0
+    roasted_green_g: float = 0.0
+    roasted_output_g: float = 0.0
+    shrinkage_pct_sum: float = 0.0
+    sold_g: float = 0.0
+    revenue: float = 0.0
+
+
+class DailyExpenseRollup(SQLModel, table=True):
+    """Per-day expense totals grouped by category."""
+
+    day: date = Field(primary_key=True)
+    category: str = Field(primary_key=True)
+    expense_count: int = 0
+    amount: float = 0.0
+
+
+class ShrinkageStat(SQLModel, table=True):
+    """Running shrinkage count, mean and squared deviations (Welford) per roast group."""
+
+    dimension: str = Field(primary_key=True)
+    group_key: str = Field(primary_key=True)
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
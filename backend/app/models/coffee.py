@@ -1,6 +1,7 @@
 from datetime import date
 from typing import List, Optional
 
+from sqlalchemy import Index, text
 from sqlmodel import Field, Relationship, SQLModel
 
 
@@ -71,6 +72,7 @@ class CoffeeLotCreate(CoffeeLotBase):
 
 class CoffeeLotRead(CoffeeLotBase):
     id: int
+    remaining_g: Optional[float] = None
 
 
 class CoffeeLotUpdate(SQLModel):
@@ -96,6 +98,7 @@ class RoastBatchBase(SQLModel):
 class RoastBatch(RoastBatchBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     shrinkage_pct: float = 0.0
+    cost_per_g: float = 0.0
 
 
 class RoastBatchCreate(RoastBatchBase):
@@ -105,6 +108,7 @@ class RoastBatchCreate(RoastBatchBase):
 class RoastBatchRead(RoastBatchBase):
     id: int
     shrinkage_pct: float
+    cost_per_g: float = 0.0
 
 
 class RoastBatchUpdate(SQLModel):
@@ -148,6 +152,19 @@ class SaleBase(SQLModel):
 
 
 class Sale(SaleBase, table=True):
+    __table_args__ = (
+        Index("ix_sale_sale_date_id", "sale_date", "id"),
+        Index("ix_sale_customer_id_sale_date_id", "customer_id", "sale_date", "id"),
+        Index("ix_sale_is_paid_sale_date_id", "is_paid", "sale_date", "id"),
+        Index(
+            "ix_sale_unpaid_customer_id_sale_date",
+            "customer_id",
+            "sale_date",
+            postgresql_where=text("total_price > amount_paid"),
+            sqlite_where=text("total_price > amount_paid"),
+        ),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     total_price: float = 0.0
     total_quantity_g: float = 0.0
@@ -178,7 +195,7 @@ class SaleUpdate(SQLModel):
     customer_id: Optional[int] = None
     sale_date: Optional[date] = None
     notes: Optional[str] = None
-    items: Optional[list["SaleItemCreate"]] = None
+    items: Optional[list["SaleItemUpdate"]] = None
     is_paid: Optional[bool] = None
     amount_paid: Optional[float] = None
     paid_at: Optional[date] = None
@@ -193,8 +210,11 @@ class SaleItemBase(SQLModel):
 
 
 class SaleItem(SaleItemBase, table=True):
+    __table_args__ = (Index("ix_saleitem_roast_batch_id_sale_id", "roast_batch_id", "sale_id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    sale_id: int = Field(foreign_key="sale.id")
+    sale_id: int = Field(foreign_key="sale.id", index=True)
+    cost_of_goods: float = 0.0
     sale: Optional["Sale"] = Relationship(back_populates="items")
 
 
@@ -202,9 +222,14 @@ class SaleItemCreate(SaleItemBase):
     pass
 
 
+class SaleItemUpdate(SaleItemCreate):
+    id: Optional[int] = None
+
+
 class SaleItemRead(SaleItemBase):
     id: int
     sale_id: int
+    cost_of_goods: float = 0.0
 
 
 Sale.model_rebuild()
@@ -212,6 +237,7 @@ SaleCreate.model_rebuild()
 SaleRead.model_rebuild()
 SaleUpdate.model_rebuild()
 SaleItemCreate.model_rebuild()
+SaleItemUpdate.model_rebuild()
 SaleItemRead.model_rebuild()
 
 
@@ -30,3 +30,22 @@ class RoastInventoryAdjustmentUpdate(SQLModel):
     adjustment_g: Optional[float] = None
     reason: Optional[str] = None
     adjustment_date: Optional[date] = None
+
+
+class RoastStock(SQLModel, table=True):
+    """Running roasted-coffee balance per roast, maintained on every write."""
+
+    roast_batch_id: int = Field(foreign_key="roastbatch.id", primary_key=True)
+    roasted_output_g: float = 0.0
+    sold_g: float = 0.0
+    adjusted_g: float = 0.0
+    available_g: float = 0.0
+
+
+class LotStock(SQLModel, table=True):
+    """Running green-coffee balance per lot, maintained on every roast write."""
+
+    lot_id: int = Field(foreign_key="coffeelot.id", primary_key=True)
+    green_weight_g: float = 0.0
+    roasted_g: float = 0.0
+    remaining_g: float = 0.0
@@ -0,0 +1,30 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Column, LargeBinary
+from sqlmodel import Field, SQLModel
+
+
+class RoastCurve(SQLModel, table=True):
+    """Temperature curve of a roast batch stored as packed float32 arrays.
+
+    ``time_s``, ``bean_temp`` and ``env_temp`` hold ``sample_count`` little
+    endian float32 values each; times are seconds since charge.
+    """
+
+    roast_batch_id: int = Field(foreign_key="roastbatch.id", primary_key=True)
+    sample_count: int
+    time_s: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    bean_temp: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    env_temp: Optional[bytes] = Field(default=None, sa_column=Column(LargeBinary, nullable=True))
+    # Bean temperature resampled to a fixed number of points between charge and drop.
+    profile: Optional[bytes] = Field(default=None, sa_column=Column(LargeBinary, nullable=True))
+    charge_temp: float
+    turning_point_s: Optional[float] = None
+    turning_point_temp: Optional[float] = None
+    first_crack_s: Optional[float] = None
+    first_crack_temp: Optional[float] = None
+    drop_s: float
+    drop_temp: float
+    development_time_ratio: Optional[float] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
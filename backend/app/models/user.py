@@ -1,4 +1,5 @@
-from typing import Optional
+from datetime import datetime
+from typing import Literal, Optional
 
 from pydantic import EmailStr
 from sqlalchemy import Column, String
@@ -29,3 +30,42 @@ class UserUpdate(SQLModel):
     full_name: Optional[str] = None
     password: Optional[str] = None
     is_active: Optional[bool] = None
+
+
+# Each scope includes the ones before it: read < write < admin.
+ApiKeyScope = Literal["read", "write", "admin"]
+
+
+class ApiKeyBase(SQLModel):
+    name: str
+    scope: ApiKeyScope = Field(default="read", sa_column=Column(String(16), nullable=False, server_default="read"))
+    expires_at: Optional[datetime] = None
+
+
+class ApiKey(ApiKeyBase, table=True):
+    """Machine credential acting as ``user_id``; only an HMAC-SHA256 digest of the key is stored."""
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id", index=True)
+    prefix: str = Field(sa_column=Column(String(32), unique=True, index=True, nullable=False))
+    key_hash: str
+    created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+    revoked_at: Optional[datetime] = None
+
+
+class ApiKeyCreate(ApiKeyBase):
+    # Defaults to the superuser creating the key.
+    user_id: Optional[int] = None
+
+
+class ApiKeyRead(ApiKeyBase):
+    id: int
+    user_id: int
+    prefix: str
+    created_at: datetime
+    revoked_at: Optional[datetime] = None
+
+
+class ApiKeyCreated(ApiKeyRead):
+    # The full key, shown only once at creation.
+    key: str
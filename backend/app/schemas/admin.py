@@ -0,0 +1,41 @@
+from pydantic import BaseModel
+
+
+class TableSnapshotRead(BaseModel):
+    table: str
+    rows: int
+    max_id: int
+    parts: list[str]
+
+
+class SnapshotResult(BaseModel):
+    taken_at: str
+    incremental: bool
+    tables: dict[str, TableSnapshotRead]
+
+
+class CacheStatsRead(BaseModel):
+    name: str
+    size: int
+    maxsize: int
+    ttl_seconds: float
+    hits: int
+    misses: int
+
+
+class PoolStatsRead(BaseModel):
+    size: int
+    checked_out: int
+    idle: int
+    overflow: int
+    max_overflow: int
+    checkouts: int
+    timeouts: int
+    wait_seconds_total: float
+    wait_seconds_max: float
+
+
+class ReplicaStatusRead(BaseModel):
+    url: str
+    lag_seconds: float | None
+    healthy: bool
@@ -1,3 +1,5 @@
+from datetime import date
+
 from pydantic import BaseModel
 
 from ..models import CoffeeLotRead, ExpenseRead, SaleRead
@@ -25,3 +27,14 @@ class DashboardSummary(BaseModel):
     recent_purchases: list[CoffeeLotRead]
     recent_expenses: list[ExpenseRead]
     recent_sales: list[SaleRead]
+
+
+class TimeseriesPoint(BaseModel):
+    period: date
+    value: float
+
+
+class Timeseries(BaseModel):
+    metric: str
+    granularity: str
+    points: list[TimeseriesPoint]
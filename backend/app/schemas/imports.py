@@ -0,0 +1,16 @@
+from typing import Any
+
+from pydantic import BaseModel
+
+
+class ImportReject(BaseModel):
+    line: int
+    error: str
+    row: dict[str, Any]
+
+
+class ImportResult(BaseModel):
+    entity: str
+    imported: int
+    rejected: int
+    rejects: list[ImportReject]
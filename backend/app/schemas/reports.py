@@ -0,0 +1,27 @@
+from datetime import date
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class ProfitabilityRow(BaseModel):
+    farm_id: Optional[int] = None
+    farm_name: Optional[str] = None
+    variety_id: Optional[int] = None
+    variety_name: Optional[str] = None
+    process: Optional[str] = None
+    roast_level: Optional[str] = None
+    bag_size_g: Optional[int] = None
+    revenue: float
+    grams_sold: float
+    cogs: float
+    margin: float
+    margin_pct: float
+    shrinkage_pct: float
+
+
+class ProfitabilityReport(BaseModel):
+    group_by: list[str]
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    rows: list[ProfitabilityRow]
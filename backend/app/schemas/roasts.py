@@ -0,0 +1,52 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+from ..models import RoastBatchRead
+
+
+class SimilarRoast(BaseModel):
+    roast: RoastBatchRead
+    distance: float
+    curve_rmse: Optional[float] = None
+
+
+class RoastBatchCreated(RoastBatchRead):
+    shrinkage_zscore: Optional[float] = None
+    shrinkage_outlier: bool = False
+
+
+class ShrinkageGroupStats(BaseModel):
+    key: Optional[str] = None
+    count: int
+    mean: float
+    stddev: float
+    p10: Optional[float] = None
+    p25: Optional[float] = None
+    p50: Optional[float] = None
+    p75: Optional[float] = None
+    p90: Optional[float] = None
+
+
+class ShrinkageOutlier(BaseModel):
+    roast_id: int
+    key: Optional[str] = None
+    shrinkage_pct: float
+    zscore: float
+
+
+class ShrinkageStatsReport(BaseModel):
+    group_by: str
+    threshold: float
+    groups: list[ShrinkageGroupStats]
+    outliers: list[ShrinkageOutlier]
+
+
+class BulkRoastError(BaseModel):
+    index: int
+    detail: str
+
+
+class BulkRoastResult(BaseModel):
+    created: list[RoastBatchCreated]
+    errors: list[BulkRoastError]
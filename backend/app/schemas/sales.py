@@ -0,0 +1,16 @@
+from datetime import date
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class DebtAgingEntry(BaseModel):
+    customer_id: Optional[int] = None
+    customer_name: Optional[str] = None
+    sales_count: int
+    oldest_sale_date: date
+    days_0_30: float
+    days_31_60: float
+    days_61_90: float
+    days_over_90: float
+    total_balance: float
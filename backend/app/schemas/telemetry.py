@@ -0,0 +1,35 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class RoastCurveSummary(BaseModel):
+    roast_batch_id: int
+    sample_count: int
+    charge_temp: float
+    turning_point_s: Optional[float] = None
+    turning_point_temp: Optional[float] = None
+    first_crack_s: Optional[float] = None
+    first_crack_temp: Optional[float] = None
+    drop_s: float
+    drop_temp: float
+    development_time_ratio: Optional[float] = None
+    updated_at: datetime
+
+
+class RoastCurveRead(RoastCurveSummary):
+    time_s: list[float]
+    bean_temp: list[float]
+    env_temp: Optional[list[Optional[float]]] = None
+
+
+class RoastCurvePoints(BaseModel):
+    roast_batch_id: int
+    points: int
+    time_s: list[Optional[float]]
+    bean_temp: list[Optional[float]]
+    env_temp: Optional[list[Optional[float]]] = None
+    first_crack_s: Optional[float] = None
+    drop_s: float
+    development_time_ratio: Optional[float] = None
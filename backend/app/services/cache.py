@@ -0,0 +1,145 @@
+"""In-process result cache invalidated by database writes.
+
+Every committed session that wrote something bumps a process-wide data
+version; caches drop their entries the next time they see a newer version.
+Other workers' writes are not observed, so entries also expire after a TTL.
+Named caches report their hit and miss counts through ``cache_stats``.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Hashable
+
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, Session
+
+_version_lock = threading.Lock()
+_data_version = 0
+_caches: dict[str, "ResultCache"] = {}
+
+
+def data_version() -> int:
+    return _data_version
+
+
+def bump_data_version() -> None:
+    global _data_version
+    with _version_lock:
+        _data_version += 1
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_flush(session: Session, _flush_context: Any) -> None:
+    session.info["has_writes"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_bulk_write(state: ORMExecuteState) -> None:
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info["has_writes"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_on_commit(session: Session) -> None:
+    if session.info.pop("has_writes", False):
+        bump_data_version()
+
+
+@event.listens_for(Session, "after_rollback")
+def _reset_on_rollback(session: Session) -> None:
+    session.info.pop("has_writes", None)
+
+
+@dataclass
+class CacheStats:
+    name: str
+    size: int
+    maxsize: int
+    ttl_seconds: float
+    hits: int
+    misses: int
+
+
+class ResultCache:
+    """Small LRU cache whose entries are dropped on the next data write.
+
+    With ``track_writes=False`` entries only leave through the TTL, the LRU
+    bound or an explicit ``pop``/``clear``.
+    """
+
+    def __init__(
+        self, maxsize: int = 128, ttl_seconds: float = 60.0, *, name: str | None = None, track_writes: bool = True
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+        self.track_writes = track_writes
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._version = data_version()
+        self._lock = threading.Lock()
+        if name is not None:
+            _caches[name] = self
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            self._sync_version()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, version: int | None = None) -> None:
+        """Store ``value``; skipped if data changed since ``version`` was read."""
+        with self._lock:
+            self._sync_version()
+            if version is not None and version != self._version:
+                return
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                name=self.name or "",
+                size=len(self._entries),
+                maxsize=self.maxsize,
+                ttl_seconds=self.ttl_seconds,
+                hits=self.hits,
+                misses=self.misses,
+            )
+
+    def _sync_version(self) -> None:
+        if not self.track_writes:
+            return
+        current = data_version()
+        if current != self._version:
+            self._entries.clear()
+            self._version = current
+
+
+def cache_stats() -> list[CacheStats]:
+    return [cache.stats() for cache in _caches.values()]
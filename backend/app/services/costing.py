@@ -0,0 +1,98 @@
+"""Cost of goods for roasts and sale items.
+
+A roast's ``cost_per_g`` is the price of its green input spread over the
+roasted output. Sale items store ``cost_of_goods`` at write time, so margin
+reports do not have to redo the lot price and shrinkage math. When a lot
+price or a roast yield changes, the affected rows are recomputed in bulk.
+
+Run ``python -m app.services.costing`` to recompute every stored cost.
+"""
+
+from __future__ import annotations
+
+from typing import Iterable
+
+from sqlalchemy import case, func, update
+from sqlmodel import Session, select
+
+from ..db import engine
+from ..models import CoffeeLot, RoastBatch, SaleItem
+
+
+def roast_cost_per_g(green_input_g: float, roasted_output_g: float, price_per_kg: float) -> float:
+    if roasted_output_g <= 0:
+        return 0.0
+    return (green_input_g / 1000.0) * price_per_kg / roasted_output_g
+
+
+def set_roast_cost(session: Session, roast: RoastBatch) -> None:
+    lot = session.get(CoffeeLot, roast.lot_id)
+    price_per_kg = lot.price_per_kg if lot else 0.0
+    roast.cost_per_g = roast_cost_per_g(roast.green_input_g, roast.roasted_output_g, price_per_kg)
+
+
+def assign_item_costs(session: Session, items: Iterable[SaleItem]) -> None:
+    """Store ``cost_of_goods`` on ``items`` from their roasts' cost per gram."""
+    items = list(items)
+    roast_ids = {item.roast_batch_id for item in items}
+    if not roast_ids:
+        return
+    statement = select(RoastBatch.id, RoastBatch.cost_per_g).where(RoastBatch.id.in_(roast_ids))
+    costs = {roast_id: cost_per_g for roast_id, cost_per_g in session.exec(statement)}
+    for item in items:
+        grams = float(item.bag_size_g) * float(item.bags)
+        item.cost_of_goods = grams * float(costs.get(item.roast_batch_id, 0.0))
+
+
+def _roast_cost_expression(price_per_kg):
+    green_cost = RoastBatch.green_input_g / 1000.0 * price_per_kg
+    return case((RoastBatch.roasted_output_g > 0, green_cost / RoastBatch.roasted_output_g), else_=0.0)
+
+
+def _update_item_costs(session: Session, roast_filter=None) -> None:
+    roast_cost = select(RoastBatch.cost_per_g).where(RoastBatch.id == SaleItem.roast_batch_id).scalar_subquery()
+    statement = update(SaleItem).values(cost_of_goods=SaleItem.bag_size_g * SaleItem.bags * roast_cost)
+    if roast_filter is not None:
+        statement = statement.where(SaleItem.roast_batch_id.in_(select(RoastBatch.id).where(roast_filter)))
+    session.execute(statement.execution_options(synchronize_session=False))
+
+
+def recompute_roast_costs(session: Session, roast: RoastBatch) -> None:
+    """Refresh a roast's cost per gram and the cost of every item sold from it."""
+    set_roast_cost(session, roast)
+    session.add(roast)
+    session.flush()
+    _update_item_costs(session, RoastBatch.id == roast.id)
+
+
+def recompute_lot_costs(session: Session, lot: CoffeeLot) -> None:
+    """Refresh the cost of every roast of ``lot`` and of the items sold from them."""
+    session.flush()
+    session.execute(
+        update(RoastBatch)
+        .where(RoastBatch.lot_id == lot.id)
+        .values(cost_per_g=_roast_cost_expression(lot.price_per_kg))
+        .execution_options(synchronize_session="fetch")
+    )
+    _update_item_costs(session, RoastBatch.lot_id == lot.id)
+
+
+def recompute_all_costs(session: Session) -> None:
+    lot_price = select(CoffeeLot.price_per_kg).where(CoffeeLot.id == RoastBatch.lot_id).scalar_subquery()
+    session.execute(
+        update(RoastBatch)
+        .values(cost_per_g=_roast_cost_expression(func.coalesce(lot_price, 0.0)))
+        .execution_options(synchronize_session=False)
+    )
+    _update_item_costs(session)
+
+
+def run() -> None:
+    with Session(engine) as session:
+        recompute_all_costs(session)
+        session.commit()
+    print("Roast and sale item costs recomputed")
+
+
+if __name__ == "__main__":
+    run()
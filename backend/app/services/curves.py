@@ -0,0 +1,116 @@
+"""Downsampled roast curves for charts.
+
+Stored curves hold one sample per second, which is far more than a chart
+overlaying many roasts can use. Curves are reduced with
+Largest-Triangle-Three-Buckets on the bean temperature, keeping the shape of
+the curve (turning point, crack, drop) with a few hundred points. Results are
+cached per roast and point count.
+"""
+
+from __future__ import annotations
+
+from typing import Iterable
+
+import numpy as np
+from sqlmodel import Session, select
+
+from ..models import RoastCurve
+from .cache import ResultCache, data_version
+
+PROFILE_POINTS = 64
+
+_curve_cache = ResultCache(maxsize=2048, ttl_seconds=600, name="roast_curves")
+
+
+def curve_profile(time_s: Iterable[float], bean_temp: Iterable[float], drop_s: float) -> bytes:
+    """Bean temperature resampled to ``PROFILE_POINTS`` values from charge to drop.
+
+    Fixed-length profiles let curves of different durations be compared
+    element by element.
+    """
+    times = np.asarray(time_s, dtype=np.float64)
+    temps = np.asarray(bean_temp, dtype=np.float64)
+    grid = np.linspace(0.0, max(drop_s, 0.0), PROFILE_POINTS)
+    return np.interp(grid, times, temps).astype("<f4").tobytes()
+
+
+def decode_profile(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype="<f4")
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """Indices of the ``points`` samples chosen by Largest-Triangle-Three-Buckets.
+
+    The first and last samples are always kept. Each bucket in between keeps
+    the sample forming the largest triangle with the previously kept sample
+    and the average of the next bucket.
+    """
+    size = len(x)
+    if points >= size or points < 3:
+        return np.arange(size)
+
+    edges = np.linspace(1, size - 1, points - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    # Average of the following bucket; the last bucket looks at the final sample.
+    next_starts = np.append(starts[1:], size - 1)
+    next_ends = np.append(ends[1:], size)
+    x_sums = np.concatenate(([0.0], np.cumsum(x, dtype=np.float64)))
+    y_sums = np.concatenate(([0.0], np.cumsum(y, dtype=np.float64)))
+    counts = next_ends - next_starts
+    avg_x = (x_sums[next_ends] - x_sums[next_starts]) / counts
+    avg_y = (y_sums[next_ends] - y_sums[next_starts]) / counts
+
+    selected = np.empty(points, dtype=np.int64)
+    selected[0], selected[-1] = 0, size - 1
+    previous = 0
+    for bucket, (start, end) in enumerate(zip(starts, ends)):
+        bucket_x = x[start:end]
+        bucket_y = y[start:end]
+        areas = np.abs(
+            (x[previous] - avg_x[bucket]) * (bucket_y - y[previous])
+            - (x[previous] - bucket_x) * (avg_y[bucket] - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def _series(values: np.ndarray) -> list[float | None]:
+    rounded = np.round(values.astype(np.float64), 1)
+    return [None if np.isnan(value) else value for value in rounded.tolist()]
+
+
+def downsample_curve(curve: RoastCurve, points: int) -> dict:
+    time_s = decode_profile(curve.time_s)
+    bean_temp = decode_profile(curve.bean_temp)
+    indices = lttb_indices(time_s, bean_temp, points)
+    env_temp = _series(decode_profile(curve.env_temp)[indices]) if curve.env_temp is not None else None
+    return {
+        "roast_batch_id": curve.roast_batch_id,
+        "points": len(indices),
+        "time_s": _series(time_s[indices]),
+        "bean_temp": _series(bean_temp[indices]),
+        "env_temp": env_temp,
+        "first_crack_s": curve.first_crack_s,
+        "drop_s": curve.drop_s,
+        "development_time_ratio": curve.development_time_ratio,
+    }
+
+
+def downsampled_curves(session: Session, roast_ids: Iterable[int], points: int) -> dict[int, dict]:
+    """Downsampled curves by roast id; roasts without telemetry are left out."""
+    roast_ids = list(dict.fromkeys(roast_ids))
+    curves = {}
+    missing = []
+    for roast_id in roast_ids:
+        cached = _curve_cache.get((roast_id, points))
+        if cached is None:
+            missing.append(roast_id)
+        else:
+            curves[roast_id] = cached
+    if missing:
+        version = data_version()
+        for curve in session.exec(select(RoastCurve).where(RoastCurve.roast_batch_id.in_(missing))):
+            curves[curve.roast_batch_id] = downsample_curve(curve, points)
+            _curve_cache.set((curve.roast_batch_id, points), curves[curve.roast_batch_id], version=version)
+    return {roast_id: curves[roast_id] for roast_id in roast_ids if roast_id in curves}
@@ -0,0 +1,133 @@
+"""Streaming CSV/NDJSON exports of the main tables.
+
+Rows are read through a server-side cursor (``yield_per``) and encoded in
+batches, so memory stays flat however large the table is and the first bytes
+go out as soon as the first batch is fetched. Output can be gzip-compressed on
+the fly.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import zlib
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Iterable, Iterator, Literal
+
+from sqlalchemy import Select
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, SQLModel, select
+
+from ..db import engine
+from ..models import CoffeeLot, RoastBatch, RoastStock, Sale, SaleItem
+
+ExportEntity = Literal["sales", "items", "lots", "roasts", "inventory"]
+ExportFormat = Literal["csv", "ndjson"]
+
+BATCH_SIZE = 2000
+
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+
+@dataclass(frozen=True)
+class _Export:
+    statement: Select
+    date_column: Any
+
+
+def _table_columns(model: type[SQLModel]) -> list:
+    return list(model.__table__.columns)
+
+
+_EXPORTS: dict[str, _Export] = {
+    "sales": _Export(select(*_table_columns(Sale)).order_by(Sale.id), Sale.sale_date),
+    "items": _Export(
+        select(*_table_columns(SaleItem), Sale.sale_date, Sale.customer_id)
+        .join(Sale, Sale.id == SaleItem.sale_id)
+        .order_by(SaleItem.id),
+        Sale.sale_date,
+    ),
+    "lots": _Export(select(*_table_columns(CoffeeLot)).order_by(CoffeeLot.id), CoffeeLot.purchase_date),
+    "roasts": _Export(select(*_table_columns(RoastBatch)).order_by(RoastBatch.id), RoastBatch.roast_date),
+    "inventory": _Export(
+        select(
+            RoastStock.roast_batch_id,
+            RoastBatch.lot_id,
+            RoastBatch.roast_date,
+            RoastBatch.roast_level,
+            RoastBatch.cost_per_g,
+            RoastStock.roasted_output_g,
+            RoastStock.sold_g,
+            RoastStock.adjusted_g,
+            RoastStock.available_g,
+        )
+        .join(RoastBatch, RoastBatch.id == RoastStock.roast_batch_id)
+        .order_by(RoastStock.roast_batch_id),
+        RoastBatch.roast_date,
+    ),
+}
+
+
+def export_statement(entity: ExportEntity, date_from: date | None = None, date_to: date | None = None) -> Select:
+    export = _EXPORTS[entity]
+    statement = export.statement
+    if date_from is not None:
+        statement = statement.where(export.date_column >= date_from)
+    if date_to is not None:
+        statement = statement.where(export.date_column <= date_to)
+    return statement
+
+
+def _csv_batches(columns: list[str], batches: Iterable[list[tuple]]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+
+def _ndjson_batches(columns: list[str], batches: Iterable[list[tuple]]) -> Iterator[str]:
+    for rows in batches:
+        yield "".join(json.dumps(dict(zip(columns, row)), default=str) + "\n" for row in rows)
+
+
+def _gzip(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Compress ``chunks`` into one gzip stream, flushing after each so the client sees every batch."""
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def stream_export(
+    entity: ExportEntity,
+    fmt: ExportFormat = "csv",
+    *,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    gzip: bool = False,
+    bind: Engine = engine,
+) -> Iterator[bytes]:
+    """Yield the encoded export of ``entity`` read through ``bind``.
+
+    The generator owns its session, so it can outlive the request's
+    dependencies while a ``StreamingResponse`` drains it.
+    """
+    statement = export_statement(entity, date_from, date_to).execution_options(yield_per=BATCH_SIZE)
+    with Session(bind) as session:
+        result = session.execute(statement)
+        columns = list(result.keys())
+        batches = (list(partition) for partition in result.partitions())
+        encode = _csv_batches if fmt == "csv" else _ndjson_batches
+        chunks = (text.encode("utf-8") for text in encode(columns, batches) if text)
+        yield from _gzip(chunks) if gzip else chunks
+
+
+def export_filename(entity: ExportEntity, fmt: ExportFormat, gzip: bool = False) -> str:
+    return f"{entity}.{fmt}" + (".gz" if gzip else "")
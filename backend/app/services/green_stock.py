@@ -0,0 +1,164 @@
+"""Materialized green-coffee balance per lot.
+
+``LotStock`` holds each lot's purchased weight, the green grams its roasts
+have consumed and what is left. The roasts routes lock and update the rows
+of the lots they consume from inside the same transaction, so availability
+checks and lot listings are primary-key reads instead of aggregates over
+every roast.
+
+Run ``python -m app.services.green_stock`` to recompute every row from
+scratch and report any drift against the stored balances.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Iterable, Mapping
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from ..db import engine
+from ..models import CoffeeLot, LotStock, RoastBatch
+
+DRIFT_TOLERANCE_G = 1e-6
+
+
+def green_by_lot(roasts: Iterable[RoastBatch]) -> dict[int, float]:
+    totals: dict[int, float] = defaultdict(float)
+    for roast in roasts:
+        totals[roast.lot_id] += float(roast.green_input_g)
+    return dict(totals)
+
+
+def _computed_lot_stock_statement(lot_ids: Iterable[int] | None = None):
+    roasted_query = select(func.coalesce(func.sum(RoastBatch.green_input_g), 0.0)).where(
+        RoastBatch.lot_id == CoffeeLot.id
+    )
+    statement = select(
+        CoffeeLot.id,
+        CoffeeLot.green_weight_g,
+        roasted_query.scalar_subquery().label("roasted_g"),
+    ).order_by(CoffeeLot.id)
+    if lot_ids is not None:
+        statement = statement.where(CoffeeLot.id.in_(list(lot_ids)))
+    return statement
+
+
+def _set_balance(stock: LotStock, green_weight_g: float, roasted_g: float) -> None:
+    stock.green_weight_g = float(green_weight_g)
+    stock.roasted_g = float(roasted_g)
+    stock.remaining_g = stock.green_weight_g - stock.roasted_g
+
+
+def lock_lot_stock(session: Session, lot_ids: Iterable[int]) -> dict[int, LotStock]:
+    """Load and lock the stock rows for ``lot_ids`` in primary-key order."""
+    ids = sorted(set(lot_ids))
+    if not ids:
+        return {}
+    statement = (
+        select(LotStock)
+        .where(LotStock.lot_id.in_(ids))
+        .order_by(LotStock.lot_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    return {stock.lot_id: stock for stock in session.exec(statement)}
+
+
+def create_lot_stock(session: Session, lot: CoffeeLot) -> LotStock:
+    stock = LotStock(lot_id=lot.id)
+    _set_balance(stock, lot.green_weight_g, 0.0)
+    session.add(stock)
+    return stock
+
+
+def apply_roasted(session: Session, roasted_by_lot: Mapping[int, float], stocks: Mapping[int, LotStock]) -> None:
+    """Add ``roasted_by_lot`` green grams (negative to release) to locked ``stocks``."""
+    for lot_id, grams in roasted_by_lot.items():
+        stock = stocks.get(lot_id)
+        if stock is None or abs(grams) <= DRIFT_TOLERANCE_G:
+            continue
+        _set_balance(stock, stock.green_weight_g, stock.roasted_g + grams)
+        session.add(stock)
+
+
+def sync_lot_weight(session: Session, lot: CoffeeLot) -> LotStock:
+    stock = lock_lot_stock(session, [lot.id]).get(lot.id)
+    if stock is None:
+        for lot_id, green_weight_g, roasted_g in session.exec(_computed_lot_stock_statement([lot.id])):
+            stock = LotStock(lot_id=lot_id)
+            _set_balance(stock, green_weight_g, roasted_g)
+    _set_balance(stock, lot.green_weight_g, stock.roasted_g)
+    session.add(stock)
+    return stock
+
+
+def delete_lot_stock(session: Session, lot_id: int) -> None:
+    stock = session.get(LotStock, lot_id)
+    if stock is not None:
+        session.delete(stock)
+        session.flush()
+
+
+def ensure_lot_stock(session: Session) -> int:
+    """Create stock rows for lots that do not have one yet."""
+    has_stock = select(LotStock.lot_id).where(LotStock.lot_id == CoffeeLot.id).exists()
+    missing_ids = session.exec(select(CoffeeLot.id).where(~has_stock)).all()
+    if not missing_ids:
+        return 0
+    for lot_id, green_weight_g, roasted_g in session.exec(_computed_lot_stock_statement(missing_ids)):
+        stock = LotStock(lot_id=lot_id)
+        _set_balance(stock, green_weight_g, roasted_g)
+        session.add(stock)
+    return len(missing_ids)
+
+
+def rebuild_lot_stock(session: Session) -> list[tuple[int, float, float]]:
+    """Recompute every lot balance from scratch.
+
+    Returns ``(lot_id, stored_remaining_g, computed_remaining_g)`` for every
+    lot whose stored balance had drifted from the recomputed one.
+    """
+    stored = {stock.lot_id: stock for stock in session.exec(select(LotStock).with_for_update())}
+    drift: list[tuple[int, float, float]] = []
+    seen: set[int] = set()
+
+    for lot_id, green_weight_g, roasted_g in session.exec(_computed_lot_stock_statement()):
+        seen.add(lot_id)
+        stock = stored.get(lot_id)
+        if stock is None:
+            stock = LotStock(lot_id=lot_id)
+            previous = None
+        else:
+            previous = stock.remaining_g
+        _set_balance(stock, green_weight_g, roasted_g)
+        if previous is None or abs(previous - stock.remaining_g) > DRIFT_TOLERANCE_G:
+            drift.append((lot_id, previous if previous is not None else 0.0, stock.remaining_g))
+        session.add(stock)
+
+    for lot_id, stock in stored.items():
+        if lot_id not in seen:
+            session.delete(stock)
+
+    return drift
+
+
+def ensure_lot_stock_rows() -> None:
+    with Session(engine) as session:
+        ensure_lot_stock(session)
+        session.commit()
+
+
+def run() -> None:
+    with Session(engine) as session:
+        drift = rebuild_lot_stock(session)
+        session.commit()
+
+    for lot_id, stored_g, computed_g in drift:
+        print(f"Lot {lot_id}: stored {stored_g:.2f} g, recomputed {computed_g:.2f} g")
+    print(f"Green stock rebuilt, {len(drift)} lot(s) with drift")
+
+
+if __name__ == "__main__":
+    run()
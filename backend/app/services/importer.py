@@ -0,0 +1,389 @@
+"""Bulk import of spreadsheet exports.
+
+A file is read as a stream of records, either CSV with a header row or one
+JSON object per line. Each record is validated with the same ``*Create``
+model the API uses, and valid records are written ``chunk_size`` at a time.
+Every chunk commits in its own transaction and keeps the stock ledgers,
+rollups, costs and shrinkage statistics in step, so memory stays flat
+whatever the file size. Farm, variety and customer names are resolved to ids
+through maps loaded once per import. Rejected records are written with their
+error to a reject file and do not stop the import.
+
+Sales in CSV have one row per item. Consecutive rows that share a
+``sale_ref`` become one sale; the sale columns are read from the first of
+them. Item columns are ``roast_batch_id``, ``bag_size_g``, ``bags``,
+``bag_price`` and ``item_notes``. In NDJSON a sale carries its ``items``
+list.
+
+Run ``python -m app.services.importer ENTITY FILE``, or use
+``POST /api/v1/import/{entity}``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Any, Callable, Iterator, Literal, get_args
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlmodel import Session, SQLModel, select
+
+from ..db import engine
+from ..models import (
+    CoffeeLot,
+    CoffeeLotCreate,
+    Customer,
+    CustomerCreate,
+    Expense,
+    ExpenseCreate,
+    Farm,
+    RoastBatchCreate,
+    Sale,
+    SaleCreate,
+    Variety,
+)
+from .costing import assign_item_costs
+from .green_stock import create_lot_stock
+from .roasting import insert_roasts, validate_roasts
+from .rollups import apply_expenses, apply_lots, apply_sales
+from .sales import SaleValidationError, build_sale
+from .stock import apply_sold, grams_by_roast, lock_stock
+
+Entity = Literal["customers", "expenses", "lots", "roasts", "sales"]
+ImportFormat = Literal["csv", "ndjson"]
+
+ENTITIES: tuple[str, ...] = get_args(Entity)
+DEFAULT_CHUNK_SIZE = 1000
+
+# CSV column -> SaleItemCreate field for the item part of a sales row.
+SALE_ITEM_COLUMNS = {
+    "roast_batch_id": "roast_batch_id",
+    "bag_size_g": "bag_size_g",
+    "bags": "bags",
+    "bag_price": "bag_price",
+    "item_notes": "notes",
+}
+LOOKUP_MODELS: dict[str, tuple[type[SQLModel], str]] = {
+    "farm": (Farm, "Finca no encontrada"),
+    "variety": (Variety, "Variedad no encontrada"),
+    "customer": (Customer, "Cliente no encontrado"),
+}
+
+
+class ImportRowError(ValueError):
+    """Raised for a record that cannot be imported; the message is user facing."""
+
+
+@dataclass
+class ImportRecord:
+    line: int
+    data: dict[str, Any]
+    error: str | None = None
+
+
+@dataclass
+class ImportSummary:
+    entity: str
+    imported: int = 0
+    rejected: int = 0
+    rejects: list[dict[str, Any]] = field(default_factory=list)
+
+
+def _clean(row: dict[str | None, Any]) -> dict[str, Any]:
+    """Drop blank CSV cells so optional fields fall back to their defaults."""
+    cleaned = {}
+    for key, value in row.items():
+        if key is None:
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+        if value in ("", None):
+            continue
+        cleaned[key.strip()] = value
+    return cleaned
+
+
+def _csv_records(stream: IO[bytes]) -> Iterator[ImportRecord]:
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    for row in reader:
+        data = _clean(row)
+        if data:
+            yield ImportRecord(line=reader.line_num, data=data)
+
+
+def _ndjson_records(stream: IO[bytes]) -> Iterator[ImportRecord]:
+    for line, raw in enumerate(io.TextIOWrapper(stream, encoding="utf-8-sig"), start=1):
+        if not raw.strip():
+            continue
+        try:
+            data = json.loads(raw)
+        except json.JSONDecodeError as exc:
+            yield ImportRecord(line=line, data={"raw": raw.rstrip("\n")}, error=f"JSON inválido: {exc.msg}")
+            continue
+        if not isinstance(data, dict):
+            yield ImportRecord(line=line, data={"raw": raw.rstrip("\n")}, error="Se esperaba un objeto JSON")
+            continue
+        yield ImportRecord(line=line, data=data)
+
+
+def _group_sale_rows(records: Iterator[ImportRecord]) -> Iterator[ImportRecord]:
+    """Fold consecutive CSV item rows with the same ``sale_ref`` into one sale."""
+    current: ImportRecord | None = None
+    current_ref: str | None = None
+    for record in records:
+        if record.error is not None:
+            yield record
+            continue
+        data = dict(record.data)
+        item = {name: data.pop(column) for column, name in SALE_ITEM_COLUMNS.items() if column in data}
+        ref = data.pop("sale_ref", None)
+        if current is not None and ref is not None and ref == current_ref:
+            current.data["items"].append(item)
+            continue
+        if current is not None:
+            yield current
+        current = ImportRecord(line=record.line, data={**data, "items": [item]})
+        current_ref = ref
+    if current is not None:
+        yield current
+
+
+def read_records(stream: IO[bytes], fmt: ImportFormat, entity: Entity) -> Iterator[ImportRecord]:
+    records = _csv_records(stream) if fmt == "csv" else _ndjson_records(stream)
+    if fmt == "csv" and entity == "sales":
+        records = _group_sale_rows(records)
+    return records
+
+
+class NameLookup:
+    """Case-insensitive ``name -> id`` map for one table, loaded once per import.
+
+    When names repeat, the oldest row wins.
+    """
+
+    def __init__(self, session: Session, model: type[SQLModel], not_found: str) -> None:
+        self.not_found = not_found
+        self.ids: set[int] = set()
+        self.names: dict[str, int] = {}
+        for row_id, name in session.exec(select(model.id, model.name).order_by(model.id)):
+            self.ids.add(row_id)
+            self.names.setdefault(name.strip().casefold(), row_id)
+
+    def resolve(self, data: dict[str, Any], name_field: str, required: bool = True) -> None:
+        """Replace ``data[name_field]`` by ``data[name_field + "_id"]``, checking either one exists."""
+        id_field = f"{name_field}_id"
+        name = data.pop(name_field, None)
+        if id_field in data:
+            try:
+                row_id = int(data[id_field])
+            except (TypeError, ValueError):
+                raise ImportRowError(f"{id_field}: debe ser un número entero") from None
+            if row_id not in self.ids:
+                raise ImportRowError(f"{self.not_found}: {row_id}")
+            data[id_field] = row_id
+        elif name is not None:
+            row_id = self.names.get(str(name).strip().casefold())
+            if row_id is None:
+                raise ImportRowError(f"{self.not_found}: {name}")
+            data[id_field] = row_id
+        elif required:
+            raise ImportRowError(f"{name_field}: debe indicar el nombre o {id_field}")
+
+
+@dataclass
+class _Lookups:
+    session: Session
+    _loaded: dict[str, NameLookup] = field(default_factory=dict)
+
+    def get(self, key: str) -> NameLookup:
+        if key not in self._loaded:
+            model, not_found = LOOKUP_MODELS[key]
+            self._loaded[key] = NameLookup(self.session, model, not_found)
+        return self._loaded[key]
+
+
+def _prepare_lot(data: dict[str, Any], lookups: _Lookups) -> CoffeeLotCreate:
+    lookups.get("farm").resolve(data, "farm")
+    lookups.get("variety").resolve(data, "variety")
+    return CoffeeLotCreate.model_validate(data)
+
+
+def _prepare_sale(data: dict[str, Any], lookups: _Lookups) -> Sale:
+    lookups.get("customer").resolve(data, "customer", required=False)
+    try:
+        return build_sale(SaleCreate.model_validate(data))
+    except SaleValidationError as exc:
+        raise ImportRowError(str(exc)) from exc
+
+
+# Each loader writes a validated chunk and returns ``(position, error)`` for
+# the records it had to reject, e.g. for lack of stock.
+def _load_customers(session: Session, rows: list[CustomerCreate]) -> list[tuple[int, str]]:
+    session.execute(insert(Customer), [row.model_dump() for row in rows])
+    return []
+
+
+def _load_expenses(session: Session, rows: list[ExpenseCreate]) -> list[tuple[int, str]]:
+    session.execute(insert(Expense), [row.model_dump() for row in rows])
+    apply_expenses(session, rows)
+    return []
+
+
+def _load_lots(session: Session, rows: list[CoffeeLotCreate]) -> list[tuple[int, str]]:
+    values = [row.model_dump() for row in rows]
+    lots = session.scalars(insert(CoffeeLot).returning(CoffeeLot, sort_by_parameter_order=True), values).all()
+    for lot in lots:
+        create_lot_stock(session, lot)
+    apply_lots(session, lots)
+    return []
+
+
+def _load_roasts(session: Session, rows: list[RoastBatchCreate]) -> list[tuple[int, str]]:
+    valid, errors, prices = validate_roasts(session, rows)
+    insert_roasts(session, [rows[index] for index in valid], prices)
+    return errors
+
+
+def _load_sales(session: Session, sales: list[Sale]) -> list[tuple[int, str]]:
+    stocks = lock_stock(session, {item.roast_batch_id for sale in sales for item in sale.items})
+    available = {roast_id: max(stock.available_g, 0.0) for roast_id, stock in stocks.items()}
+    accepted = []
+    errors: list[tuple[int, str]] = []
+    for index, sale in enumerate(sales):
+        requested = grams_by_roast(sale.items)
+        short = [roast_id for roast_id, grams in requested.items() if grams > available.get(roast_id, 0.0)]
+        if any(roast_id not in available for roast_id in requested):
+            errors.append((index, "Roast not found"))
+        elif short:
+            errors.append(
+                (
+                    index,
+                    "No hay suficiente inventario tostado para la tostión solicitada. Disponible: "
+                    f"{available[short[0]]:.0f} g",
+                )
+            )
+        else:
+            for roast_id, grams in requested.items():
+                available[roast_id] -= grams
+            accepted.append(sale)
+
+    items = [item for sale in accepted for item in sale.items]
+    assign_item_costs(session, items)
+    apply_sold(session, grams_by_roast(items))
+    apply_sales(session, accepted)
+    session.add_all(accepted)
+    return errors
+
+
+@dataclass(frozen=True)
+class _EntitySpec:
+    prepare: Callable[[dict[str, Any], _Lookups], Any]
+    load: Callable[[Session, list[Any]], list[tuple[int, str]]]
+
+
+_SPECS: dict[str, _EntitySpec] = {
+    "customers": _EntitySpec(lambda data, _: CustomerCreate.model_validate(data), _load_customers),
+    "expenses": _EntitySpec(lambda data, _: ExpenseCreate.model_validate(data), _load_expenses),
+    "lots": _EntitySpec(_prepare_lot, _load_lots),
+    "roasts": _EntitySpec(lambda data, _: RoastBatchCreate.model_validate(data), _load_roasts),
+    "sales": _EntitySpec(_prepare_sale, _load_sales),
+}
+
+
+def _validation_message(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" if error["loc"] else error["msg"]
+        for error in exc.errors()
+    )
+
+
+def import_stream(
+    stream: IO[bytes],
+    entity: Entity,
+    fmt: ImportFormat = "csv",
+    *,
+    rejects: IO[str] | None = None,
+    max_rejects_kept: int = 0,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> ImportSummary:
+    """Import every record of ``stream`` and return the counts.
+
+    Rejected records are written as NDJSON ``{"line", "error", "row"}``
+    objects to ``rejects`` and the first ``max_rejects_kept`` of them are also
+    kept on the summary.
+    """
+    spec = _SPECS[entity]
+    summary = ImportSummary(entity=entity)
+
+    def reject(record: ImportRecord, error: str) -> None:
+        summary.rejected += 1
+        entry = {"line": record.line, "error": error, "row": record.data}
+        if rejects is not None:
+            rejects.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        if len(summary.rejects) < max_rejects_kept:
+            summary.rejects.append(entry)
+
+    with Session(engine) as session:
+        lookups = _Lookups(session)
+        chunk: list[tuple[ImportRecord, Any]] = []
+
+        def flush() -> None:
+            errors = dict(spec.load(session, [payload for _, payload in chunk]))
+            session.commit()
+            summary.imported += len(chunk) - len(errors)
+            for position, error in sorted(errors.items()):
+                reject(chunk[position][0], error)
+            chunk.clear()
+
+        for record in read_records(stream, fmt, entity):
+            if record.error is not None:
+                reject(record, record.error)
+                continue
+            try:
+                payload = spec.prepare(dict(record.data), lookups)
+            except ValidationError as exc:
+                reject(record, _validation_message(exc))
+                continue
+            except ImportRowError as exc:
+                reject(record, str(exc))
+                continue
+            chunk.append((record, payload))
+            if len(chunk) >= chunk_size:
+                flush()
+        if chunk:
+            flush()
+    return summary
+
+
+def detect_format(path: str | Path) -> ImportFormat:
+    return "ndjson" if Path(path).suffix.lower() in {".ndjson", ".jsonl", ".json"} else "csv"
+
+
+def run() -> None:
+    parser = argparse.ArgumentParser(description="Importa registros masivos desde CSV o NDJSON.")
+    parser.add_argument("entity", choices=ENTITIES)
+    parser.add_argument("file", type=Path)
+    parser.add_argument("--format", choices=get_args(ImportFormat), help="por defecto según la extensión")
+    parser.add_argument("--rejects", type=Path, help="por defecto FILE.rejects.ndjson")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    rejects_path = args.rejects or args.file.with_name(f"{args.file.name}.rejects.ndjson")
+    with args.file.open("rb") as stream, rejects_path.open("w", encoding="utf-8") as rejects:
+        summary = import_stream(
+            stream,
+            args.entity,
+            args.format or detect_format(args.file),
+            rejects=rejects,
+            chunk_size=max(args.chunk_size, 1),
+        )
+    print(f"{summary.entity}: {summary.imported} importados, {summary.rejected} rechazados ({rejects_path})")
+
+
+if __name__ == "__main__":
+    run()
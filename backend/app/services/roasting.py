@@ -0,0 +1,84 @@
+"""Batch creation of roasts shared by ``POST /roasts/bulk`` and the importer."""
+
+from __future__ import annotations
+
+import numpy as np
+from sqlalchemy import insert
+from sqlmodel import Session, select
+
+from ..models import CoffeeLot, RoastBatch, RoastBatchCreate
+from .green_stock import DRIFT_TOLERANCE_G, apply_roasted, green_by_lot, lock_lot_stock
+from .rollups import apply_roasts
+from .shrinkage import apply_roasts_shrinkage, shrinkage_zscores
+from .stock import create_stock
+
+
+def validate_roasts(
+    session: Session, rows: list[RoastBatchCreate]
+) -> tuple[list[int], list[tuple[int, str]], dict[int, float]]:
+    """Check ``rows`` in order against the locked lot balances.
+
+    Returns the indexes of the valid rows, ``(index, error)`` pairs for the
+    others and the lot prices of the valid rows. The lot stock rows stay
+    locked until the transaction ends.
+    """
+    lot_ids = {row.lot_id for row in rows}
+    stocks = lock_lot_stock(session, lot_ids)
+    prices = {
+        lot_id: price_per_kg
+        for lot_id, price_per_kg in session.exec(
+            select(CoffeeLot.id, CoffeeLot.price_per_kg).where(CoffeeLot.id.in_(lot_ids))
+        )
+    }
+    remaining = {lot_id: max(stock.remaining_g, 0.0) for lot_id, stock in stocks.items()}
+    valid: list[int] = []
+    errors: list[tuple[int, str]] = []
+    for index, row in enumerate(rows):
+        if row.green_input_g <= 0:
+            errors.append((index, "Green input must be greater than zero"))
+        elif row.lot_id not in stocks or row.lot_id not in prices:
+            errors.append((index, "Lot not found"))
+        elif row.green_input_g > remaining[row.lot_id] + DRIFT_TOLERANCE_G:
+            errors.append(
+                (
+                    index,
+                    "No hay suficiente café verde en el lote seleccionado. Disponible: "
+                    f"{remaining[row.lot_id]:.0f} g",
+                )
+            )
+        else:
+            remaining[row.lot_id] -= row.green_input_g
+            valid.append(index)
+    return valid, errors, prices
+
+
+def insert_roasts(
+    session: Session, rows: list[RoastBatchCreate], prices: dict[int, float]
+) -> tuple[list[RoastBatch], list[float | None]]:
+    """Insert already validated ``rows`` and update every derived table.
+
+    Shrinkage and cost per gram are computed for the whole batch at once and
+    the rows go in with a single ``INSERT ... RETURNING``. Returns the new
+    roasts and their shrinkage z-scores against the statistics before the
+    batch.
+    """
+    if not rows:
+        return [], []
+    green = np.array([row.green_input_g for row in rows], dtype=np.float64)
+    output = np.array([row.roasted_output_g for row in rows], dtype=np.float64)
+    price = np.array([prices[row.lot_id] for row in rows], dtype=np.float64)
+    shrinkage = (green - output) / green * 100
+    cost_per_g = np.divide(green / 1000.0 * price, output, out=np.zeros_like(output), where=output > 0)
+    values = [
+        {**row.model_dump(), "shrinkage_pct": float(row_shrinkage), "cost_per_g": float(row_cost)}
+        for row, row_shrinkage, row_cost in zip(rows, shrinkage, cost_per_g)
+    ]
+
+    zscores = shrinkage_zscores(session, [RoastBatch(**value) for value in values])
+    roasts = session.scalars(insert(RoastBatch).returning(RoastBatch, sort_by_parameter_order=True), values).all()
+    apply_roasted(session, green_by_lot(roasts), lock_lot_stock(session, {roast.lot_id for roast in roasts}))
+    for roast in roasts:
+        create_stock(session, roast)
+    apply_roasts(session, roasts)
+    apply_roasts_shrinkage(session, roasts)
+    return list(roasts), zscores
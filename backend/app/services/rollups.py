@@ -0,0 +1,371 @@
+"""Daily analytics rollups kept in step with every write.
+
+``DailyCoffeeRollup`` holds one row per day, variety and process with green
+purchases, roast output and sales; ``DailyExpenseRollup`` holds one row per
+day and expense category. The lots, roasts, sales and expenses routes remove
+a record's old contribution before editing it and add the new one afterwards,
+so time-series queries never rescan the raw tables.
+
+Run ``python -m app.services.rollups`` to rebuild both tables from scratch.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date
+from typing import Iterable
+
+from sqlalchemy import delete, func, insert
+from sqlmodel import Session, SQLModel, select
+
+from ..db import engine
+from ..models import (
+    CoffeeLot,
+    DailyCoffeeRollup,
+    DailyExpenseRollup,
+    Expense,
+    RoastBatch,
+    Sale,
+    SaleItem,
+)
+
+CoffeeKey = tuple[date, int, str]
+
+COFFEE_METRICS = (
+    "green_purchased_g",
+    "roast_count",
+    "roasted_green_g",
+    "roasted_output_g",
+    "shrinkage_pct_sum",
+    "sold_g",
+    "revenue",
+)
+
+
+class RollupDelta:
+    """Accumulates metric deltas per rollup key before writing them."""
+
+    def __init__(self) -> None:
+        self.coffee: dict[CoffeeKey, dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self.expenses: dict[tuple[date, str], dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    def add_coffee(self, day: date, variety_id: int, process: str, **metrics: float) -> None:
+        bucket = self.coffee[(day, variety_id, process)]
+        for name, value in metrics.items():
+            bucket[name] += value
+
+    def add_expense(self, day: date, category: str, **metrics: float) -> None:
+        bucket = self.expenses[(day, category)]
+        for name, value in metrics.items():
+            bucket[name] += value
+
+    def write(self, session: Session) -> None:
+        _upsert(
+            session,
+            DailyCoffeeRollup,
+            [
+                ({"day": day, "variety_id": variety_id, "process": process}, metrics)
+                for (day, variety_id, process), metrics in self.coffee.items()
+            ],
+        )
+        _upsert(
+            session,
+            DailyExpenseRollup,
+            [({"day": day, "category": category}, metrics) for (day, category), metrics in self.expenses.items()],
+        )
+
+
+def _upsert(session: Session, model: type[SQLModel], rows: list[tuple[dict, dict[str, float]]]) -> None:
+    """Add each row's metrics to the rollup row at its key, creating it if needed.
+
+    Rows that change the same metrics are sent as one executemany, in key
+    order so concurrent writers lock rollup rows in the same order.
+    """
+    groups: dict[tuple[tuple[str, ...], tuple[str, ...]], list[dict]] = defaultdict(list)
+    for key, metrics in rows:
+        metrics = {name: value for name, value in metrics.items() if value}
+        if metrics:
+            groups[(tuple(key), tuple(sorted(metrics)))].append({**key, **metrics})
+    if not groups:
+        return
+
+    dialect = session.get_bind().dialect.name
+    for (key_names, metric_names), params in groups.items():
+        params.sort(key=lambda values: tuple(values[name] for name in key_names))
+        if dialect in {"postgresql", "sqlite"}:
+            if dialect == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+            table = model.__table__
+            statement = dialect_insert(table)
+            statement = statement.on_conflict_do_update(
+                index_elements=list(key_names),
+                set_={name: table.c[name] + statement.excluded[name] for name in metric_names},
+            )
+            session.execute(statement, params)
+            continue
+
+        for values in params:
+            row = session.get(model, tuple(values[name] for name in key_names), with_for_update=True)
+            if row is None:
+                row = model(**{name: values[name] for name in key_names})
+                for name in metric_names:
+                    setattr(row, name, 0)
+            for name in metric_names:
+                setattr(row, name, getattr(row, name) + values[name])
+            session.add(row)
+
+
+def _lot_attributes(session: Session, roast_ids: Iterable[int]) -> dict[int, tuple[int, str]]:
+    ids = set(roast_ids)
+    if not ids:
+        return {}
+    statement = (
+        select(RoastBatch.id, CoffeeLot.variety_id, CoffeeLot.process)
+        .join(CoffeeLot, CoffeeLot.id == RoastBatch.lot_id)
+        .where(RoastBatch.id.in_(ids))
+    )
+    return {roast_id: (variety_id, process) for roast_id, variety_id, process in session.exec(statement)}
+
+
+def _item_revenue(item: SaleItem) -> float:
+    return round(float(item.bag_price)) * float(item.bags)
+
+
+def _roast_sales_delta(delta: RollupDelta, session: Session, roast_ids: list[int], sign: float) -> None:
+    """Move the sales of ``roast_ids`` in or out of the rollups as one block."""
+    if not roast_ids:
+        return
+    statement = (
+        select(
+            Sale.sale_date,
+            SaleItem.roast_batch_id,
+            func.sum(func.round(SaleItem.bag_price) * SaleItem.bags),
+            func.sum(SaleItem.bag_size_g * SaleItem.bags),
+        )
+        .join(Sale, Sale.id == SaleItem.sale_id)
+        .where(SaleItem.roast_batch_id.in_(roast_ids))
+        .group_by(Sale.sale_date, SaleItem.roast_batch_id)
+    )
+    attributes = _lot_attributes(session, roast_ids)
+    for sale_date, roast_id, revenue, sold_g in session.exec(statement):
+        variety_id, process = attributes[roast_id]
+        delta.add_coffee(sale_date, variety_id, process, revenue=sign * float(revenue), sold_g=sign * float(sold_g))
+
+
+def apply_sale(session: Session, sale: Sale, sign: float = 1.0) -> None:
+    apply_sales(session, [sale], sign)
+
+
+def apply_sales(session: Session, sales: Iterable[Sale], sign: float = 1.0) -> None:
+    """Add (or remove) several sales with one write per rollup row."""
+    sales = list(sales)
+    delta = RollupDelta()
+    attributes = _lot_attributes(session, (item.roast_batch_id for sale in sales for item in sale.items))
+    for sale in sales:
+        for item in sale.items:
+            variety_id, process = attributes[item.roast_batch_id]
+            delta.add_coffee(
+                sale.sale_date,
+                variety_id,
+                process,
+                revenue=sign * _item_revenue(item),
+                sold_g=sign * float(item.bag_size_g) * float(item.bags),
+            )
+    delta.write(session)
+
+
+def _add_roast(delta: RollupDelta, roast: RoastBatch, lot: CoffeeLot, sign: float) -> None:
+    delta.add_coffee(
+        roast.roast_date,
+        lot.variety_id,
+        lot.process,
+        roast_count=sign,
+        roasted_green_g=sign * float(roast.green_input_g),
+        roasted_output_g=sign * float(roast.roasted_output_g),
+        shrinkage_pct_sum=sign * float(roast.shrinkage_pct or 0.0),
+    )
+
+
+def apply_roast(session: Session, roast: RoastBatch, sign: float = 1.0, include_sales: bool = False) -> None:
+    """Add (or with ``sign=-1`` remove) a roast's contribution.
+
+    ``include_sales`` also moves the roast's sales, which is needed when the
+    roast changes lot and therefore variety or process.
+    """
+    lot = session.get(CoffeeLot, roast.lot_id)
+    if lot is None:
+        return
+    delta = RollupDelta()
+    _add_roast(delta, roast, lot, sign)
+    if include_sales and roast.id is not None:
+        _roast_sales_delta(delta, session, [roast.id], sign)
+    delta.write(session)
+
+
+def apply_roasts(session: Session, roasts: Iterable[RoastBatch], sign: float = 1.0) -> None:
+    """Add (or remove) several new roasts with one write per rollup row."""
+    roasts = list(roasts)
+    lots = {lot.id: lot for lot in session.exec(select(CoffeeLot).where(CoffeeLot.id.in_({r.lot_id for r in roasts})))}
+    delta = RollupDelta()
+    for roast in roasts:
+        lot = lots.get(roast.lot_id)
+        if lot is not None:
+            _add_roast(delta, roast, lot, sign)
+    delta.write(session)
+
+
+def apply_lot(session: Session, lot: CoffeeLot, sign: float = 1.0, include_history: bool = False) -> None:
+    """Add (or with ``sign=-1`` remove) a lot's purchase.
+
+    ``include_history`` also moves the lot's roasts and sales, which is needed
+    when the lot's variety or process changes.
+    """
+    delta = RollupDelta()
+    delta.add_coffee(lot.purchase_date, lot.variety_id, lot.process, green_purchased_g=sign * float(lot.green_weight_g))
+
+    if include_history and lot.id is not None:
+        roasts = session.exec(
+            select(
+                RoastBatch.roast_date,
+                func.count(RoastBatch.id),
+                func.sum(RoastBatch.green_input_g),
+                func.sum(RoastBatch.roasted_output_g),
+                func.sum(RoastBatch.shrinkage_pct),
+            )
+            .where(RoastBatch.lot_id == lot.id)
+            .group_by(RoastBatch.roast_date)
+        ).all()
+        for roast_date, roast_count, green_g, output_g, shrinkage_sum in roasts:
+            delta.add_coffee(
+                roast_date,
+                lot.variety_id,
+                lot.process,
+                roast_count=sign * roast_count,
+                roasted_green_g=sign * float(green_g),
+                roasted_output_g=sign * float(output_g),
+                shrinkage_pct_sum=sign * float(shrinkage_sum or 0.0),
+            )
+        roast_ids = session.exec(select(RoastBatch.id).where(RoastBatch.lot_id == lot.id)).all()
+        _roast_sales_delta(delta, session, list(roast_ids), sign)
+
+    delta.write(session)
+
+
+def apply_lots(session: Session, lots: Iterable[CoffeeLot], sign: float = 1.0) -> None:
+    """Add (or remove) the purchases of several new lots with one write per rollup row."""
+    delta = RollupDelta()
+    for lot in lots:
+        delta.add_coffee(
+            lot.purchase_date, lot.variety_id, lot.process, green_purchased_g=sign * float(lot.green_weight_g)
+        )
+    delta.write(session)
+
+
+def apply_expense(session: Session, expense: Expense, sign: float = 1.0) -> None:
+    apply_expenses(session, [expense], sign)
+
+
+def apply_expenses(session: Session, expenses: Iterable[Expense], sign: float = 1.0) -> None:
+    delta = RollupDelta()
+    for expense in expenses:
+        delta.add_expense(
+            expense.expense_date, expense.category, expense_count=sign, amount=sign * float(expense.amount)
+        )
+    delta.write(session)
+
+
+def rebuild_rollups(session: Session) -> tuple[int, int]:
+    """Recompute both rollup tables from the raw tables.
+
+    Returns the number of coffee and expense rollup rows written.
+    """
+    coffee: dict[CoffeeKey, dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    lots = select(
+        CoffeeLot.purchase_date,
+        CoffeeLot.variety_id,
+        CoffeeLot.process,
+        func.sum(CoffeeLot.green_weight_g),
+    ).group_by(CoffeeLot.purchase_date, CoffeeLot.variety_id, CoffeeLot.process)
+    for day, variety_id, process, green_g in session.exec(lots):
+        coffee[(day, variety_id, process)]["green_purchased_g"] += float(green_g)
+
+    roasts = (
+        select(
+            RoastBatch.roast_date,
+            CoffeeLot.variety_id,
+            CoffeeLot.process,
+            func.count(RoastBatch.id),
+            func.sum(RoastBatch.green_input_g),
+            func.sum(RoastBatch.roasted_output_g),
+            func.sum(RoastBatch.shrinkage_pct),
+        )
+        .join(CoffeeLot, CoffeeLot.id == RoastBatch.lot_id)
+        .group_by(RoastBatch.roast_date, CoffeeLot.variety_id, CoffeeLot.process)
+    )
+    for day, variety_id, process, roast_count, green_g, output_g, shrinkage_sum in session.exec(roasts):
+        metrics = coffee[(day, variety_id, process)]
+        metrics["roast_count"] += roast_count
+        metrics["roasted_green_g"] += float(green_g)
+        metrics["roasted_output_g"] += float(output_g)
+        metrics["shrinkage_pct_sum"] += float(shrinkage_sum or 0.0)
+
+    sales = (
+        select(
+            Sale.sale_date,
+            CoffeeLot.variety_id,
+            CoffeeLot.process,
+            func.sum(func.round(SaleItem.bag_price) * SaleItem.bags),
+            func.sum(SaleItem.bag_size_g * SaleItem.bags),
+        )
+        .join(Sale, Sale.id == SaleItem.sale_id)
+        .join(RoastBatch, RoastBatch.id == SaleItem.roast_batch_id)
+        .join(CoffeeLot, CoffeeLot.id == RoastBatch.lot_id)
+        .group_by(Sale.sale_date, CoffeeLot.variety_id, CoffeeLot.process)
+    )
+    for day, variety_id, process, revenue, sold_g in session.exec(sales):
+        metrics = coffee[(day, variety_id, process)]
+        metrics["revenue"] += float(revenue)
+        metrics["sold_g"] += float(sold_g)
+
+    expenses = select(
+        Expense.expense_date,
+        Expense.category,
+        func.count(Expense.id),
+        func.sum(Expense.amount),
+    ).group_by(Expense.expense_date, Expense.category)
+    expense_rows = [
+        {"day": day, "category": category, "expense_count": count, "amount": float(amount)}
+        for day, category, count, amount in session.exec(expenses)
+    ]
+    coffee_rows = [
+        {
+            "day": day,
+            "variety_id": variety_id,
+            "process": process,
+            **{name: metrics[name] for name in COFFEE_METRICS},
+        }
+        for (day, variety_id, process), metrics in coffee.items()
+    ]
+
+    session.execute(delete(DailyCoffeeRollup))
+    session.execute(delete(DailyExpenseRollup))
+    if coffee_rows:
+        session.execute(insert(DailyCoffeeRollup), coffee_rows)
+    if expense_rows:
+        session.execute(insert(DailyExpenseRollup), expense_rows)
+    return len(coffee_rows), len(expense_rows)
+
+
+def run() -> None:
+    with Session(engine) as session:
+        coffee_rows, expense_rows = rebuild_rollups(session)
+        session.commit()
+    print(f"Rollups rebuilt: {coffee_rows} coffee row(s), {expense_rows} expense row(s)")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,87 @@
+"""Sale validation shared by the sales routes and the bulk importer."""
+
+from __future__ import annotations
+
+from typing import Iterable
+
+from ..models import Sale, SaleCreate, SaleItem, SaleItemCreate
+
+
+class SaleValidationError(ValueError):
+    """Raised when a sale or its items are invalid; the message is user facing."""
+
+
+def item_totals(items: Iterable[SaleItemCreate]) -> tuple[float, float]:
+    """Return the total price and grams of ``items``, validating each one."""
+    items = list(items)
+    if not items:
+        raise SaleValidationError("Debe registrar al menos una tostión")
+
+    total_price = 0.0
+    total_quantity = 0.0
+
+    for item in items:
+        if item.bag_size_g <= 0:
+            raise SaleValidationError("El tamaño de la bolsa debe ser mayor a cero")
+        if item.bags <= 0:
+            raise SaleValidationError("Las bolsas deben ser mayores a cero")
+        if item.bag_price <= 0:
+            raise SaleValidationError("El precio por bolsa debe ser mayor a cero")
+
+        total_price += round(float(item.bag_price)) * float(item.bags)
+        total_quantity += float(item.bag_size_g) * float(item.bags)
+
+    return total_price, total_quantity
+
+
+def resolve_payment(
+    *,
+    total_price: float,
+    is_paid: bool,
+    amount_paid: float | None,
+) -> tuple[bool, float]:
+    if amount_paid is None:
+        resolved_amount = total_price if is_paid else 0.0
+    else:
+        if amount_paid < 0 or amount_paid > total_price:
+            raise SaleValidationError("El valor pagado debe estar entre 0 y el total de la venta")
+        resolved_amount = amount_paid
+        if resolved_amount < total_price:
+            is_paid = False
+        elif resolved_amount == total_price:
+            is_paid = True
+    return is_paid, resolved_amount
+
+
+def build_sale(payload: SaleCreate) -> Sale:
+    """Build an unsaved ``Sale`` and its items with totals and payment state resolved."""
+    total_price, total_quantity = item_totals(payload.items)
+
+    base_data = payload.model_dump(exclude={"items"}, exclude_unset=True)
+    resolved_is_paid, resolved_amount = resolve_payment(
+        total_price=total_price,
+        is_paid=payload.is_paid,
+        amount_paid=base_data.get("amount_paid"),
+    )
+
+    sale = Sale(**base_data)
+    sale.total_price = round(total_price)
+    sale.total_quantity_g = total_quantity
+    sale.is_paid = resolved_is_paid
+    sale.amount_paid = resolved_amount
+    sale.paid_at = (
+        payload.paid_at
+        if resolved_is_paid and payload.paid_at
+        else (payload.sale_date if resolved_is_paid else None)
+    )
+    sale.items = [
+        SaleItem(
+            roast_batch_id=item.roast_batch_id,
+            bag_size_g=item.bag_size_g,
+            bags=item.bags,
+            bag_price=item.bag_price,
+            notes=item.notes,
+        )
+        for item in payload.items
+    ]
+    return sale
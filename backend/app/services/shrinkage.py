@@ -0,0 +1,433 @@
+"""Shrinkage statistics per roast group kept with Welford accumulators.
+
+``ShrinkageStat`` holds the count, mean and sum of squared deviations of
+roast shrinkage for every roast, lot, variety, process and roast level group.
+The roasts and lots routes merge a roast's contribution in or out as they
+write, so scoring a new roast against its group is a primary-key read instead
+of a scan over history.
+
+Run ``python -m app.services.shrinkage`` to rebuild the table from scratch.
+"""
+
+from __future__ import annotations
+
+import math
+from collections import defaultdict
+from typing import Iterable, Literal, get_args
+
+import numpy as np
+from sqlalchemy import String, and_, cast, delete, func, insert, literal, tuple_, union_all
+from sqlmodel import Session, select
+
+from ..db import engine
+from ..models import CoffeeLot, RoastBatch, ShrinkageStat
+from .cache import ResultCache, data_version
+
+Dimension = Literal["all", "lot", "variety", "process", "roast_level"]
+DIMENSIONS: tuple[str, ...] = get_args(Dimension)
+PERCENTILES = (10, 25, 50, 75, 90)
+OUTLIER_ZSCORE = 3.0
+# Groups with fewer roasts are too small to call anything an outlier.
+MIN_GROUP_SIZE = 5
+
+GroupKey = tuple[str, str]
+
+_report_cache = ResultCache(maxsize=64, name="shrinkage_report")
+
+
+def _group_columns(dimension: str):
+    return {
+        "all": literal(""),
+        "lot": RoastBatch.lot_id,
+        "variety": CoffeeLot.variety_id,
+        "process": CoffeeLot.process,
+        "roast_level": RoastBatch.roast_level,
+    }[dimension]
+
+
+def _key(value: object) -> str:
+    return "" if value is None else str(value)
+
+
+def roast_group_keys(roast: RoastBatch, lot: CoffeeLot, dimensions: Iterable[str] = DIMENSIONS) -> list[GroupKey]:
+    values = {
+        "all": "",
+        "lot": roast.lot_id,
+        "variety": lot.variety_id,
+        "process": lot.process,
+        "roast_level": roast.roast_level,
+    }
+    return [(dimension, _key(values[dimension])) for dimension in dimensions]
+
+
+def sample_stddev(count: int, m2: float) -> float:
+    return math.sqrt(max(m2, 0.0) / (count - 1)) if count > 1 else 0.0
+
+
+def _merge(stat: ShrinkageStat, count: int, mean: float, m2: float, sign: int) -> None:
+    """Add (``sign=1``) or remove (``sign=-1``) a block of values from ``stat``.
+
+    Uses the parallel form of Welford's update so single roasts and whole
+    lots are merged the same way.
+    """
+    if sign > 0:
+        total = stat.count + count
+        delta = mean - stat.mean
+        stat.mean += delta * count / total
+        stat.m2 += m2 + delta * delta * stat.count * count / total
+        stat.count = total
+        return
+
+    remaining = stat.count - count
+    if remaining <= 0:
+        stat.count, stat.mean, stat.m2 = 0, 0.0, 0.0
+        return
+    remaining_mean = (stat.count * stat.mean - count * mean) / remaining
+    delta = mean - remaining_mean
+    stat.m2 = max(stat.m2 - m2 - delta * delta * remaining * count / stat.count, 0.0)
+    stat.mean = remaining_mean
+    stat.count = remaining
+
+
+def _locked_stats(session: Session, keys: list[GroupKey]) -> dict[GroupKey, ShrinkageStat]:
+    """Lock the stat rows for ``keys``, creating the missing ones first."""
+    rows = [{"dimension": dimension, "group_key": group_key} for dimension, group_key in sorted(set(keys))]
+    dialect = session.get_bind().dialect.name
+    if dialect in {"postgresql", "sqlite"}:
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        session.execute(dialect_insert(ShrinkageStat).values(rows).on_conflict_do_nothing())
+        # Lock exactly the requested rows, in key order so concurrent writers cannot deadlock.
+        statement = (
+            select(ShrinkageStat)
+            .where(tuple_(ShrinkageStat.dimension, ShrinkageStat.group_key).in_(sorted(set(keys))))
+            .order_by(ShrinkageStat.dimension, ShrinkageStat.group_key)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+        return {(stat.dimension, stat.group_key): stat for stat in session.exec(statement)}
+
+    stats = {}
+    for row in rows:
+        key = (row["dimension"], row["group_key"])
+        stat = session.get(ShrinkageStat, key, with_for_update=True)
+        if stat is None:
+            stat = ShrinkageStat(**row)
+            session.add(stat)
+        stats[key] = stat
+    return stats
+
+
+def _lots(session: Session, roasts: list[RoastBatch]) -> dict[int, CoffeeLot]:
+    lot_ids = {roast.lot_id for roast in roasts}
+    return {lot.id: lot for lot in session.exec(select(CoffeeLot).where(CoffeeLot.id.in_(lot_ids)))}
+
+
+def apply_roasts_shrinkage(session: Session, roasts: Iterable[RoastBatch], sign: int = 1) -> None:
+    """Add (or with ``sign=-1`` remove) roasts' shrinkage in all their groups.
+
+    Values are merged per group as one block, so a batch of roasts locks and
+    writes each group row once.
+    """
+    roasts = list(roasts)
+    lots = _lots(session, roasts)
+    values: dict[GroupKey, list[float]] = defaultdict(list)
+    for roast in roasts:
+        lot = lots.get(roast.lot_id)
+        if lot is None:
+            continue
+        for key in roast_group_keys(roast, lot):
+            values[key].append(float(roast.shrinkage_pct or 0.0))
+    if not values:
+        return
+    for key, stat in _locked_stats(session, list(values)).items():
+        block = np.asarray(values[key], dtype=np.float64)
+        mean = float(block.mean())
+        _merge(stat, len(block), mean, float(((block - mean) ** 2).sum()), sign)
+        session.add(stat)
+
+
+def apply_roast_shrinkage(session: Session, roast: RoastBatch, sign: int = 1) -> None:
+    apply_roasts_shrinkage(session, [roast], sign)
+
+
+def apply_lot_shrinkage(session: Session, lot: CoffeeLot, sign: int = 1) -> None:
+    """Move a lot's roasts in or out of their variety and process groups.
+
+    Needed when a lot's variety or process changes; lot, roast level and
+    overall groups are unaffected.
+    """
+    values = np.asarray(
+        session.exec(select(RoastBatch.shrinkage_pct).where(RoastBatch.lot_id == lot.id)).all(), dtype=np.float64
+    )
+    if not len(values):
+        return
+    mean = float(values.mean())
+    m2 = float(((values - mean) ** 2).sum())
+    keys = [("variety", _key(lot.variety_id)), ("process", _key(lot.process))]
+    for stat in _locked_stats(session, keys).values():
+        _merge(stat, len(values), mean, m2, sign)
+        session.add(stat)
+
+
+def shrinkage_zscores(session: Session, roasts: Iterable[RoastBatch]) -> list[float | None]:
+    """Z-score of each roast's shrinkage within its most specific large-enough group.
+
+    Tries the roast level, then the variety, then all roasts. Call it before
+    the roasts are added to the statistics so they are not compared with
+    themselves.
+    """
+    roasts = list(roasts)
+    lots = _lots(session, roasts)
+    candidates: list[list[GroupKey]] = []
+    for roast in roasts:
+        lot = lots.get(roast.lot_id)
+        dimensions = ("roast_level", "variety", "all") if roast.roast_level else ("variety", "all")
+        candidates.append(roast_group_keys(roast, lot, dimensions) if lot is not None else [])
+    keys = {key for roast_keys in candidates for key in roast_keys}
+    if not keys:
+        return [None] * len(roasts)
+
+    statement = select(ShrinkageStat).where(
+        ShrinkageStat.dimension.in_({dimension for dimension, _ in keys}),
+        ShrinkageStat.group_key.in_({group_key for _, group_key in keys}),
+    )
+    stats = {(stat.dimension, stat.group_key): stat for stat in session.exec(statement)}
+    zscores: list[float | None] = []
+    for roast, roast_keys in zip(roasts, candidates):
+        zscore = None
+        for key in roast_keys:
+            stat = stats.get(key)
+            if stat is None or stat.count < MIN_GROUP_SIZE:
+                continue
+            stddev = sample_stddev(stat.count, stat.m2)
+            zscore = (float(roast.shrinkage_pct) - stat.mean) / stddev if stddev > 0 else 0.0
+            break
+        zscores.append(zscore)
+    return zscores
+
+
+def shrinkage_zscore(session: Session, roast: RoastBatch) -> float | None:
+    return shrinkage_zscores(session, [roast])[0]
+
+
+def _roast_values(session: Session, dimension: str) -> tuple[np.ndarray, np.ndarray, np.ndarray, list[str]]:
+    """Roast ids, shrinkage values and group codes for ``dimension``, plus the code's keys."""
+    statement = select(RoastBatch.id, RoastBatch.shrinkage_pct, _group_columns(dimension)).join(
+        CoffeeLot, CoffeeLot.id == RoastBatch.lot_id
+    )
+    rows = session.exec(statement).all()
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    values = np.fromiter((row[1] or 0.0 for row in rows), dtype=np.float64, count=len(rows))
+    keys, codes = np.unique(np.array([_key(row[2]) for row in rows], dtype=object), return_inverse=True)
+    return ids, values, codes.reshape(-1), [str(key) for key in keys]
+
+
+def _group_moments(values: np.ndarray, codes: np.ndarray, group_count: int) -> tuple[np.ndarray, ...]:
+    """Count, mean and sum of squared deviations per group code."""
+    counts = np.bincount(codes, minlength=group_count)
+    means = np.bincount(codes, weights=values, minlength=group_count) / np.maximum(counts, 1)
+    m2s = np.bincount(codes, weights=(values - means[codes]) ** 2, minlength=group_count)
+    return counts, means, m2s
+
+
+def rebuild_shrinkage_stats(session: Session) -> int:
+    """Recompute every group from the roasts table; returns the rows written."""
+    rows = []
+    for dimension in DIMENSIONS:
+        _, values, codes, keys = _roast_values(session, dimension)
+        if not len(values):
+            continue
+        counts, means, m2s = _group_moments(values, codes, len(keys))
+        rows.extend(
+            {"dimension": dimension, "group_key": key, "count": int(count), "mean": float(mean), "m2": float(m2)}
+            for key, count, mean, m2 in zip(keys, counts, means, m2s)
+        )
+    session.execute(delete(ShrinkageStat))
+    if rows:
+        session.execute(insert(ShrinkageStat), rows)
+    return len(rows)
+
+
+def _group_percentiles(values: np.ndarray, codes: np.ndarray, group_count: int) -> np.ndarray:
+    """Linear-interpolated percentiles per group, shape ``(groups, len(PERCENTILES))``."""
+    order = np.lexsort((values, codes))
+    sorted_values = values[order]
+    counts = np.bincount(codes, minlength=group_count)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    positions = (counts[:, None] - 1) * (np.asarray(PERCENTILES) / 100.0)[None, :]
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.ceil(positions).astype(np.int64)
+    fraction = positions - lower
+    low_values = sorted_values[starts[:, None] + lower]
+    high_values = sorted_values[starts[:, None] + upper]
+    return low_values + (high_values - low_values) * fraction
+
+
+def _group_key_column(dimension: str):
+    """SQL expression equal to ``_key`` of the group column, to match ``ShrinkageStat.group_key``."""
+    return func.coalesce(cast(_group_columns(dimension), String), "")
+
+
+def _stat_outliers(session: Session, dimension: str, threshold: float) -> list[dict]:
+    """Roasts beyond ``threshold`` z-scores of their stored group statistics.
+
+    Compares squared deviations (``d² · (n - 1) > z² · m2``) so the database
+    filters the roasts without needing ``sqrt``; only outliers are returned.
+    """
+    value = func.coalesce(RoastBatch.shrinkage_pct, 0.0)
+    deviation = value - ShrinkageStat.mean
+    statement = (
+        select(RoastBatch.id, ShrinkageStat.group_key, value, ShrinkageStat.count, ShrinkageStat.mean, ShrinkageStat.m2)
+        .join(CoffeeLot, CoffeeLot.id == RoastBatch.lot_id)
+        .join(
+            ShrinkageStat,
+            and_(ShrinkageStat.dimension == dimension, ShrinkageStat.group_key == _group_key_column(dimension)),
+        )
+        .where(
+            ShrinkageStat.count >= MIN_GROUP_SIZE,
+            ShrinkageStat.m2 > 0,
+            deviation * deviation * (ShrinkageStat.count - 1) > threshold * threshold * ShrinkageStat.m2,
+        )
+    )
+    outliers = []
+    for roast_id, group_key, shrinkage, count, mean, m2 in session.exec(statement):
+        stddev = sample_stddev(count, m2)
+        outliers.append(
+            {
+                "roast_id": roast_id,
+                "key": group_key or None,
+                "shrinkage_pct": float(shrinkage),
+                "zscore": (float(shrinkage) - mean) / stddev,
+            }
+        )
+    outliers.sort(key=lambda outlier: (-abs(outlier["zscore"]), outlier["roast_id"]))
+    return outliers
+
+
+def _stats_report(session: Session, dimension: str, threshold: float) -> tuple[list[dict], list[dict]]:
+    statement = (
+        select(ShrinkageStat)
+        .where(ShrinkageStat.dimension == dimension, ShrinkageStat.count > 0)
+        .order_by(ShrinkageStat.group_key)
+    )
+    groups = [
+        {
+            "key": stat.group_key or None,
+            "count": stat.count,
+            "mean": stat.mean,
+            "stddev": sample_stddev(stat.count, stat.m2),
+        }
+        for stat in session.exec(statement)
+    ]
+    return groups, _stat_outliers(session, dimension, threshold)
+
+
+def _scanned_report(session: Session, dimension: str, threshold: float) -> tuple[list[dict], list[dict]]:
+    """Groups with percentiles, which need every roast's value."""
+    stats = {
+        stat.group_key: stat
+        for stat in session.exec(select(ShrinkageStat).where(ShrinkageStat.dimension == dimension))
+        if stat.count > 0
+    }
+    ids, values, codes, keys = _roast_values(session, dimension)
+    groups = []
+    outliers = []
+    if not len(values):
+        return groups, outliers
+    percentiles = _group_percentiles(values, codes, len(keys))
+    counts, means, m2s = _group_moments(values, codes, len(keys))
+    stddevs = np.array([sample_stddev(int(count), float(m2)) for count, m2 in zip(counts, m2s)])
+    for index, key in enumerate(keys):
+        # Stored stats can drift from the roasts (e.g. after a restore); then the group's own values win.
+        stat = stats.get(key)
+        if stat is not None and stat.count == counts[index]:
+            means[index] = stat.mean
+            stddevs[index] = sample_stddev(stat.count, stat.m2)
+    for index, key in enumerate(keys):
+        groups.append(
+            {
+                "key": key or None,
+                "count": int(counts[index]),
+                "mean": float(means[index]),
+                "stddev": float(stddevs[index]),
+                **{f"p{q}": float(value) for q, value in zip(PERCENTILES, percentiles[index])},
+            }
+        )
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        zscores = (values - means[codes]) / stddevs[codes]
+    flagged = (counts[codes] >= MIN_GROUP_SIZE) & (stddevs[codes] > 0) & (np.abs(zscores) > threshold)
+    for index in np.flatnonzero(flagged)[np.argsort(-np.abs(zscores[flagged]), kind="stable")]:
+        outliers.append(
+            {
+                "roast_id": int(ids[index]),
+                "key": keys[codes[index]] or None,
+                "shrinkage_pct": float(values[index]),
+                "zscore": float(zscores[index]),
+            }
+        )
+    return groups, outliers
+
+
+def shrinkage_report(
+    session: Session, dimension: str, threshold: float = OUTLIER_ZSCORE, percentiles: bool = False
+) -> dict:
+    """Per-group mean and stddev, plus roasts beyond ``threshold`` z-scores.
+
+    Groups come from ``ShrinkageStat``; only ``percentiles=True`` reads every
+    roast to add the p10-p90 percentiles.
+    """
+    cache_key = (dimension, threshold, percentiles)
+    report = _report_cache.get(cache_key)
+    if report is not None:
+        return report
+
+    version = data_version()
+    build = _scanned_report if percentiles else _stats_report
+    groups, outliers = build(session, dimension, threshold)
+    report = {"group_by": dimension, "threshold": threshold, "groups": groups, "outliers": outliers}
+    _report_cache.set(cache_key, report, version=version)
+    return report
+
+
+def _stats_drifted(session: Session) -> bool:
+    """Whether any group's stored roast count differs from the roasts table, checked in one grouped query."""
+    stored = {
+        (stat.dimension, stat.group_key): stat.count
+        for stat in session.exec(select(ShrinkageStat))
+        if stat.count > 0
+    }
+    counts = union_all(
+        *(
+            select(literal(dimension).label("dimension"), _group_key_column(dimension).label("group_key"), func.count())
+            .select_from(RoastBatch)
+            .join(CoffeeLot, CoffeeLot.id == RoastBatch.lot_id)
+            .group_by(_group_key_column(dimension))
+            for dimension in DIMENSIONS
+        )
+    )
+    computed = {(dimension, group_key): count for dimension, group_key, count in session.execute(counts)}
+    return stored != computed
+
+
+def ensure_shrinkage_stats() -> None:
+    """Rebuild the statistics when they are missing or out of step with the roasts (e.g. after a restore)."""
+    with Session(engine) as session:
+        if not _stats_drifted(session):
+            return
+        rebuild_shrinkage_stats(session)
+        session.commit()
+
+
+def run() -> None:
+    with Session(engine) as session:
+        rows = rebuild_shrinkage_stats(session)
+        session.commit()
+    print(f"Shrinkage statistics rebuilt: {rows} group(s)")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,219 @@
+"""Roast similarity search over an in-memory feature matrix.
+
+Every roast is described by its resampled bean temperature profile, shrinkage,
+development time ratio, roast duration and the variety and process of its lot.
+The matrix is loaded once per worker and patched row by row when roasts, lots
+or curves are written through this worker. Before each query a count of roasts
+and curves catches writes from other workers: new roasts are appended and any
+other mismatch reloads the matrix. In-place edits elsewhere, which leave the
+counts unchanged, are picked up by the full reload every ``RELOAD_SECONDS``. A
+query is a single vectorized distance computation over all rows.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterable
+
+import numpy as np
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from ..models import CoffeeLot, RoastBatch, RoastCurve
+from .curves import PROFILE_POINTS, decode_profile
+
+RELOAD_SECONDS = 900.0
+
+# Differences of these sizes add 1.0 to the distance.
+CURVE_RMSE_SCALE_C = 5.0
+SHRINKAGE_SCALE_PCT = 1.0
+DTR_SCALE_PCT = 2.0
+DURATION_SCALE_S = 30.0
+# Added when only one of the two roasts has a curve, or lot attributes differ.
+MISSING_CURVE_PENALTY = 3.0
+VARIETY_PENALTY = 1.0
+PROCESS_PENALTY = 1.0
+
+
+@dataclass
+class SimilarRoastMatch:
+    roast_id: int
+    distance: float
+    curve_rmse: float | None
+
+
+class RoastFeatureIndex:
+    """Fixed-width feature rows for every roast, addressable by roast id."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._loaded_at: float | None = None
+        self._reset(0)
+
+    def _reset(self, capacity: int) -> None:
+        self.size = 0
+        self.positions: dict[int, int] = {}
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.profiles = np.full((capacity, PROFILE_POINTS), np.nan, dtype=np.float32)
+        self.scalars = np.full((capacity, 3), np.nan, dtype=np.float64)  # shrinkage, dtr, drop_s
+        self.varieties = np.zeros(capacity, dtype=np.int64)
+        self.processes = np.zeros(capacity, dtype=np.int64)
+        self._process_codes: dict[str, int] = {}
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self.ids)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 64)
+        extra = capacity - len(self.ids)
+        self.ids = np.concatenate([self.ids, np.zeros(extra, dtype=np.int64)])
+        self.profiles = np.concatenate([self.profiles, np.full((extra, PROFILE_POINTS), np.nan, dtype=np.float32)])
+        self.scalars = np.concatenate([self.scalars, np.full((extra, 3), np.nan)])
+        self.varieties = np.concatenate([self.varieties, np.zeros(extra, dtype=np.int64)])
+        self.processes = np.concatenate([self.processes, np.zeros(extra, dtype=np.int64)])
+
+    @staticmethod
+    def _statement():
+        return (
+            select(
+                RoastBatch.id,
+                RoastBatch.shrinkage_pct,
+                CoffeeLot.variety_id,
+                CoffeeLot.process,
+                RoastCurve.profile,
+                RoastCurve.development_time_ratio,
+                RoastCurve.drop_s,
+            )
+            .join(CoffeeLot, CoffeeLot.id == RoastBatch.lot_id)
+            .outerjoin(RoastCurve, RoastCurve.roast_batch_id == RoastBatch.id)
+        )
+
+    def _set_row(self, row: tuple) -> None:
+        roast_id, shrinkage, variety_id, process, profile, dtr, drop_s = row
+        position = self.positions.get(roast_id)
+        if position is None:
+            self._grow(self.size + 1)
+            position = self.size
+            self.size += 1
+            self.positions[roast_id] = position
+        self.ids[position] = roast_id
+        self.profiles[position] = decode_profile(profile) if profile is not None else np.nan
+        self.scalars[position] = (
+            shrinkage if shrinkage is not None else np.nan,
+            dtr if dtr is not None else np.nan,
+            drop_s if drop_s is not None else np.nan,
+        )
+        self.varieties[position] = variety_id
+        self.processes[position] = self._process_codes.setdefault(process, len(self._process_codes) + 1)
+
+    def _remove_row(self, roast_id: int) -> None:
+        position = self.positions.pop(roast_id, None)
+        if position is None:
+            return
+        last = self.size - 1
+        if position != last:
+            for array in (self.ids, self.profiles, self.scalars, self.varieties, self.processes):
+                array[position] = array[last]
+            self.positions[int(self.ids[position])] = position
+        self.size = last
+
+    def load(self, session: Session) -> None:
+        rows = session.exec(self._statement()).all()
+        with self._lock:
+            self._reset(len(rows))
+            for row in rows:
+                self._set_row(row)
+            self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self, session: Session) -> None:
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > RELOAD_SECONDS:
+            self.load(session)
+            return
+        self._sync(session)
+
+    def _sync(self, session: Session) -> None:
+        """Catch up with roasts and curves written by other workers."""
+        max_id, roast_count = session.exec(
+            select(func.coalesce(func.max(RoastBatch.id), 0), func.count(RoastBatch.id))
+        ).one()
+        curve_count = session.exec(select(func.count(RoastCurve.profile))).one()
+        known_max_id = int(self.ids[: self.size].max()) if self.size else 0
+        if max_id > known_max_id:
+            rows = session.exec(self._statement().where(RoastBatch.id > known_max_id)).all()
+            with self._lock:
+                for row in rows:
+                    self._set_row(row)
+        indexed_curves = int(np.count_nonzero(~np.isnan(self.profiles[: self.size, 0])))
+        if self.size != roast_count or indexed_curves != curve_count:
+            self.load(session)
+
+    def refresh(self, session: Session, roast_ids: Iterable[int]) -> None:
+        """Reload the rows of ``roast_ids``; ids that no longer exist are dropped."""
+        roast_ids = set(roast_ids)
+        if self._loaded_at is None or not roast_ids:
+            return
+        rows = session.exec(self._statement().where(RoastBatch.id.in_(roast_ids))).all()
+        with self._lock:
+            for row in rows:
+                self._set_row(row)
+            for roast_id in roast_ids - {row[0] for row in rows}:
+                self._remove_row(roast_id)
+
+    def refresh_lot(self, session: Session, lot_id: int) -> None:
+        if self._loaded_at is None:
+            return
+        self.refresh(session, session.exec(select(RoastBatch.id).where(RoastBatch.lot_id == lot_id)).all())
+
+    def invalidate(self) -> None:
+        """Reload everything on the next query, e.g. after a bulk import."""
+        self._loaded_at = None
+
+    def remove(self, roast_id: int) -> None:
+        with self._lock:
+            self._remove_row(roast_id)
+
+    def similar(self, session: Session, roast_id: int, k: int) -> list[SimilarRoastMatch] | None:
+        """The ``k`` roasts closest to ``roast_id``, or ``None`` if it is unknown."""
+        self._ensure_loaded(session)
+        if roast_id not in self.positions:
+            self.refresh(session, [roast_id])
+        with self._lock:
+            position = self.positions.get(roast_id)
+            if position is None:
+                return None
+            size = self.size
+            profiles = self.profiles[:size]
+            scalars = self.scalars[:size]
+            query_profile = profiles[position]
+            query_scalars = scalars[position]
+
+            curve_rmse = np.sqrt(np.mean((profiles - query_profile) ** 2, axis=1, dtype=np.float64))
+            scaled = np.abs(scalars - query_scalars) / (SHRINKAGE_SCALE_PCT, DTR_SCALE_PCT, DURATION_SCALE_S)
+            has_curve = ~np.isnan(profiles[:, 0])
+            if has_curve[position]:
+                curve_term = np.where(has_curve, curve_rmse / CURVE_RMSE_SCALE_C, MISSING_CURVE_PENALTY)
+            else:
+                curve_term = np.where(has_curve, MISSING_CURVE_PENALTY, 0.0)
+            distance = curve_term + np.nansum(scaled, axis=1)
+            distance += np.where(self.varieties[:size] != self.varieties[position], VARIETY_PENALTY, 0.0)
+            distance += np.where(self.processes[:size] != self.processes[position], PROCESS_PENALTY, 0.0)
+            distance[position] = np.inf
+
+            k = min(k, size - 1)
+            if k <= 0:
+                return []
+            nearest = np.argpartition(distance, k - 1)[:k]
+            nearest = nearest[np.argsort(distance[nearest], kind="stable")]
+            return [
+                SimilarRoastMatch(
+                    roast_id=int(self.ids[index]),
+                    distance=float(distance[index]),
+                    curve_rmse=float(curve_rmse[index]) if not np.isnan(curve_rmse[index]) else None,
+                )
+                for index in nearest
+            ]
+
+
+roast_index = RoastFeatureIndex()
@@ -0,0 +1,222 @@
+"""Columnar Parquet snapshots of the operational tables for offline analytics.
+
+A full snapshot reads every table inside one read-only ``REPEATABLE READ``
+transaction, so all files describe the same instant, and streams each table
+through a server-side cursor into Parquet row groups of ``BATCH_SIZE`` rows.
+Each table is a directory of part files under ``settings.snapshot_dir``
+together with a ``manifest.json`` holding the highest id written per table.
+
+Most tables are edited and deleted in place and carry no modification stamp,
+so an incremental snapshot still rewrites them in full. Only the tables in
+``APPEND_ONLY_MODELS`` get a new part file with the rows whose id is above the
+watermark; the manifest also keeps a checksum (row count and numeric column
+sums) of the range already written, and a table whose old rows no longer match
+it, because sale items were replaced or costs recomputed, is rewritten too.
+
+Run ``python -m app.services.snapshot [--incremental]`` or use
+``POST /api/v1/admin/snapshot``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, LargeBinary, Table, func, select
+from sqlalchemy.engine import Connection
+
+from ..core.config import settings
+from ..db import disable_statement_timeout, engine
+from ..models import (
+    CoffeeLot,
+    Customer,
+    Expense,
+    Farm,
+    RoastBatch,
+    RoastInventoryAdjustment,
+    Sale,
+    SaleItem,
+    Variety,
+)
+
+SNAPSHOT_MODELS = (Farm, Variety, CoffeeLot, RoastBatch, Customer, Sale, SaleItem, Expense, RoastInventoryAdjustment)
+# Rows only ever inserted, or deleted and recomputed in ways the checksum sees.
+APPEND_ONLY_MODELS = (SaleItem,)
+BATCH_SIZE = 50_000
+MANIFEST_NAME = "manifest.json"
+
+
+@dataclass
+class TableSnapshot:
+    table: str
+    rows: int = 0
+    max_id: int = 0
+    parts: list[str] = field(default_factory=list)
+    checksum: list[float] = field(default_factory=list)
+
+
+@dataclass
+class SnapshotManifest:
+    taken_at: str
+    incremental: bool
+    tables: dict[str, TableSnapshot]
+
+
+def _arrow_type(column) -> pa.DataType:
+    column_type = column.type
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    if isinstance(column_type, Integer):
+        return pa.int64()
+    if isinstance(column_type, Float):
+        return pa.float64()
+    if isinstance(column_type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(column_type, Date):
+        return pa.date32()
+    if isinstance(column_type, LargeBinary):
+        return pa.binary()
+    return pa.string()
+
+
+def arrow_schema(table: Table) -> pa.Schema:
+    return pa.schema([pa.field(column.name, _arrow_type(column), nullable=column.nullable) for column in table.columns])
+
+
+def load_manifest(directory: Path) -> SnapshotManifest | None:
+    path = directory / MANIFEST_NAME
+    if not path.exists():
+        return None
+    data = json.loads(path.read_text())
+    tables = {name: TableSnapshot(**table) for name, table in data["tables"].items()}
+    return SnapshotManifest(taken_at=data["taken_at"], incremental=data["incremental"], tables=tables)
+
+
+def _checksum(connection: Connection, table: Table, up_to_id: int) -> list[float]:
+    """Row count and numeric column sums of ``table`` rows with ``id <= up_to_id``."""
+    numeric = [
+        column
+        for column in table.columns
+        if isinstance(column.type, (Integer, Float)) and not isinstance(column.type, Boolean)
+    ]
+    statement = select(func.count(), *(func.coalesce(func.sum(column), 0) for column in numeric)).where(
+        table.c.id <= up_to_id
+    )
+    return [float(value) for value in connection.execute(statement).one()]
+
+
+def _unchanged(connection: Connection, table: Table, entry: TableSnapshot) -> bool:
+    if not entry.checksum:
+        return False
+    current = _checksum(connection, table, entry.max_id)
+    return len(current) == len(entry.checksum) and all(
+        math.isclose(now, before, rel_tol=1e-9, abs_tol=1e-6) for now, before in zip(current, entry.checksum)
+    )
+
+
+def _write_table(connection: Connection, table: Table, path: Path, after_id: int) -> tuple[int, int]:
+    """Stream ``table`` rows with ``id > after_id`` into ``path``; returns the row count and highest id."""
+    schema = arrow_schema(table)
+    statement = select(table).where(table.c.id > after_id).order_by(table.c.id)
+    result = connection.execution_options(yield_per=BATCH_SIZE).execute(statement)
+    rows_written = 0
+    max_id = after_id
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for partition in result.partitions():
+            columns = list(zip(*partition))
+            batch = pa.record_batch(
+                [pa.array(values, type=schema_field.type) for values, schema_field in zip(columns, schema)],
+                schema=schema,
+            )
+            writer.write_batch(batch, row_group_size=BATCH_SIZE)
+            rows_written += len(partition)
+            max_id = max(max_id, partition[-1].id)
+    return rows_written, max_id
+
+
+def take_snapshot(directory: str | Path | None = None, incremental: bool = False) -> SnapshotManifest:
+    """Write a full or incremental snapshot and return the new manifest.
+
+    Parts are written under temporary names and only renamed into place, and
+    the manifest replaced, once every table has been read, so a failed run
+    leaves the previous snapshot untouched.
+    """
+    directory = Path(directory or settings.snapshot_dir)
+    previous = load_manifest(directory) if incremental else None
+    incremental = previous is not None
+    taken_at = datetime.now(timezone.utc)
+    part_name = f"part-{taken_at:%Y%m%dT%H%M%S%f}.parquet"
+
+    written: list[tuple[Path, Path]] = []
+    tables: dict[str, TableSnapshot] = {}
+    options = {"postgresql_readonly": True, "isolation_level": "REPEATABLE READ"}
+    if engine.dialect.name != "postgresql":
+        options = {}
+    try:
+        with engine.connect().execution_options(**options) as connection, connection.begin():
+            disable_statement_timeout(connection)
+            for model in SNAPSHOT_MODELS:
+                table = model.__table__
+                entry = TableSnapshot(table=table.name)
+                if previous is not None and table.name in previous.tables and model in APPEND_ONLY_MODELS:
+                    entry = TableSnapshot(**asdict(previous.tables[table.name]))
+                    if not _unchanged(connection, table, entry):
+                        entry = TableSnapshot(table=table.name)
+                append = bool(entry.parts)
+                table_dir = directory / table.name
+                table_dir.mkdir(parents=True, exist_ok=True)
+                temporary = table_dir / f"{part_name}.tmp"
+                rows, max_id = _write_table(connection, table, temporary, entry.max_id)
+                written.append((temporary, table_dir / part_name))
+                if rows or not append:
+                    entry.parts.append(part_name)
+                    entry.rows += rows
+                    entry.max_id = max_id
+                if model in APPEND_ONLY_MODELS:
+                    entry.checksum = _checksum(connection, table, entry.max_id)
+                tables[table.name] = entry
+    except BaseException:
+        for temporary, _ in written:
+            temporary.unlink(missing_ok=True)
+        raise
+
+    for (temporary, final), entry in zip(written, tables.values()):
+        if final.name in entry.parts:
+            os.replace(temporary, final)
+        else:
+            temporary.unlink()
+    manifest = SnapshotManifest(taken_at=taken_at.isoformat(), incremental=incremental, tables=tables)
+    manifest_path = directory / MANIFEST_NAME
+    temporary_manifest = manifest_path.with_suffix(".json.tmp")
+    temporary_manifest.write_text(json.dumps(asdict(manifest), indent=2))
+    os.replace(temporary_manifest, manifest_path)
+
+    for entry in tables.values():
+        for stale in (directory / entry.table).glob("part-*.parquet"):
+            if stale.name not in entry.parts:
+                stale.unlink()
+    return manifest
+
+
+def run() -> None:
+    parser = argparse.ArgumentParser(description="Escribe una instantánea Parquet de las tablas operativas.")
+    parser.add_argument("--incremental", action="store_true", help="solo agrega las líneas de venta nuevas; el resto se reescribe")
+    parser.add_argument("--dir", dest="directory", help=f"por defecto {settings.snapshot_dir}")
+    args = parser.parse_args()
+
+    manifest = take_snapshot(args.directory, incremental=args.incremental)
+    mode = "incremental" if manifest.incremental else "completa"
+    print(f"Instantánea {mode} {manifest.taken_at}")
+    for entry in manifest.tables.values():
+        print(f"  {entry.table}: {entry.rows} filas en {len(entry.parts)} archivos")
+
+
+if __name__ == "__main__":
+    run()
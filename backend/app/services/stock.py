@@ -0,0 +1,185 @@
+"""Materialized roasted-coffee stock per roast batch.
+
+Every write that changes how much roasted coffee a batch has left (sales,
+inventory adjustments and roast edits) updates the matching ``RoastStock``
+row inside the same transaction, so availability checks and the roasted
+inventory listing are primary-key reads instead of aggregates over the whole
+sales history.
+
+Run ``python -m app.services.stock`` to recompute every row from scratch and
+report any drift against the stored balances.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Iterable, Mapping
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from ..db import engine
+from ..models import RoastBatch, RoastInventoryAdjustment, RoastStock, SaleItem
+
+DRIFT_TOLERANCE_G = 1e-6
+
+
+def grams_by_roast(items: Iterable[SaleItem]) -> dict[int, float]:
+    totals: dict[int, float] = defaultdict(float)
+    for item in items:
+        totals[item.roast_batch_id] += float(item.bag_size_g) * float(item.bags)
+    return dict(totals)
+
+
+def _computed_stock_statement(roast_ids: Iterable[int] | None = None):
+    sold_query = select(func.coalesce(func.sum(SaleItem.bag_size_g * SaleItem.bags), 0.0)).where(
+        SaleItem.roast_batch_id == RoastBatch.id
+    )
+    adjustments_query = select(func.coalesce(func.sum(RoastInventoryAdjustment.adjustment_g), 0.0)).where(
+        RoastInventoryAdjustment.roast_batch_id == RoastBatch.id
+    )
+    statement = select(
+        RoastBatch.id,
+        RoastBatch.roasted_output_g,
+        sold_query.scalar_subquery().label("sold_g"),
+        adjustments_query.scalar_subquery().label("adjusted_g"),
+    ).order_by(RoastBatch.id)
+    if roast_ids is not None:
+        statement = statement.where(RoastBatch.id.in_(list(roast_ids)))
+    return statement
+
+
+def _set_balance(stock: RoastStock, roasted_output_g: float, sold_g: float, adjusted_g: float) -> None:
+    stock.roasted_output_g = float(roasted_output_g)
+    stock.sold_g = float(sold_g)
+    stock.adjusted_g = float(adjusted_g)
+    stock.available_g = stock.roasted_output_g - stock.sold_g + stock.adjusted_g
+
+
+def lock_stock(session: Session, roast_ids: Iterable[int]) -> dict[int, RoastStock]:
+    """Load and lock the stock rows for ``roast_ids``.
+
+    Rows are locked with ``FOR UPDATE`` in primary-key order so concurrent
+    writers touching the same roasts serialise without deadlocking. The
+    balances come from this locking statement itself, never from an earlier
+    read, so a writer that waited on the lock sees the committed totals of
+    the one it waited for. Roasts that do not exist are simply absent from
+    the result.
+    """
+    ids = sorted(set(roast_ids))
+    if not ids:
+        return {}
+    statement = (
+        select(RoastStock)
+        .where(RoastStock.roast_batch_id.in_(ids))
+        .order_by(RoastStock.roast_batch_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    return {stock.roast_batch_id: stock for stock in session.exec(statement)}
+
+
+def create_stock(session: Session, roast: RoastBatch) -> RoastStock:
+    stock = RoastStock(roast_batch_id=roast.id)
+    _set_balance(stock, roast.roasted_output_g, 0.0, 0.0)
+    session.add(stock)
+    return stock
+
+
+def apply_sold(session: Session, sold_by_roast: Mapping[int, float]) -> None:
+    """Add ``sold_by_roast`` grams (negative to release) to the sold totals."""
+    changed = {roast_id: grams for roast_id, grams in sold_by_roast.items() if abs(grams) > DRIFT_TOLERANCE_G}
+    stocks = lock_stock(session, changed)
+    for roast_id, grams in changed.items():
+        stock = stocks.get(roast_id)
+        if stock is None:
+            continue
+        _set_balance(stock, stock.roasted_output_g, stock.sold_g + grams, stock.adjusted_g)
+        session.add(stock)
+
+
+def apply_adjustment(session: Session, roast_id: int, adjustment_g: float) -> None:
+    stock = lock_stock(session, [roast_id]).get(roast_id)
+    if stock is None:
+        return
+    _set_balance(stock, stock.roasted_output_g, stock.sold_g, stock.adjusted_g + adjustment_g)
+    session.add(stock)
+
+
+def sync_roast_output(session: Session, roast: RoastBatch) -> None:
+    stock = lock_stock(session, [roast.id]).get(roast.id)
+    if stock is None:
+        create_stock(session, roast)
+        return
+    _set_balance(stock, roast.roasted_output_g, stock.sold_g, stock.adjusted_g)
+    session.add(stock)
+
+
+def delete_stock(session: Session, roast_id: int) -> None:
+    stock = session.get(RoastStock, roast_id)
+    if stock is not None:
+        session.delete(stock)
+        session.flush()
+
+
+def ensure_stock(session: Session) -> int:
+    """Create stock rows for roasts that do not have one yet."""
+    has_stock = select(RoastStock.roast_batch_id).where(RoastStock.roast_batch_id == RoastBatch.id).exists()
+    missing_ids = session.exec(select(RoastBatch.id).where(~has_stock)).all()
+    if not missing_ids:
+        return 0
+    for roast_id, roasted_output_g, sold_g, adjusted_g in session.exec(_computed_stock_statement(missing_ids)):
+        stock = RoastStock(roast_batch_id=roast_id)
+        _set_balance(stock, roasted_output_g, sold_g, adjusted_g)
+        session.add(stock)
+    return len(missing_ids)
+
+
+def rebuild_stock(session: Session) -> list[tuple[int, float, float]]:
+    """Recompute every stock row from scratch.
+
+    Returns ``(roast_id, stored_available_g, computed_available_g)`` for every
+    roast whose stored balance had drifted from the recomputed one.
+    """
+    stored = {stock.roast_batch_id: stock for stock in session.exec(select(RoastStock).with_for_update())}
+    drift: list[tuple[int, float, float]] = []
+    seen: set[int] = set()
+
+    for roast_id, roasted_output_g, sold_g, adjusted_g in session.exec(_computed_stock_statement()):
+        seen.add(roast_id)
+        stock = stored.get(roast_id)
+        if stock is None:
+            stock = RoastStock(roast_batch_id=roast_id)
+            previous = None
+        else:
+            previous = stock.available_g
+        _set_balance(stock, roasted_output_g, sold_g, adjusted_g)
+        if previous is None or abs(previous - stock.available_g) > DRIFT_TOLERANCE_G:
+            drift.append((roast_id, previous if previous is not None else 0.0, stock.available_g))
+        session.add(stock)
+
+    for roast_id, stock in stored.items():
+        if roast_id not in seen:
+            session.delete(stock)
+
+    return drift
+
+
+def ensure_stock_rows() -> None:
+    with Session(engine) as session:
+        ensure_stock(session)
+        session.commit()
+
+
+def run() -> None:
+    with Session(engine) as session:
+        drift = rebuild_stock(session)
+        session.commit()
+
+    for roast_id, stored_g, computed_g in drift:
+        print(f"Roast {roast_id}: stored {stored_g:.2f} g, recomputed {computed_g:.2f} g")
+    print(f"Roasted stock rebuilt, {len(drift)} roast(s) with drift")
+
+
+if __name__ == "__main__":
+    run()
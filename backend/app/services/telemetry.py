@@ -0,0 +1,302 @@
+"""Roast telemetry parsing, milestone detection and compact curve storage.
+
+Roasters log one bean/environment temperature sample per second. Uploads are
+CSV (header ``t,bt,et,event`` plus an optional ``roast_id`` column) or NDJSON
+objects with the same keys, and are parsed incrementally as the body streams
+in. Each curve is stored as packed float32 arrays in a single ``roastcurve``
+row, so reading a curve back is one primary-key fetch.
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import math
+import sys
+from array import array
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Iterator
+
+from sqlmodel import Session, select
+
+from ..models import RoastCurve
+from .curves import curve_profile
+
+MAX_SAMPLES_PER_CURVE = 20_000
+# Used to estimate first crack when the upload does not mark it.
+FIRST_CRACK_TEMP_C = 196.0
+
+_TIME_KEYS = ("t", "time", "time_s", "seconds")
+_BEAN_KEYS = ("bt", "bean_temp")
+_ENV_KEYS = ("et", "env_temp")
+_EVENT_ALIASES = {
+    "charge": "charge",
+    "first_crack": "first_crack",
+    "fc": "first_crack",
+    "drop": "drop",
+}
+
+
+class TelemetryError(ValueError):
+    """Raised when an upload cannot be parsed; the message is user facing."""
+
+
+def pack_floats(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array("f", values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def unpack_floats(data: bytes) -> array:
+    values = array("f")
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+@dataclass
+class CurveSamples:
+    time_s: array = field(default_factory=lambda: array("f"))
+    bean_temp: array = field(default_factory=lambda: array("f"))
+    env_temp: array = field(default_factory=lambda: array("f"))
+    has_env_temp: bool = False
+    events: dict[str, float] = field(default_factory=dict)
+
+    def add(self, time_s: float, bean_temp: float | None, env_temp: float | None, event: str | None) -> None:
+        if event:
+            name = _EVENT_ALIASES.get(event.strip().lower().replace(" ", "_"))
+            if name:
+                self.events.setdefault(name, time_s)
+        if bean_temp is None:
+            return
+        if len(self.time_s) >= MAX_SAMPLES_PER_CURVE:
+            raise TelemetryError(f"Una curva no puede superar {MAX_SAMPLES_PER_CURVE} muestras")
+        self.time_s.append(time_s)
+        self.bean_temp.append(bean_temp)
+        self.env_temp.append(env_temp if env_temp is not None else float("nan"))
+        self.has_env_temp = self.has_env_temp or env_temp is not None
+
+
+@dataclass
+class TelemetryRecord:
+    roast_id: int | None
+    time_s: float
+    bean_temp: float | None
+    env_temp: float | None
+    event: str | None
+
+
+def _pick(data: dict, keys: tuple[str, ...]) -> object | None:
+    for key in keys:
+        value = data.get(key)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def _to_float(value: object | None, line_number: int) -> float | None:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError) as exc:
+        raise TelemetryError(f"Valor numérico inválido en la línea {line_number}: {value!r}") from exc
+
+
+def _record(data: dict, line_number: int) -> TelemetryRecord:
+    time_s = _to_float(_pick(data, _TIME_KEYS), line_number)
+    if time_s is None:
+        raise TelemetryError(f"Falta el tiempo de la muestra en la línea {line_number}")
+    roast_id = data.get("roast_id")
+    try:
+        roast_id = int(roast_id) if roast_id not in (None, "") else None
+    except (TypeError, ValueError) as exc:
+        raise TelemetryError(f"roast_id inválido en la línea {line_number}") from exc
+    event = data.get("event")
+    return TelemetryRecord(
+        roast_id=roast_id,
+        time_s=time_s,
+        bean_temp=_to_float(_pick(data, _BEAN_KEYS), line_number),
+        env_temp=_to_float(_pick(data, _ENV_KEYS), line_number),
+        event=str(event) if event not in (None, "") else None,
+    )
+
+
+class TelemetryParser:
+    """Incremental CSV/NDJSON parser fed with raw body chunks."""
+
+    def __init__(self, fmt: str) -> None:
+        if fmt not in {"csv", "ndjson"}:
+            raise TelemetryError("Formato no soportado, use csv o ndjson")
+        self.fmt = fmt
+        self._buffer = b""
+        self._header: list[str] | None = None
+        self._line_number = 0
+
+    def feed(self, chunk: bytes) -> Iterator[TelemetryRecord]:
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split(b"\n")
+        for line in lines:
+            yield from self._parse_line(line)
+
+    def close(self) -> Iterator[TelemetryRecord]:
+        line, self._buffer = self._buffer, b""
+        yield from self._parse_line(line)
+
+    def _parse_line(self, raw: bytes) -> Iterator[TelemetryRecord]:
+        self._line_number += 1
+        line = raw.decode("utf-8-sig" if self._line_number == 1 else "utf-8").strip()
+        if not line:
+            return
+        if self.fmt == "ndjson":
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError as exc:
+                raise TelemetryError(f"JSON inválido en la línea {self._line_number}") from exc
+            if not isinstance(data, dict):
+                raise TelemetryError(f"Se esperaba un objeto JSON en la línea {self._line_number}")
+            yield _record(data, self._line_number)
+            return
+
+        values = next(csv.reader([line]))
+        if self._header is None:
+            self._header = [value.strip().lower() for value in values]
+            return
+        yield _record(dict(zip(self._header, values)), self._line_number)
+
+
+class TelemetryUpload:
+    """Groups streamed samples per roast.
+
+    With ``roast_id`` every sample belongs to that roast; otherwise each
+    record must carry its own ``roast_id`` so a whole day can be sent at once.
+    """
+
+    def __init__(self, fmt: str, roast_id: int | None = None) -> None:
+        self.parser = TelemetryParser(fmt)
+        self.roast_id = roast_id
+        self.curves: dict[int, CurveSamples] = defaultdict(CurveSamples)
+
+    def feed(self, chunk: bytes) -> None:
+        for record in self.parser.feed(chunk):
+            self._add(record)
+
+    def finish(self) -> dict[int, CurveSamples]:
+        for record in self.parser.close():
+            self._add(record)
+        if not self.curves:
+            raise TelemetryError("No se recibieron muestras de telemetría")
+        return dict(self.curves)
+
+    def _add(self, record: TelemetryRecord) -> None:
+        roast_id = self.roast_id if self.roast_id is not None else record.roast_id
+        if roast_id is None:
+            raise TelemetryError("Cada muestra debe indicar roast_id")
+        self.curves[roast_id].add(record.time_s, record.bean_temp, record.env_temp, record.event)
+
+
+def _nearest_index(times: array, value: float) -> int:
+    return min(range(len(times)), key=lambda index: abs(times[index] - value))
+
+
+def derive_milestones(samples: CurveSamples) -> dict[str, float | None]:
+    """Return charge, turning point, first crack and drop milestones.
+
+    Times are relative to charge. First crack comes from an explicit event or,
+    failing that, the first sample at or above ``FIRST_CRACK_TEMP_C``; the
+    development time ratio is the share of the roast after first crack.
+    """
+    times = samples.time_s
+    temps = samples.bean_temp
+    charge_index = _nearest_index(times, samples.events["charge"]) if "charge" in samples.events else 0
+    drop_index = _nearest_index(times, samples.events["drop"]) if "drop" in samples.events else len(times) - 1
+    drop_index = max(drop_index, charge_index)
+    charge_time = times[charge_index]
+
+    turning_index = min(range(charge_index, drop_index + 1), key=temps.__getitem__)
+    turning_point = turning_index if charge_index < turning_index < drop_index else None
+
+    if "first_crack" in samples.events:
+        first_crack_index = _nearest_index(times, samples.events["first_crack"])
+    else:
+        search_from = turning_point if turning_point is not None else charge_index
+        first_crack_index = next(
+            (index for index in range(search_from, drop_index + 1) if temps[index] >= FIRST_CRACK_TEMP_C),
+            None,
+        )
+
+    total_time = times[drop_index] - charge_time
+    development_time_ratio = None
+    if first_crack_index is not None and total_time > 0:
+        development_time_ratio = max(times[drop_index] - times[first_crack_index], 0.0) / total_time * 100
+
+    return {
+        "charge_time": charge_time,
+        "charge_temp": temps[charge_index],
+        "turning_point_s": times[turning_point] - charge_time if turning_point is not None else None,
+        "turning_point_temp": temps[turning_point] if turning_point is not None else None,
+        "first_crack_s": times[first_crack_index] - charge_time if first_crack_index is not None else None,
+        "first_crack_temp": temps[first_crack_index] if first_crack_index is not None else None,
+        "drop_s": times[drop_index] - charge_time,
+        "drop_temp": temps[drop_index],
+        "development_time_ratio": development_time_ratio,
+    }
+
+
+def store_curve(session: Session, roast_id: int, samples: CurveSamples) -> RoastCurve:
+    """Replace the stored curve of ``roast_id`` with ``samples``."""
+    if not samples.time_s:
+        raise TelemetryError(f"La tostión {roast_id} no tiene muestras de temperatura")
+
+    if any(later < earlier for earlier, later in zip(samples.time_s, samples.time_s[1:])):
+        order = sorted(range(len(samples.time_s)), key=samples.time_s.__getitem__)
+        samples.time_s = array("f", (samples.time_s[index] for index in order))
+        samples.bean_temp = array("f", (samples.bean_temp[index] for index in order))
+        samples.env_temp = array("f", (samples.env_temp[index] for index in order))
+
+    milestones = derive_milestones(samples)
+    charge_time = milestones.pop("charge_time")
+    relative_times = array("f", (value - charge_time for value in samples.time_s))
+
+    curve = session.get(RoastCurve, roast_id) or RoastCurve(roast_batch_id=roast_id)
+    curve.sample_count = len(relative_times)
+    curve.time_s = pack_floats(relative_times)
+    curve.bean_temp = pack_floats(samples.bean_temp)
+    curve.env_temp = pack_floats(samples.env_temp) if samples.has_env_temp else None
+    curve.profile = curve_profile(relative_times, samples.bean_temp, milestones["drop_s"])
+    for name, value in milestones.items():
+        setattr(curve, name, round(value, 2) if value is not None else None)
+    curve.updated_at = datetime.utcnow()
+    session.add(curve)
+    return curve
+
+
+def store_curves(session: Session, curves: dict[int, CurveSamples]) -> list[RoastCurve]:
+    """Store several curves, loading the rows being replaced in one query."""
+    session.exec(select(RoastCurve).where(RoastCurve.roast_batch_id.in_(curves))).all()
+    stored = [store_curve(session, roast_id, samples) for roast_id, samples in curves.items()]
+    session.flush()
+    return stored
+
+
+def delete_curve(session: Session, roast_id: int) -> None:
+    curve = session.get(RoastCurve, roast_id)
+    if curve is not None:
+        session.delete(curve)
+        session.flush()
+
+
+def curve_series(curve: RoastCurve) -> dict[str, list[float | None] | None]:
+    """Decode a stored curve; missing environment samples become ``None``."""
+    env_temp = None
+    if curve.env_temp is not None:
+        env_temp = [None if math.isnan(value) else round(value, 2) for value in unpack_floats(curve.env_temp)]
+    return {
+        "time_s": [round(value, 2) for value in unpack_floats(curve.time_s)],
+        "bean_temp": [round(value, 2) for value in unpack_floats(curve.bean_temp)],
+        "env_temp": env_temp,
+    }
@@ -0,0 +1,123 @@
+"""Per-process cache of authenticated users keyed by token subject.
+
+``get_current_user`` resolves a token from this cache before querying the
+``user`` table, so requests only hit the database on a miss. Entries are
+evicted once the transaction that changed or deleted a user commits (see
+``invalidate_user``) and otherwise expire after
+``settings.user_cache_ttl_seconds``, which bounds how long another worker can
+keep serving a stale user.
+
+With ``settings.user_cache_notify`` on Postgres, invalidations are also sent
+through ``NOTIFY`` in the same transaction and a listener thread started by
+``start_listener`` evicts them in every worker.
+"""
+
+from __future__ import annotations
+
+import logging
+import select
+import threading
+import time
+from typing import Any
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.pool import NullPool
+from sqlmodel import Session
+
+from ..core.config import settings
+from ..db import engine
+from ..models import User
+from .cache import ResultCache
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "user_cache"
+LISTEN_POLL_SECONDS = 5.0
+LISTEN_RETRY_SECONDS = 5.0
+
+_users = ResultCache(
+    maxsize=settings.user_cache_size, ttl_seconds=settings.user_cache_ttl_seconds, name="users", track_writes=False
+)
+_generation_lock = threading.Lock()
+_generation = 0
+
+
+def user_cache_generation() -> int:
+    return _generation
+
+
+def get_cached_user(email: str) -> User | None:
+    """Return a detached copy of the cached user for ``email``, if any."""
+    data = _users.get(email)
+    return User(**data) if data is not None else None
+
+
+def cache_user(user: User, generation: int) -> None:
+    """Cache ``user``; skipped if any user was invalidated since ``generation`` was read."""
+    with _generation_lock:
+        if generation == _generation:
+            _users.set(user.email, user.model_dump())
+
+
+def _evict(emails: set[str] | list[str]) -> None:
+    global _generation
+    with _generation_lock:
+        _generation += 1
+        for email in emails:
+            _users.pop(email)
+
+
+def invalidate_user(session: Session, email: str) -> None:
+    """Evict ``email`` from the cache once ``session`` commits."""
+    session.info.setdefault("invalidated_users", set()).add(email)
+    _evict([email])
+    if settings.user_cache_notify and session.get_bind().dialect.name == "postgresql":
+        session.execute(text("SELECT pg_notify(:channel, :email)"), {"channel": NOTIFY_CHANNEL, "email": email})
+
+
+@event.listens_for(Session, "after_commit")
+def _evict_on_commit(session: Session) -> None:
+    emails = session.info.pop("invalidated_users", None)
+    if emails:
+        _evict(emails)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_on_rollback(session: Session) -> None:
+    session.info.pop("invalidated_users", None)
+
+
+def _listen(listen_engine: Any) -> None:
+    while True:
+        try:
+            connection = listen_engine.raw_connection()
+            try:
+                dbapi_connection = connection.driver_connection
+                dbapi_connection.autocommit = True
+                dbapi_connection.cursor().execute(f"LISTEN {NOTIFY_CHANNEL}")
+                # Notifications sent while disconnected are lost, so start clean.
+                _users.clear()
+                while True:
+                    if not select.select([dbapi_connection], [], [], LISTEN_POLL_SECONDS)[0]:
+                        continue
+                    dbapi_connection.poll()
+                    emails = [notify.payload for notify in dbapi_connection.notifies]
+                    dbapi_connection.notifies.clear()
+                    if emails:
+                        _evict(emails)
+            finally:
+                connection.close()
+        except Exception:
+            logger.warning(
+                "User cache listener disconnected; retrying in %s seconds", LISTEN_RETRY_SECONDS, exc_info=True
+            )
+            time.sleep(LISTEN_RETRY_SECONDS)
+
+
+def start_listener() -> None:
+    """Start the cross-worker invalidation listener when enabled."""
+    if not settings.user_cache_notify or engine.dialect.name != "postgresql":
+        return
+    # A dedicated connection so the listener never holds a slot of the app's pool.
+    listen_engine = create_engine(settings.database_url, poolclass=NullPool)
+    threading.Thread(target=_listen, args=(listen_engine,), name="user-cache-listener", daemon=True).start()
@@ -0,0 +1,161 @@
+"""Measure round trips and latency of ``GET /dashboard/summary``.
+
+Point ``DATABASE_URL`` at a scratch database, then run from ``backend/``::
+
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.dashboard_summary --seed
+
+``--seed`` fills empty tables with synthetic farms, lots, roasts, sales and
+expenses before measuring; without it the existing data is used.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import event, insert
+from sqlmodel import Session, SQLModel, func, select
+
+from app.api.routes.dashboard import get_dashboard_summary
+from app.db import ThreadedSession, engine
+from app.models import CoffeeLot, Expense, Farm, RoastBatch, Sale, SaleItem, Variety
+
+CHUNK_SIZE = 5_000
+
+
+def _chunks(rows: list[dict], size: int = CHUNK_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start : start + size]
+
+
+def seed(session: Session, lots: int, sales: int) -> None:
+    rng = random.Random(42)
+    start = date(2022, 1, 1)
+
+    session.execute(insert(Farm), [{"id": i, "name": f"Farm {i}"} for i in range(1, 51)])
+    session.execute(insert(Variety), [{"id": i, "name": f"Variety {i}"} for i in range(1, 21)])
+
+    lot_rows = [
+        {
+            "id": i,
+            "farm_id": rng.randint(1, 50),
+            "variety_id": rng.randint(1, 20),
+            "process": rng.choice(["washed", "natural", "honey"]),
+            "purchase_date": start + timedelta(days=rng.randint(0, 1000)),
+            "green_weight_g": rng.uniform(20_000, 70_000),
+            "price_per_kg": rng.uniform(20_000, 60_000),
+        }
+        for i in range(1, lots + 1)
+    ]
+    for chunk in _chunks(lot_rows):
+        session.execute(insert(CoffeeLot), chunk)
+
+    roasts = lots * 3
+    roast_rows = []
+    for i in range(1, roasts + 1):
+        green = rng.uniform(1_000, 5_000)
+        roast_rows.append(
+            {
+                "id": i,
+                "lot_id": rng.randint(1, lots),
+                "roast_date": start + timedelta(days=rng.randint(0, 1000)),
+                "green_input_g": green,
+                "roasted_output_g": green * rng.uniform(0.8, 0.88),
+                "shrinkage_pct": 15.0,
+            }
+        )
+    for chunk in _chunks(roast_rows):
+        session.execute(insert(RoastBatch), chunk)
+
+    sale_rows = []
+    item_rows = []
+    for i in range(1, sales + 1):
+        bags = rng.randint(1, 4)
+        price = rng.choice([18_000, 32_000, 60_000])
+        total = float(bags * price)
+        paid = total if rng.random() < 0.9 else 0.0
+        sale_rows.append(
+            {
+                "id": i,
+                "sale_date": start + timedelta(days=rng.randint(0, 1000)),
+                "is_paid": paid >= total,
+                "amount_paid": paid,
+                "total_price": total,
+                "total_quantity_g": float(bags * 250),
+            }
+        )
+        item_rows.append(
+            {"sale_id": i, "roast_batch_id": rng.randint(1, roasts), "bag_size_g": 250, "bags": bags, "bag_price": price}
+        )
+    for chunk in _chunks(sale_rows):
+        session.execute(insert(Sale), chunk)
+    for chunk in _chunks(item_rows):
+        session.execute(insert(SaleItem), chunk)
+
+    expense_rows = [
+        {
+            "expense_date": start + timedelta(days=rng.randint(0, 1000)),
+            "category": rng.choice(["rent", "packaging", "energy"]),
+            "amount": rng.uniform(10_000, 500_000),
+        }
+        for _ in range(lots)
+    ]
+    for chunk in _chunks(expense_rows):
+        session.execute(insert(Expense), chunk)
+
+    session.commit()
+
+
+def measure(repeat: int) -> tuple[int, list[float]]:
+    statements = 0
+
+    def count_statement(*_args) -> None:
+        nonlocal statements
+        statements += 1
+
+    timings: list[float] = []
+    event.listen(engine, "before_cursor_execute", count_statement)
+    try:
+        for _ in range(repeat):
+            statements = 0
+            with Session(engine) as session:
+                started = time.perf_counter()
+                asyncio.run(get_dashboard_summary(session=ThreadedSession(session), _=None))
+                timings.append((time.perf_counter() - started) * 1000)
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+    return statements, timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seed", action="store_true", help="seed empty tables with synthetic data first")
+    parser.add_argument("--lots", type=int, default=10_000)
+    parser.add_argument("--sales", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    SQLModel.metadata.create_all(bind=engine)
+    with Session(engine) as session:
+        if args.seed:
+            if session.exec(select(func.count()).select_from(CoffeeLot)).one():
+                parser.error("--seed needs empty tables")
+            seed(session, args.lots, args.sales)
+        lot_count = session.exec(select(func.count()).select_from(CoffeeLot)).one()
+        sale_count = session.exec(select(func.count()).select_from(Sale)).one()
+
+    statements, timings = measure(args.repeat)
+    print(f"lots={lot_count} sales={sale_count} repeat={args.repeat}")
+    print(f"round trips per request: {statements}")
+    print(
+        f"latency ms: median={statistics.median(timings):.1f} "
+        f"p95={sorted(timings)[int(len(timings) * 0.95) - 1]:.1f} max={max(timings):.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
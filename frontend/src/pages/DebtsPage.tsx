@@ -20,7 +20,7 @@ import RefreshRoundedIcon from "@mui/icons-material/RefreshRounded";
 import { useEffect, useMemo, useState } from "react";
 import { useNavigate } from "react-router-dom";
 
-import { fetchCustomers, fetchSalesDebts } from "../services/api";
+import { fetchAllSalesDebts, fetchCustomers } from "../services/api";
 import type { Customer, Sale } from "../types";
 
 const formatCurrency = (value: number) =>
@@ -41,8 +41,8 @@ const DebtsPage = () => {
   const loadData = async () => {
     try {
       setLoading(true);
-      const [debtsRes, customersRes] = await Promise.all([fetchSalesDebts(), fetchCustomers()]);
-      setDebts(debtsRes.data as Sale[]);
+      const [debtsData, customersRes] = await Promise.all([fetchAllSalesDebts(), fetchCustomers()]);
+      setDebts(debtsData as Sale[]);
       setCustomers(customersRes.data as Customer[]);
     } catch (error) {
       console.error("Failed to load debts", error);
@@ -374,6 +374,7 @@ const LotsPage = () => {
                 <TableCell>Proceso</TableCell>
                 <TableCell>Fecha</TableCell>
                 <TableCell align="right">Gramos verdes</TableCell>
+                <TableCell align="right">Disponible</TableCell>
                 <TableCell align="right">Precio/kg</TableCell>
                 <TableCell align="right">Acciones</TableCell>
               </TableRow>
@@ -381,7 +382,7 @@ const LotsPage = () => {
             <TableBody>
               {sortedLots.length === 0 ? (
                 <TableRow>
-                  <TableCell colSpan={7}>
+                  <TableCell colSpan={8}>
                     {isFiltering
                       ? "No hay lotes que coincidan con los filtros."
                       : "No hay lotes registrados."}
@@ -395,6 +396,9 @@ const LotsPage = () => {
                     <TableCell>{lot.process}</TableCell>
                     <TableCell>{lot.purchase_date}</TableCell>
                     <TableCell align="right">{formatGrams(lot.green_weight_g)}</TableCell>
+                    <TableCell align="right">
+                      {lot.remaining_g === null || lot.remaining_g === undefined ? "—" : formatGrams(lot.remaining_g)}
+                    </TableCell>
                     <TableCell align="right">${formatPricePerKg(lot.price_per_kg)}</TableCell>
                     <TableCell align="right">
                       <Tooltip title="Editar">
@@ -27,7 +27,7 @@ import {
 import AddRoundedIcon from "@mui/icons-material/AddRounded";
 import DeleteRoundedIcon from "@mui/icons-material/DeleteRounded";
 import EditRoundedIcon from "@mui/icons-material/EditRounded";
-import { ChangeEvent, FormEvent, useEffect, useMemo, useState } from "react";
+import { ChangeEvent, FormEvent, useCallback, useEffect, useMemo, useState } from "react";
 
 import {
   createSale,
@@ -35,12 +35,16 @@ import {
   fetchCustomers,
   fetchFarms,
   fetchLots,
+  fetchRoastedInventory,
   fetchRoasts,
   fetchSales,
   fetchVarieties,
+  nextCursorOf,
+  totalCountOf,
   updateSale
 } from "../services/api";
-import type { Customer, Farm, RoastBatch, Sale, Variety, CoffeeLot } from "../types";
+import type { SaleListParams } from "../services/api";
+import type { Customer, Farm, RoastBatch, RoastedInventoryItem, Sale, Variety, CoffeeLot } from "../types";
 import { useLocation, useNavigate } from "react-router-dom";
 import ConfirmDialog from "../components/ConfirmDialog";
 import FilterPanel from "../components/FilterPanel";
@@ -57,6 +61,7 @@ const formatDate = (value: string | null | undefined) =>
 const BAG_SIZES = [250, 340, 500, 2500] as const;
 
 type SaleItemForm = {
+  id?: number;
   roast_batch_id: string;
   bag_size_g: number;
   bags: string;
@@ -88,6 +93,7 @@ const buildEmptySaleForm = () => ({
 });
 
 const MIN_AVAILABLE_ROAST_G = 100;
+const SALES_PAGE_SIZE = 100;
 
 const SalesPage = () => {
   const navigate = useNavigate();
@@ -95,6 +101,10 @@ const SalesPage = () => {
   const [customers, setCustomers] = useState<Customer[]>([]);
   const [roasts, setRoasts] = useState<RoastBatch[]>([]);
   const [sales, setSales] = useState<Sale[]>([]);
+  const [totalSales, setTotalSales] = useState(0);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [availableByRoast, setAvailableByRoast] = useState<Record<number, number>>({});
   const [lots, setLots] = useState<CoffeeLot[]>([]);
   const [varieties, setVarieties] = useState<Variety[]>([]);
   const [farms, setFarms] = useState<Farm[]>([]);
@@ -125,34 +135,81 @@ const SalesPage = () => {
   const [page, setPage] = useState(0);
   const [rowsPerPage, setRowsPerPage] = useState(10);
 
-  const loadData = useMemo(
-    () =>
-      async () => {
-        try {
-          const [customersRes, roastsRes, salesRes, lotsRes, varietiesRes, farmsRes] = await Promise.all([
-            fetchCustomers(),
-            fetchRoasts(),
-            fetchSales(),
-            fetchLots(),
-            fetchVarieties(),
-            fetchFarms()
-          ]);
-          setCustomers(customersRes.data as Customer[]);
-          setRoasts(roastsRes.data as RoastBatch[]);
-          setSales(salesRes.data as Sale[]);
-          setLots(lotsRes.data as CoffeeLot[]);
-          setVarieties(varietiesRes.data as Variety[]);
-          setFarms(farmsRes.data as Farm[]);
-        } catch (error) {
-          console.error("Failed to load sales data", error);
-        }
-      },
-    []
+  // Filters the API supports are applied server-side; the rest narrow the loaded pages.
+  const saleQuery = useMemo(
+    (): SaleListParams => ({
+      date_from: filters.dateFrom || undefined,
+      date_to: filters.dateTo || undefined,
+      roast_batch_id: filters.roastId ? Number(filters.roastId) : undefined,
+      customer_id: filters.customerId && filters.customerId !== "none" ? Number(filters.customerId) : undefined,
+      is_paid: filters.status === "paid" ? true : filters.status === "pending" ? false : undefined
+    }),
+    [filters.dateFrom, filters.dateTo, filters.roastId, filters.customerId, filters.status]
   );
 
+  const loadCatalogs = useCallback(async () => {
+    try {
+      const [customersRes, roastsRes, inventoryRes, lotsRes, varietiesRes, farmsRes] = await Promise.all([
+        fetchCustomers(),
+        fetchRoasts(),
+        fetchRoastedInventory(),
+        fetchLots(),
+        fetchVarieties(),
+        fetchFarms()
+      ]);
+      setCustomers(customersRes.data as Customer[]);
+      setRoasts(roastsRes.data as RoastBatch[]);
+      setAvailableByRoast(
+        Object.fromEntries(
+          (inventoryRes.data as RoastedInventoryItem[]).map((entry) => [entry.roast_id, entry.available_g])
+        )
+      );
+      setLots(lotsRes.data as CoffeeLot[]);
+      setVarieties(varietiesRes.data as Variety[]);
+      setFarms(farmsRes.data as Farm[]);
+    } catch (error) {
+      console.error("Failed to load sales data", error);
+    }
+  }, []);
+
+  const loadSales = useCallback(async () => {
+    try {
+      const response = await fetchSales({ ...saleQuery, limit: SALES_PAGE_SIZE, include_total: true });
+      setSales(response.data as Sale[]);
+      setNextCursor(nextCursorOf(response));
+      setTotalSales(totalCountOf(response));
+    } catch (error) {
+      console.error("Failed to load sales", error);
+    }
+  }, [saleQuery]);
+
+  const loadMoreSales = async () => {
+    if (!nextCursor) {
+      return;
+    }
+    setLoadingMore(true);
+    try {
+      const response = await fetchSales({ ...saleQuery, limit: SALES_PAGE_SIZE, cursor: nextCursor });
+      setSales((prev) => [...prev, ...(response.data as Sale[])]);
+      setNextCursor(nextCursorOf(response));
+    } catch (error) {
+      console.error("Failed to load more sales", error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  const loadData = useCallback(async () => {
+    await Promise.all([loadCatalogs(), loadSales()]);
+  }, [loadCatalogs, loadSales]);
+
   useEffect(() => {
-    void loadData();
-  }, [loadData]);
+    void loadCatalogs();
+  }, [loadCatalogs]);
+
+  useEffect(() => {
+    void loadSales();
+  }, [loadSales]);
 
   useEffect(() => {
     const state = location.state as { prefilters?: Partial<typeof filters> } | undefined;
@@ -162,24 +219,21 @@ const SalesPage = () => {
     }
   }, [location, navigate]);
 
+  // Stock comes from the roasted inventory; a sale being edited gives back what it already holds.
   const getAvailableRoastedGrams = (roastId: number, ignoreSaleId: number | null) => {
-    const roast = roasts.find((candidate) => candidate.id === roastId);
-    if (!roast) {
+    const available = availableByRoast[roastId];
+    if (available === undefined) {
       return 0;
     }
-    const used = sales.reduce((total, current) => {
-      if (ignoreSaleId && current.id === ignoreSaleId) {
-        return total;
-      }
-      const roastUsage = current.items?.reduce((sum, item) => {
+    const editedSale = ignoreSaleId ? sales.find((current) => current.id === ignoreSaleId) : undefined;
+    const released =
+      editedSale?.items?.reduce((sum, item) => {
         if (item.roast_batch_id !== roastId) {
           return sum;
         }
         return sum + item.bag_size_g * item.bags;
       }, 0) ?? 0;
-      return total + roastUsage;
-    }, 0);
-    return Math.max(0, roast.roasted_output_g - used);
+    return Math.max(0, available + released);
   };
 
   const roastOptions = useMemo(() => {
@@ -196,7 +250,7 @@ const SalesPage = () => {
       const available = getAvailableRoastedGrams(roast.id, saleEditingId);
       return available >= MIN_AVAILABLE_ROAST_G;
     });
-  }, [roasts, saleForm.items, saleEditingId, sales]);
+  }, [roasts, saleForm.items, saleEditingId, sales, availableByRoast]);
 
   const filteredSales = useMemo(() => {
     return sales.filter((sale) => {
@@ -481,6 +535,7 @@ const currentSaleTotal = useMemo(() => {
       is_paid: resolvedIsPaid,
       amount_paid: resolvedAmountPaid,
       items: saleForm.items.map((item) => ({
+        id: saleEditingId ? item.id : undefined,
         roast_batch_id: Number(item.roast_batch_id),
         bag_size_g: item.bag_size_g,
         bags: Math.round(Number(item.bags)),
@@ -509,6 +564,7 @@ const currentSaleTotal = useMemo(() => {
   const handleEditSale = (sale: Sale) => {
     setSaleEditingId(sale.id);
     const mappedItems = (sale.items ?? []).map((item) => ({
+      id: item.id,
       roast_batch_id: String(item.roast_batch_id),
       bag_size_g: item.bag_size_g,
       bags: String(item.bags),
@@ -571,9 +627,9 @@ const currentSaleTotal = useMemo(() => {
       <Card sx={{ display: "flex", flexDirection: "column", flexGrow: 1 }}>
         <CardHeader
           title="Historial de ventas"
-          subheader={`${sortedSales.length} de ${sales.length} registros · Total mostrado: ${formatCurrency(
-            totalFilteredSalesAmount
-          )}`}
+          subheader={`${sortedSales.length} de ${totalSales} registros${
+            nextCursor ? ` (${sales.length} cargados)` : ""
+          } · Total mostrado: ${formatCurrency(totalFilteredSalesAmount)}`}
           action={
             <Button startIcon={<AddRoundedIcon />} variant="contained" onClick={openCreateDialog}>
               Nueva venta
@@ -862,6 +918,13 @@ const currentSaleTotal = useMemo(() => {
             rowsPerPageOptions={[5, 10, 20]}
             labelRowsPerPage="Filas por página"
           />
+          {nextCursor && (
+            <Box sx={{ display: "flex", justifyContent: "center", mt: 2 }}>
+              <Button variant="outlined" onClick={() => void loadMoreSales()} disabled={loadingMore}>
+                {loadingMore ? "Cargando..." : "Cargar más ventas"}
+              </Button>
+            </Box>
+          )}
         </CardContent>
       </Card>
       <ConfirmDialog
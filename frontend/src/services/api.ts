@@ -1,4 +1,4 @@
-import axios from "axios";
+import axios, { type AxiosResponse } from "axios";
 
 const resolveBaseURL = () => {
   const configured = import.meta.env.VITE_API_URL as string | undefined;
@@ -48,6 +48,14 @@ export const loginRequest = async (email: string, password: string) => {
 export const fetchCurrentUser = () => api.get("/api/v1/auth/me");
 
 export const fetchDashboardSummary = () => api.get("/api/v1/dashboard/summary");
+export const fetchDashboardTimeseries = (params: {
+  metric: "revenue" | "grams_sold" | "green_purchased" | "expenses" | "avg_shrinkage";
+  granularity?: "day" | "week" | "month";
+  from?: string;
+  to?: string;
+  variety_id?: number;
+  process?: string;
+}) => api.get("/api/v1/dashboard/timeseries", { params });
 
 export const fetchFarms = () => api.get("/api/v1/farms/");
 export const createFarm = (payload: Record<string, unknown>) => api.post("/api/v1/farms/", payload);
@@ -67,8 +75,19 @@ export const deleteLot = (id: number) => api.delete(`/api/v1/lots/${id}`);
 
 export const fetchRoasts = () => api.get("/api/v1/roasts/");
 export const createRoast = (payload: Record<string, unknown>) => api.post("/api/v1/roasts/", payload);
+export const createRoastsBulk = (payload: Record<string, unknown>[], partial = false) =>
+  api.post("/api/v1/roasts/bulk", payload, { params: { partial } });
 export const updateRoast = (id: number, payload: Record<string, unknown>) => api.put(`/api/v1/roasts/${id}`, payload);
 export const deleteRoast = (id: number) => api.delete(`/api/v1/roasts/${id}`);
+export const fetchShrinkageStats = (params?: {
+  group_by?: "all" | "lot" | "variety" | "process" | "roast_level";
+  z?: number;
+  percentiles?: boolean;
+}) => api.get("/api/v1/roasts/stats", { params });
+export const fetchRoastCurve = (id: number, points = 300) =>
+  api.get(`/api/v1/roasts/${id}/curve`, { params: { points } });
+export const fetchRoastCurves = (ids: number[], points = 300) =>
+  api.get("/api/v1/roasts/curves", { params: { ids, points }, paramsSerializer: { indexes: null } });
 
 export const fetchRoastedInventory = () => api.get("/api/v1/inventory/roasted");
 export const fetchInventoryAdjustments = (params?: { roast_id?: number }) =>
@@ -86,11 +105,40 @@ export const updateCustomer = (id: number, payload: Record<string, unknown>) =>
   api.put(`/api/v1/customers/${id}`, payload);
 export const deleteCustomer = (id: number) => api.delete(`/api/v1/customers/${id}`);
 
-export const fetchSales = () => api.get("/api/v1/sales/");
+export type SaleListParams = {
+  date_from?: string;
+  date_to?: string;
+  customer_id?: number;
+  is_paid?: boolean;
+  roast_batch_id?: number;
+  limit?: number;
+  cursor?: string;
+  include_total?: boolean;
+};
+
+export const fetchSales = (params?: SaleListParams) => api.get("/api/v1/sales/", { params });
 export const createSale = (payload: Record<string, unknown>) => api.post("/api/v1/sales/", payload);
 export const updateSale = (id: number, payload: Record<string, unknown>) => api.put(`/api/v1/sales/${id}`, payload);
 export const deleteSale = (id: number) => api.delete(`/api/v1/sales/${id}`);
-export const fetchSalesDebts = () => api.get("/api/v1/sales/debts");
+export const fetchSalesDebts = (params?: SaleListParams) => api.get("/api/v1/sales/debts", { params });
+export const nextCursorOf = (response: AxiosResponse) => {
+  const cursor = response.headers["x-next-cursor"];
+  return typeof cursor === "string" && cursor ? cursor : null;
+};
+export const totalCountOf = (response: AxiosResponse) => Number(response.headers["x-total-count"] ?? 0);
+
+// Outstanding debts are a bounded set, so their pages are followed to the end.
+export const fetchAllSalesDebts = async (params?: SaleListParams) => {
+  const debts: unknown[] = [];
+  let cursor: string | null = null;
+  do {
+    const response = await fetchSalesDebts({ ...params, limit: 500, cursor: cursor ?? undefined });
+    debts.push(...(response.data as unknown[]));
+    cursor = nextCursorOf(response);
+  } while (cursor);
+  return debts;
+};
+export const fetchDebtsAging = (params?: { as_of?: string }) => api.get("/api/v1/sales/debts/aging", { params });
 
 export const fetchPriceReferences = () => api.get("/api/v1/price-references/");
 export const createPriceReference = (payload: Record<string, unknown>) =>
@@ -105,9 +153,45 @@ export const updateExpense = (id: number, payload: Record<string, unknown>) =>
   api.put(`/api/v1/expenses/${id}`, payload);
 export const deleteExpense = (id: number) => api.delete(`/api/v1/expenses/${id}`);
 
+export const fetchProfitabilityReport = (params: {
+  group_by: Array<"farm" | "variety" | "process" | "roast_level" | "bag_size">;
+  from?: string;
+  to?: string;
+}) => api.get("/api/v1/reports/profitability", { params, paramsSerializer: { indexes: null } });
+
+export const importRecords = (
+  entity: "customers" | "expenses" | "lots" | "roasts" | "sales",
+  file: File,
+  format: "csv" | "ndjson" = file.name.toLowerCase().endsWith(".csv") ? "csv" : "ndjson"
+) =>
+  api.post(`/api/v1/import/${entity}`, file, {
+    params: { format },
+    headers: { "Content-Type": "application/octet-stream" }
+  });
+
+export const exportRecords = (
+  entity: "sales" | "items" | "lots" | "roasts" | "inventory",
+  params?: { format?: "csv" | "ndjson"; from?: string; to?: string; gzip?: boolean }
+) => api.get(`/api/v1/export/${entity}`, { params, responseType: "blob" });
+
+export const createSnapshot = (incremental = false) =>
+  api.post("/api/v1/admin/snapshot", null, { params: { incremental } });
+export const fetchCacheStats = () => api.get("/api/v1/admin/caches");
+export const fetchPoolStats = () => api.get("/api/v1/admin/pool");
+export const fetchReplicas = () => api.get("/api/v1/admin/replicas");
+
 export const fetchUsers = () => api.get("/api/v1/users/");
 export const createUser = (payload: Record<string, unknown>) => api.post("/api/v1/users/", payload);
 export const updateUser = (id: number, payload: Record<string, unknown>) => api.put(`/api/v1/users/${id}`, payload);
 export const deleteUser = (id: number) => api.delete(`/api/v1/users/${id}`);
 
+export const fetchApiKeys = () => api.get("/api/v1/api-keys/");
+export const createApiKey = (payload: {
+  name: string;
+  scope?: "read" | "write" | "admin";
+  user_id?: number;
+  expires_at?: string;
+}) => api.post("/api/v1/api-keys/", payload);
+export const revokeApiKey = (id: number) => api.delete(`/api/v1/api-keys/${id}`);
+
 export default api;
@@ -29,6 +29,7 @@ export interface CoffeeLot {
   price_per_kg: number;
   moisture_level?: number | null;
   notes?: string | null;
+  remaining_g?: number | null;
 }
 
 export interface RoastBatch {
@@ -40,6 +41,18 @@ export interface RoastBatch {
   roast_level?: string | null;
   notes?: string | null;
   shrinkage_pct: number;
+  cost_per_g?: number;
+}
+
+export interface RoastCurvePoints {
+  roast_batch_id: number;
+  points: number;
+  time_s: Array<number | null>;
+  bean_temp: Array<number | null>;
+  env_temp?: Array<number | null> | null;
+  first_crack_s?: number | null;
+  drop_s: number;
+  development_time_ratio?: number | null;
 }
 
 export interface Customer {
@@ -69,6 +82,7 @@ export interface SaleItem {
   bags: number;
   bag_price: number;
   notes?: string | null;
+  cost_of_goods?: number;
 }
 
 export interface Expense {